@@ -10,11 +10,15 @@ ROOT_DIR = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT_DIR))
 
 # import Base + models
+from app.core.config import settings  # noqa: E402
 from app.core.database import Base  # noqa: E402
 from app.models import entities  # noqa: F401, E402
 
 config = context.config
 
+# same DB as the app (Settings / DATABASE_URL env var), not the ini default
+config.set_main_option("sqlalchemy.url", settings.database_url)
+
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
@@ -0,0 +1,54 @@
+"""add composite / partial indexes for hot lookup paths
+
+Revision ID: 1dc20a2137f8
+Revises: 7356d79ad686
+Create Date: 2026-10-18 10:31:47.902115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "1dc20a2137f8"
+down_revision: Union[str, None] = "7356d79ad686"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BOOKED_ONLY = sa.text("status = 'BOOKED'")
+
+
+def upgrade() -> None:
+    # (doctor_id, start_time) is already covered by uq_doctor_slot,
+    # (slot_id, token_number) by uq_slot_token_number.
+
+    # "first slot that has not ended yet"
+    op.create_index("ix_time_slots_doctor_end", "time_slots", ["doctor_id", "end_time"], unique=False)
+
+    # capacity count: slot_id = ? AND status = 'BOOKED'
+    op.create_index(
+        "ix_appointments_slot_booked",
+        "appointments",
+        ["slot_id"],
+        unique=False,
+        sqlite_where=BOOKED_ONLY,
+        postgresql_where=BOOKED_ONLY,
+    )
+
+    # duplicate check: patient_id = ? AND slot_id = ? AND status = 'BOOKED'
+    op.create_index(
+        "ix_appointments_patient_slot_booked",
+        "appointments",
+        ["patient_id", "slot_id"],
+        unique=False,
+        sqlite_where=BOOKED_ONLY,
+        postgresql_where=BOOKED_ONLY,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_appointments_patient_slot_booked", table_name="appointments")
+    op.drop_index("ix_appointments_slot_booked", table_name="appointments")
+    op.drop_index("ix_time_slots_doctor_end", table_name="time_slots")
@@ -0,0 +1,96 @@
+"""align tokens and appointments with the models
+
+Revision ID: 2e8b4c1f9d07
+Revises: 201b664e1433
+Create Date: 2026-10-18 10:02:40.915374
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "2e8b4c1f9d07"
+down_revision: Union[str, None] = "201b664e1433"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 201b664e1433 created both tables from an older design: tokens had no slot,
+# appointments a booking_source / priority enum pair instead of the
+# source + priority_rank the app reads. Bring them in line so the migrations
+# that follow (and the app) find the columns they use.
+
+
+def upgrade() -> None:
+    # ---- appointments ----
+    op.add_column("appointments", sa.Column("source", sa.String(), nullable=False, server_default="ONLINE"))
+    op.add_column("appointments", sa.Column("priority_rank", sa.Integer(), nullable=False, server_default="3"))
+    op.execute(
+        """
+        UPDATE appointments
+        SET source = CASE
+            WHEN priority IN ('EMERGENCY', 'PAID_PRIORITY') THEN 'PRIORITY'
+            WHEN priority = 'FOLLOW_UP' THEN 'FOLLOW_UP'
+            WHEN booking_source = 'WALKIN' THEN 'WALK_IN'
+            ELSE 'ONLINE'
+        END
+        """
+    )
+    # same ranks as entities.source_to_rank
+    op.execute(
+        """
+        UPDATE appointments
+        SET priority_rank = CASE source WHEN 'PRIORITY' THEN 1 WHEN 'FOLLOW_UP' THEN 2 WHEN 'WALK_IN' THEN 4 ELSE 3 END
+        """
+    )
+    op.execute("UPDATE appointments SET status = 'SERVED' WHERE status = 'COMPLETED'")
+
+    # the old enums are no longer written; keep the data, drop the NOT NULL
+    # (SQLite can't ALTER COLUMN in place -> batch mode)
+    with op.batch_alter_table("appointments") as batch_op:
+        batch_op.alter_column("booking_source", existing_type=sa.String(), nullable=True)
+        batch_op.alter_column("priority", existing_type=sa.String(), nullable=True)
+
+    # ---- tokens ----
+    op.add_column("tokens", sa.Column("slot_id", sa.Integer(), nullable=True))
+    op.add_column("tokens", sa.Column("source", sa.String(), nullable=False, server_default="ONLINE"))
+    op.execute(
+        """
+        UPDATE tokens
+        SET slot_id = (SELECT appointments.slot_id FROM appointments WHERE appointments.id = tokens.appointment_id),
+            source = (SELECT appointments.source FROM appointments WHERE appointments.id = tokens.appointment_id)
+        """
+    )
+
+    with op.batch_alter_table("tokens") as batch_op:
+        batch_op.alter_column("slot_id", existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column("status", existing_type=sa.String(), nullable=True)
+        batch_op.create_foreign_key("fk_tokens_slot_id", "time_slots", ["slot_id"], ["id"], ondelete="CASCADE")
+        batch_op.create_unique_constraint("uq_slot_token_number", ["slot_id", "token_number"])
+
+
+def downgrade() -> None:
+    op.execute("UPDATE tokens SET status = 'ALLOCATED' WHERE status IS NULL")
+    with op.batch_alter_table("tokens") as batch_op:
+        batch_op.drop_constraint("uq_slot_token_number", type_="unique")
+        batch_op.drop_constraint("fk_tokens_slot_id", type_="foreignkey")
+        batch_op.alter_column("status", existing_type=sa.String(), nullable=False)
+        batch_op.drop_column("source")
+        batch_op.drop_column("slot_id")
+
+    op.execute(
+        """
+        UPDATE appointments
+        SET booking_source = COALESCE(booking_source, CASE source WHEN 'WALK_IN' THEN 'WALKIN' ELSE 'ONLINE' END),
+            priority = COALESCE(priority, CASE priority_rank WHEN 1 THEN 'PAID_PRIORITY' WHEN 2 THEN 'FOLLOW_UP'
+                                                             ELSE 'NORMAL' END)
+        """
+    )
+    op.execute("UPDATE appointments SET status = 'COMPLETED' WHERE status = 'SERVED'")
+    with op.batch_alter_table("appointments") as batch_op:
+        batch_op.alter_column("priority", existing_type=sa.String(), nullable=False)
+        batch_op.alter_column("booking_source", existing_type=sa.String(), nullable=False)
+        batch_op.drop_column("priority_rank")
+        batch_op.drop_column("source")
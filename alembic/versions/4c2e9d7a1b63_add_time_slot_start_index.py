@@ -0,0 +1,26 @@
+"""add time_slots.start_time index for the capacity planner
+
+Revision ID: 4c2e9d7a1b63
+Revises: bae3ff03c4f1
+Create Date: 2026-10-18 14:02:11.406392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4c2e9d7a1b63"
+down_revision: Union[str, None] = "bae3ff03c4f1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # all doctors' slots in [from, to)
+    op.create_index("ix_time_slots_start", "time_slots", ["start_time"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_time_slots_start", table_name="time_slots")
@@ -0,0 +1,29 @@
+"""add SERVE to eventtype
+
+Revision ID: 5d7c1e2b9a40
+Revises: 9e5b3f0c2d18
+Create Date: 2026-10-18 16:02:11.408913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5d7c1e2b9a40"
+down_revision: Union[str, None] = "9e5b3f0c2d18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # event_logs.event_type is a native enum on Postgres only (VARCHAR on SQLite)
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE eventtype ADD VALUE IF NOT EXISTS 'SERVE'")
+
+
+def downgrade() -> None:
+    # Postgres can't drop an enum value; leaving it in place is harmless
+    pass
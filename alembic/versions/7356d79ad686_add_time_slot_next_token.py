@@ -0,0 +1,41 @@
+"""add time_slots.next_token counter
+
+Revision ID: 7356d79ad686
+Revises: 2e8b4c1f9d07
+Create Date: 2026-10-18 10:05:12.418230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7356d79ad686"
+down_revision: Union[str, None] = "2e8b4c1f9d07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "time_slots",
+        sa.Column("next_token", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+    # seed the counter from tokens already handed out
+    op.execute(
+        """
+        UPDATE time_slots
+        SET next_token = COALESCE(
+            (SELECT MAX(tokens.token_number) FROM tokens WHERE tokens.slot_id = time_slots.id), 0
+        ) + 1
+        """
+    )
+
+
+def downgrade() -> None:
+    # SQLite can't DROP COLUMN in place -> batch mode
+    with op.batch_alter_table("time_slots") as batch_op:
+        batch_op.drop_column("next_token")
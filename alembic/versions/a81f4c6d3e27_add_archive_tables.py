@@ -0,0 +1,79 @@
+"""add archive tables for finished slots
+
+Revision ID: a81f4c6d3e27
+Revises: 5d7c1e2b9a40
+Create Date: 2026-10-18 17:21:40.552107
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a81f4c6d3e27"
+down_revision: Union[str, None] = "5d7c1e2b9a40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # range-partitioned by month on Postgres (partitions are created by the
+    # archival job as it needs them); plain tables elsewhere
+    op.create_table(
+        "archived_time_slots",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("start_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("doctor_id", sa.Integer(), nullable=False),
+        sa.Column("end_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("capacity", sa.Integer(), nullable=False),
+        sa.Column("next_token", sa.Integer(), nullable=False),
+        sa.Column("booked_count", sa.Integer(), nullable=False),
+        sa.Column("served_count", sa.Integer(), nullable=False),
+        sa.Column("cancelled_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id", "start_time"),
+        postgresql_partition_by="RANGE (start_time)",
+    )
+    op.create_index(
+        "ix_archived_time_slots_doctor_start", "archived_time_slots", ["doctor_id", "start_time"], unique=False
+    )
+
+    op.create_table(
+        "archived_appointments",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("slot_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("doctor_id", sa.Integer(), nullable=False),
+        sa.Column("patient_id", sa.Integer(), nullable=False),
+        sa.Column("slot_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("priority_rank", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id", "slot_start"),
+        postgresql_partition_by="RANGE (slot_start)",
+    )
+    op.create_index("ix_archived_appointments_patient", "archived_appointments", ["patient_id"], unique=False)
+
+    op.create_table(
+        "archived_tokens",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("slot_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("appointment_id", sa.Integer(), nullable=False),
+        sa.Column("slot_id", sa.Integer(), nullable=False),
+        sa.Column("token_number", sa.Integer(), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id", "slot_start"),
+        postgresql_partition_by="RANGE (slot_start)",
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("archived_tokens")
+    op.drop_index("ix_archived_appointments_patient", table_name="archived_appointments")
+    op.drop_table("archived_appointments")
+    op.drop_index("ix_archived_time_slots_doctor_start", table_name="archived_time_slots")
+    op.drop_table("archived_time_slots")
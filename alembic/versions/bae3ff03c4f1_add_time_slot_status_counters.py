@@ -0,0 +1,48 @@
+"""add time_slots booked/served/cancelled counters
+
+Revision ID: bae3ff03c4f1
+Revises: 1dc20a2137f8
+Create Date: 2026-10-18 12:14:03.551872
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "bae3ff03c4f1"
+down_revision: Union[str, None] = "1dc20a2137f8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTERS = {
+    "booked_count": "BOOKED",
+    "served_count": "SERVED",
+    "cancelled_count": "CANCELLED",
+}
+
+
+def upgrade() -> None:
+    for column in COUNTERS:
+        op.add_column("time_slots", sa.Column(column, sa.Integer(), nullable=False, server_default="0"))
+
+    # seed from the appointment rows
+    for column, status in COUNTERS.items():
+        op.execute(
+            f"""
+            UPDATE time_slots
+            SET {column} = (
+                SELECT COUNT(*) FROM appointments
+                WHERE appointments.slot_id = time_slots.id AND appointments.status = '{status}'
+            )
+            """
+        )
+
+
+def downgrade() -> None:
+    # SQLite can't DROP COLUMN in place -> batch mode
+    with op.batch_alter_table("time_slots") as batch_op:
+        for column in reversed(list(COUNTERS)):
+            batch_op.drop_column(column)
@@ -0,0 +1,67 @@
+"""add no-show counter and per-doctor no-show stats
+
+Revision ID: c3f8a2d5e614
+Revises: a81f4c6d3e27
+Create Date: 2026-10-18 19:02:11.318406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f8a2d5e614"
+down_revision: Union[str, None] = "a81f4c6d3e27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("time_slots", sa.Column("no_show_count", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("archived_time_slots", sa.Column("no_show_count", sa.Integer(), nullable=False, server_default="0"))
+    op.execute(
+        """
+        UPDATE time_slots
+        SET no_show_count = (
+            SELECT COUNT(*) FROM appointments
+            WHERE appointments.slot_id = time_slots.id AND appointments.status = 'NO_SHOW'
+        )
+        """
+    )
+
+    op.create_table(
+        "no_show_stats",
+        sa.Column("doctor_id", sa.Integer(), nullable=False),
+        sa.Column("source", sa.String(), nullable=False),
+        sa.Column("outcomes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("no_shows", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("(CURRENT_TIMESTAMP)"), nullable=False),
+        sa.ForeignKeyConstraint(["doctor_id"], ["doctors.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("doctor_id", "source"),
+    )
+
+    # seed from the outcomes recorded so far (live and archived appointments)
+    for table in ("appointments", "archived_appointments"):
+        op.execute(
+            f"""
+            INSERT INTO no_show_stats (doctor_id, source, outcomes, no_shows)
+            SELECT doctor_id, source, COUNT(*), SUM(CASE WHEN status = 'NO_SHOW' THEN 1 ELSE 0 END)
+            FROM {table}
+            WHERE status IN ('SERVED', 'NO_SHOW')
+            GROUP BY doctor_id, source
+            ON CONFLICT (doctor_id, source) DO UPDATE
+            SET outcomes = no_show_stats.outcomes + excluded.outcomes,
+                no_shows = no_show_stats.no_shows + excluded.no_shows
+            """
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("no_show_stats")
+    # SQLite can't DROP COLUMN in place -> batch mode
+    with op.batch_alter_table("archived_time_slots") as batch_op:
+        batch_op.drop_column("no_show_count")
+    with op.batch_alter_table("time_slots") as batch_op:
+        batch_op.drop_column("no_show_count")
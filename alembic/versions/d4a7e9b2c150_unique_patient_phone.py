@@ -0,0 +1,87 @@
+"""unique index on patients.phone
+
+Revision ID: d4a7e9b2c150
+Revises: c3f8a2d5e614
+Create Date: 2026-10-18 10:44:18.305611
+
+The booking upsert (services/patients.upsert_patient) is
+INSERT ... ON CONFLICT (phone), which needs a unique index on the column;
+201b664e1433 created ``phone`` without one. It also left ``patient_uid``
+NOT NULL, which the models no longer write.
+
+Before that, existing phones are normalized the way bookings are
+(services/patients.normalize_phone), so "+91 98765-43210" and "9876543210"
+become the same number. Patients that then share a phone are the same
+patient to the app, so each group is merged into its lowest id: its
+appointments (live and archived) move over and the other rows go. Phones
+that don't parse are left as they are. The downgrade keeps the normalized
+phones and merged patients.
+
+"""
+import logging
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.patients import normalize_phone
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a7e9b2c150"
+down_revision: Union[str, None] = "c3f8a2d5e614"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def _in_others(sql: str) -> sa.TextClause:
+    return sa.text(sql).bindparams(sa.bindparam("others", expanding=True))
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # 1) normalize, grouping patients by the phone they end up with
+    by_phone = defaultdict(list)
+    for patient_id, phone in conn.execute(sa.text("SELECT id, phone FROM patients WHERE phone IS NOT NULL ORDER BY id")):
+        try:
+            normalized = normalize_phone(phone)
+        except ValueError:
+            normalized = phone
+        by_phone[normalized].append((patient_id, phone))
+
+    # 2) one row per phone: the lowest id keeps its name, takes the others' appointments
+    merged = 0
+    for normalized, patients in by_phone.items():
+        (keep, phone), others = patients[0], [patient_id for patient_id, _ in patients[1:]]
+        if others:
+            for table in ("appointments", "archived_appointments"):
+                conn.execute(
+                    _in_others(f"UPDATE {table} SET patient_id = :keep WHERE patient_id IN :others"),
+                    {"keep": keep, "others": others},
+                )
+            conn.execute(_in_others("DELETE FROM patients WHERE id IN :others"), {"others": others})
+            merged += len(others)
+        if normalized != phone:
+            conn.execute(sa.text("UPDATE patients SET phone = :phone WHERE id = :id"), {"phone": normalized, "id": keep})
+    if merged:
+        logger.info("merged %d patient(s) into another with the same phone", merged)
+
+    # 3) phones are unique now
+    op.create_index(op.f("ix_patients_phone"), "patients", ["phone"], unique=True)
+
+    # SQLite can't ALTER COLUMN in place -> batch mode
+    with op.batch_alter_table("patients") as batch_op:
+        batch_op.alter_column("patient_uid", existing_type=sa.String(), nullable=True)
+
+
+def downgrade() -> None:
+    # patients created since the upgrade have no uid; give them one
+    op.execute("UPDATE patients SET patient_uid = 'P' || id WHERE patient_uid IS NULL")
+    with op.batch_alter_table("patients") as batch_op:
+        batch_op.alter_column("patient_uid", existing_type=sa.String(), nullable=False)
+
+    op.drop_index(op.f("ix_patients_phone"), table_name="patients")
@@ -0,0 +1,29 @@
+"""add the indexes the archival job looks rows up by
+
+Revision ID: e6c1a9f3b872
+Revises: d4a7e9b2c150
+Create Date: 2026-10-18 16:20:37.118904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e6c1a9f3b872"
+down_revision: Union[str, None] = "d4a7e9b2c150"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # finished slots, oldest first
+    op.create_index("ix_time_slots_end", "time_slots", ["end_time"], unique=False)
+    # every appointment of a slot, whatever its status (the partial index only has BOOKED ones)
+    op.create_index("ix_appointments_slot", "appointments", ["slot_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_appointments_slot", table_name="appointments")
+    op.drop_index("ix_time_slots_end", table_name="time_slots")
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.models.entities import Doctor, TimeSlot
 from app.schemas.doctor import DoctorCreate, DoctorResponse
-from app.schemas.slot import TimeSlotResponse, TimeSlotCreate
+from app.schemas.slot import DoctorsScheduleCreate, ScheduleCreate, ScheduleResult, TimeSlotResponse, TimeSlotCreate
+from app.services.read_cache import CachedBody, etag_matches, read_cache
+from app.services.schedule import SCHEDULE_CONFLICT, create_schedule
+from app.services.slot_resolver import slot_resolver
 
 # routers
 from app.api.v1.booking import router as booking_router
 from app.api.v1.queue import router as queue_router
 from app.api.v1.appointments import router as appointment_router
+from app.api.v1.async_endpoints import router as async_router
+from app.api.v1.capacity import router as capacity_router
 
 router = APIRouter()
 
@@ -17,6 +25,26 @@ router = APIRouter()
 router.include_router(booking_router, tags=["Booking"])
 router.include_router(queue_router, tags=["Queue"])
 router.include_router(appointment_router, tags=["Appointments"])
+router.include_router(async_router, prefix="/async", tags=["Async"])
+router.include_router(capacity_router, tags=["Capacity"])
+
+
+DOCTOR_LIST = TypeAdapter(list[DoctorResponse])
+SLOT_LIST = TypeAdapter(list[TimeSlotResponse])
+
+
+def _cached_response(cached: CachedBody, if_none_match: str | None) -> Response:
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def _utc(value: datetime | None) -> datetime | None:
+    # filters are compared against UTC-stored columns
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
 
 
 @router.get("/test")
@@ -27,8 +55,14 @@ def test_api():
 # ---------------- DOCTORS ----------------
 
 @router.get("/doctors", response_model=list[DoctorResponse])
-def list_doctors(db: Session = Depends(get_db)):
-    return db.query(Doctor).order_by(Doctor.id.asc()).all()
+def list_doctors(db: Session = Depends(get_db), if_none_match: str | None = Header(None)):
+    # serialized once per version; clients revalidate with If-None-Match
+    cached = read_cache.get_or_build(
+        "doctors",
+        "all",
+        lambda: DOCTOR_LIST.dump_json(db.query(Doctor).order_by(Doctor.id.asc()).all()),
+    )
+    return _cached_response(cached, if_none_match)
 
 
 @router.post("/doctors", response_model=DoctorResponse)
@@ -46,23 +80,48 @@ def create_doctor(payload: DoctorCreate, db: Session = Depends(get_db)):
     db.add(doctor)
     db.commit()
     db.refresh(doctor)
+    read_cache.bump("doctors")
     return doctor
 
 
 # ---------------- SLOTS ----------------
 
 @router.get("/doctors/{doctor_id}/slots", response_model=list[TimeSlotResponse])
-def get_doctor_slots(doctor_id: int, db: Session = Depends(get_db)):
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
-    if not doctor:
-        raise HTTPException(status_code=404, detail="Doctor not found")
-
-    return (
-        db.query(TimeSlot)
-        .filter(TimeSlot.doctor_id == doctor_id)
-        .order_by(TimeSlot.start_time.asc())
-        .all()
-    )
+def get_doctor_slots(
+    doctor_id: int,
+    start_from: datetime | None = Query(
+        None, description="only slots starting at/after this time; by default, slots that haven't ended yet"
+    ),
+    start_before: datetime | None = Query(None, description="only slots starting before this time"),
+    limit: int = Query(100, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    if_none_match: str | None = Header(None),
+):
+    start_from, start_before = _utc(start_from), _utc(start_before)
+    # without start_from, skip slots that have ended so the first page isn't
+    # the oldest history; whole minutes keep the cache key stable between calls
+    ended_by = None
+    if start_from is None:
+        ended_by = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+
+    def build() -> bytes:
+        doctor = db.query(Doctor.id).filter(Doctor.id == doctor_id).first()
+        if not doctor:
+            raise HTTPException(status_code=404, detail="Doctor not found")
+
+        query = db.query(TimeSlot).filter(TimeSlot.doctor_id == doctor_id)
+        if start_from is not None:
+            query = query.filter(TimeSlot.start_time >= start_from)
+        else:
+            query = query.filter(TimeSlot.end_time > ended_by)
+        if start_before is not None:
+            query = query.filter(TimeSlot.start_time < start_before)
+        slots = query.order_by(TimeSlot.start_time.asc()).offset(offset).limit(limit).all()
+        return SLOT_LIST.dump_json(slots)
+
+    cached = read_cache.get_or_build(("slots", doctor_id), (start_from, ended_by, start_before, limit, offset), build)
+    return _cached_response(cached, if_none_match)
 
 
 @router.post("/doctors/{doctor_id}/slots", response_model=TimeSlotResponse)
@@ -80,4 +139,30 @@ def create_slot(doctor_id: int, payload: TimeSlotCreate, db: Session = Depends(g
     db.add(slot)
     db.commit()
     db.refresh(slot)
+
+    # the new slot may now be the doctor's current one
+    slot_resolver.invalidate(doctor_id)
+    read_cache.bump(("slots", doctor_id))
     return slot
+
+
+def _schedule_response(results: list[dict] | None, error: str | None) -> list[dict]:
+    if error == SCHEDULE_CONFLICT:
+        conflicts = [ScheduleResult(**r).model_dump(mode="json") for r in results or [] if r["conflicts"]]
+        raise HTTPException(status_code=409, detail={"message": error, "doctors": conflicts})
+    if error == "Doctor not found":
+        raise HTTPException(status_code=404, detail=error)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+    return results
+
+
+@router.post("/doctors/{doctor_id}/slots/schedule", response_model=ScheduleResult)
+def create_doctor_schedule(doctor_id: int, payload: ScheduleCreate, db: Session = Depends(get_db)):
+    # template expanded + inserted in one go instead of a POST per slot
+    return _schedule_response(*create_schedule(db, [doctor_id], payload))[0]
+
+
+@router.post("/slots/schedule", response_model=list[ScheduleResult])
+def create_schedules(payload: DoctorsScheduleCreate, db: Session = Depends(get_db)):
+    return _schedule_response(*create_schedule(db, payload.doctor_ids, payload))
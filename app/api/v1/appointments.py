@@ -1,38 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlalchemy.orm import Session
 
+from app.api.v1.idempotency import idempotent
 from app.core.database import get_db
-from app.models.entities import Appointment
 from app.schemas.appointment import AppointmentResponse
+from app.services.appointment_status import APPOINTMENT_NOT_FOUND, change_status
+from app.services.idempotency import fingerprint
 
 router = APIRouter()
 
 
-@router.patch("/appointments/{appointment_id}/cancel", response_model=AppointmentResponse)
-def cancel_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    appt = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-    if not appt:
-        raise HTTPException(status_code=404, detail="Appointment not found")
+def appointment_response(appt, error) -> AppointmentResponse:
+    if error:
+        raise HTTPException(status_code=404 if error == APPOINTMENT_NOT_FOUND else 400, detail=error)
+    return AppointmentResponse.model_validate(appt)
 
-    if appt.status != "BOOKED":
-        raise HTTPException(status_code=400, detail=f"Cannot cancel appointment in status {appt.status}")
 
-    appt.status = "CANCELLED"
-    db.commit()
-    db.refresh(appt)
-    return appt
+@router.patch("/appointments/{appointment_id}/cancel", response_model=AppointmentResponse)
+def cancel_appointment(
+    appointment_id: int,
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None),
+):
+    return idempotent(
+        db,
+        idempotency_key,
+        fingerprint(f"cancel:{appointment_id}"),
+        lambda: appointment_response(*change_status(db, appointment_id, "CANCELLED")),
+    )
 
 
 @router.patch("/appointments/{appointment_id}/serve", response_model=AppointmentResponse)
-def serve_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    appt = db.query(Appointment).filter(Appointment.id == appointment_id).first()
-    if not appt:
-        raise HTTPException(status_code=404, detail="Appointment not found")
-
-    if appt.status != "BOOKED":
-        raise HTTPException(status_code=400, detail=f"Cannot serve appointment in status {appt.status}")
-
-    appt.status = "SERVED"
-    db.commit()
-    db.refresh(appt)
-    return appt
+def serve_appointment(
+    appointment_id: int,
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None),
+):
+    return idempotent(
+        db,
+        idempotency_key,
+        fingerprint(f"serve:{appointment_id}"),
+        lambda: appointment_response(*change_status(db, appointment_id, "SERVED")),
+    )
+
+
+@router.patch("/appointments/{appointment_id}/no-show", response_model=AppointmentResponse)
+def mark_no_show(
+    appointment_id: int,
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None),
+):
+    # called but never turned up: frees the seat and counts towards the doctor's no-show rate
+    return idempotent(
+        db,
+        idempotency_key,
+        fingerprint(f"no-show:{appointment_id}"),
+        lambda: appointment_response(*change_status(db, appointment_id, "NO_SHOW")),
+    )
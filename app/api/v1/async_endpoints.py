@@ -0,0 +1,119 @@
+"""asyncio versions of the booking, queue and appointment endpoints.
+
+Same behaviour as the sync handlers, but on an AsyncSession (aiosqlite /
+asyncpg), so a request waiting on the DB doesn't hold a threadpool worker.
+Mounted under ``/api/v1/async``.
+"""
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.v1.booking import booking_response
+from app.api.v1.appointments import appointment_response
+from app.api.v1.idempotency import idempotent_async
+from app.api.v1.queue import _queue_json, _queue_payload
+from app.core.database import get_async_db
+from app.models.entities import Doctor, TimeSlot
+from app.schemas.appointment import AppointmentResponse
+from app.schemas.booking import BookingRequest, BookingResponse
+from app.schemas.queue import QueueColumnarResponse, QueueResponse
+from app.services.appointment_status import change_status
+from app.services.idempotency import fingerprint
+from app.services.queue_engine import queue_engine
+from app.services.slot_counters import QUEUE_VERSION
+from app.services.slot_resolver import slot_resolver
+from app.services.token_engine import allocate_token, async_token_allocator
+
+router = APIRouter()
+
+
+@router.post("/book", response_model=BookingResponse)
+async def book_token_async(
+    payload: BookingRequest,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: str | None = Header(None),
+):
+    async def book():
+        # the shared allocation engine, run over the async connection (greenlet)
+        result, error = await db.run_sync(
+            allocate_token,
+            doctor_id=payload.doctor_id,
+            patient_name=payload.patient_name,
+            patient_phone=payload.patient_phone,
+            source=payload.source,
+            allocator=async_token_allocator,
+        )
+        return booking_response(result, error)
+
+    return await idempotent_async(db, idempotency_key, fingerprint("book", payload.model_dump_json()), book)
+
+
+@router.get("/doctors/{doctor_id}/queue", response_model=QueueResponse | QueueColumnarResponse)
+async def get_queue_async(
+    doctor_id: int,
+    format: Literal["rows", "columnar"] = Query("rows", description="columnar: one list per token field"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if not await db.get(Doctor, doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    slot = await slot_resolver.current_slot_async(db, doctor_id)
+    if not slot:
+        raise HTTPException(status_code=404, detail="No slot found for this doctor")
+
+    # next token straight from the per-slot counter, the queue version with it
+    row = (await db.execute(select(TimeSlot.next_token, QUEUE_VERSION).where(TimeSlot.id == slot.id))).first()
+    next_token, version = row if row is not None else (None, None)
+    if version is not None and not queue_engine.is_current(doctor_id, slot.id, version):
+        # another worker booked / served / cancelled since
+        await db.run_sync(queue_engine.reload_slot, doctor_id, slot.id, version)
+    return _queue_json(_queue_payload(doctor_id, slot, next_token, columnar=format == "columnar"))
+
+
+async def _change_status(db: AsyncSession, appointment_id: int, status: str) -> AppointmentResponse:
+    # the shared transition, run over the async connection (greenlet)
+    return appointment_response(*await db.run_sync(change_status, appointment_id, status))
+
+
+@router.patch("/appointments/{appointment_id}/cancel", response_model=AppointmentResponse)
+async def cancel_appointment_async(
+    appointment_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: str | None = Header(None),
+):
+    return await idempotent_async(
+        db,
+        idempotency_key,
+        fingerprint(f"cancel:{appointment_id}"),
+        lambda: _change_status(db, appointment_id, "CANCELLED"),
+    )
+
+
+@router.patch("/appointments/{appointment_id}/serve", response_model=AppointmentResponse)
+async def serve_appointment_async(
+    appointment_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: str | None = Header(None),
+):
+    return await idempotent_async(
+        db,
+        idempotency_key,
+        fingerprint(f"serve:{appointment_id}"),
+        lambda: _change_status(db, appointment_id, "SERVED"),
+    )
+
+
+@router.patch("/appointments/{appointment_id}/no-show", response_model=AppointmentResponse)
+async def mark_no_show_async(
+    appointment_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: str | None = Header(None),
+):
+    return await idempotent_async(
+        db,
+        idempotency_key,
+        fingerprint(f"no-show:{appointment_id}"),
+        lambda: _change_status(db, appointment_id, "NO_SHOW"),
+    )
@@ -1,143 +1,99 @@
-from datetime import datetime, timezone
+import json
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from sqlalchemy.exc import IntegrityError
 
+from app.api.v1.idempotency import idempotent
 from app.core.database import get_db
-from app.models.entities import Doctor, TimeSlot, Patient, Appointment, Token
-from app.schemas.booking import BookingRequest, BookingResponse
+from app.schemas.booking import BookingRequest, BookingResponse, BulkBookingResult
+from app.services.bulk_booking import book_bulk
+from app.services.idempotency import fingerprint
+from app.services.token_engine import allocate_token
 
 router = APIRouter()
 
+MAX_BULK_ROWS = 5000
+
+
+# allocate_token error -> HTTP status (anything else is a 400)
+BOOKING_ERROR_STATUS = {
+    "Doctor not found": 404,
+    "Booking conflict. Try again.": 409,
+}
+
+
+def booking_response(result, error) -> BookingResponse:
+    if error:
+        raise HTTPException(status_code=BOOKING_ERROR_STATUS.get(error, 400), detail=error)
+    return BookingResponse(**result)
+
 
 @router.post("/book", response_model=BookingResponse)
-def book_token(payload: BookingRequest, db: Session = Depends(get_db)):
-    # 1) doctor exists
-    doctor = db.query(Doctor).filter(Doctor.id == payload.doctor_id).first()
-    if not doctor:
-        raise HTTPException(status_code=404, detail="Doctor not found")
-
-    # 2) doctor active
-    if not doctor.is_active:
-        raise HTTPException(status_code=400, detail="Doctor is not active")
-
-    now = datetime.now(timezone.utc)
-
-    # 3) pick earliest slot that is NOT ended
-    slot = (
-        db.query(TimeSlot)
-        .filter(TimeSlot.doctor_id == doctor.id)
-        .order_by(TimeSlot.start_time.asc())
-        .all()
-    )
-
-    if not slot:
-        raise HTTPException(status_code=400, detail="No slots available for this doctor")
-
-    # choose first slot that hasn't ended
-    active_slot = None
-    for s in slot:
-        end_time = s.end_time
-        if end_time.tzinfo is None:
-            end_time = end_time.replace(tzinfo=timezone.utc)
-
-        if end_time > now:
-            active_slot = s
-            break
-
-    if not active_slot:
-        raise HTTPException(status_code=400, detail="All doctor slots already ended")
-
-    slot = active_slot
-
-    # normalize slot times
-    slot_start = slot.start_time
-    if slot_start.tzinfo is None:
-        slot_start = slot_start.replace(tzinfo=timezone.utc)
-
-    slot_end = slot.end_time
-    if slot_end.tzinfo is None:
-        slot_end = slot_end.replace(tzinfo=timezone.utc)
-
-    # 4) Get or create patient by phone
-    patient = db.query(Patient).filter(Patient.phone == payload.patient_phone).first()
-    if not patient:
-        patient = Patient(name=payload.patient_name, phone=payload.patient_phone)
-        db.add(patient)
-        db.commit()
-        db.refresh(patient)
-
-    # 5) Prevent duplicate booking (same patient + same slot)
-    existing_appt = (
-        db.query(Appointment)
-        .filter(
-            Appointment.patient_id == patient.id,
-            Appointment.slot_id == slot.id,
-            Appointment.status == "BOOKED",
+def book_token(
+    payload: BookingRequest,
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None),
+):
+    def book():
+        # seat + token number + appointment in one transaction (services/token_engine)
+        result, error = allocate_token(
+            db,
+            doctor_id=payload.doctor_id,
+            patient_name=payload.patient_name,
+            patient_phone=payload.patient_phone,
+            source=payload.source,
         )
-        .first()
-    )
-    if existing_appt:
-        raise HTTPException(status_code=400, detail="Patient already has a booking in this slot")
-
-    # 6) Capacity check (count only BOOKED)
-    booked_count = (
-        db.query(func.count(Appointment.id))
-        .filter(Appointment.slot_id == slot.id, Appointment.status == "BOOKED")
-        .scalar()
-    )
-    if booked_count >= slot.capacity:
-        raise HTTPException(status_code=400, detail="Slot is full")
-
-    # 7) Create appointment
-    appointment = Appointment(
-        doctor_id=doctor.id,
-        patient_id=patient.id,
-        slot_id=slot.id,
-        status="BOOKED",
-    )
-    db.add(appointment)
-    db.commit()
-    db.refresh(appointment)
-
-    # 8) Allocate token number safely (retry once if conflict)
-    for _ in range(2):
-        try:
-            last_token = (
-                db.query(func.max(Token.token_number))
-                .filter(Token.slot_id == slot.id)
-                .scalar()
-            )
-            token_number = (last_token or 0) + 1
-
-            token = Token(
-                appointment_id=appointment.id,
-                slot_id=slot.id,
-                token_number=token_number,
-                source=payload.source,
-            )
-
-            db.add(token)
-            db.commit()
-            db.refresh(token)
-            break
-
-        except IntegrityError:
-            db.rollback()
-            continue
+        return booking_response(result, error)
+
+    return idempotent(db, idempotency_key, fingerprint("book", payload.model_dump_json()), book)
+
+
+@router.post("/book/bulk", response_model=list[BulkBookingResult])
+async def book_tokens_bulk(request: Request, db: Session = Depends(get_db)):
+    """Book many patients at once.
+
+    Body is either a JSON array of booking requests or, with
+    ``Content-Type: application/x-ndjson``, one booking request per line.
+    Returns one result per row (token or error), in input order.
+    """
+    if "ndjson" in request.headers.get("content-type", ""):
+        rows = [line async for line in _ndjson_lines(request)]
+        parse = BookingRequest.model_validate_json
     else:
-        raise HTTPException(status_code=500, detail="Token allocation failed. Try again.")
-
-    # 9) Estimated time
-    slot_duration = slot_end - slot_start
-    per_patient = slot_duration / slot.capacity
-    estimated_time = slot_start + (token.token_number - 1) * per_patient
-
-    return BookingResponse(
-        appointment_id=appointment.id,
-        token_number=token.token_number,
-        slot_id=slot.id,
-        estimated_time=estimated_time,
-    )
+        try:
+            rows = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        parse = BookingRequest.model_validate
+
+    if len(rows) > MAX_BULK_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ROWS} rows per request")
+
+    errors, items = [], []
+    for index, row in enumerate(rows):
+        try:
+            items.append((index, parse(row)))
+        except ValidationError as exc:
+            err = exc.errors()[0]
+            field = ".".join(str(part) for part in err["loc"])
+            detail = f"{field}: {err['msg']}" if field else err["msg"]
+            errors.append({"index": index, "error": f"Invalid row: {detail}"})
+
+    results = await run_in_threadpool(book_bulk, db, items) if items else []
+    return sorted(errors + results, key=lambda result: result["index"])
+
+
+async def _ndjson_lines(request: Request):
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
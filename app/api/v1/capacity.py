@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.services.capacity import capacity_report, stream_capacity
+
+router = APIRouter()
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+@router.get("/capacity")
+def get_capacity(
+    start: datetime | None = Query(None, alias="from", description="window start (default: now)"),
+    end: datetime | None = Query(None, alias="to", description="window end (default: from + 7 days)"),
+    department: str | None = Query(None, description="doctor specialization"),
+    db: Session = Depends(get_db),
+):
+    # 1) window
+    # (default start rounded to the minute so repeated dashboard polls share a cache entry)
+    start = _utc(start) if start else datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    end = _utc(end) if end else start + timedelta(days=7)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if end - start > timedelta(days=settings.capacity_max_days):
+        raise HTTPException(status_code=400, detail=f"Window is limited to {settings.capacity_max_days} days")
+
+    # 2) short window: one cached document
+    if end - start <= timedelta(days=settings.capacity_cache_max_days):
+        return Response(content=capacity_report(db, start, end, department), media_type="application/json")
+
+    # 3) long window: stream rows as they are read
+    return StreamingResponse(stream_capacity(db.get_bind(), start, end, department), media_type="application/json")
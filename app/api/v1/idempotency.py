@@ -0,0 +1,92 @@
+"""``Idempotency-Key`` handling shared by the booking and appointment routes.
+
+Without the header a route runs as before. With it, the first request runs
+and its response (2xx or a final 4xx) is stored; a retry with the same key
+and the same request gets that response back with ``Idempotent-Replayed:
+true`` instead of booking / serving a second time.
+"""
+import json
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.services.idempotency import StoredResponse, idempotency_store
+
+MAX_KEY_LENGTH = 255
+
+# IdempotencyStore.claim error -> HTTP status
+IDEMPOTENCY_ERROR_STATUS = {
+    "Idempotency-Key was already used for a different request": 422,
+    "A request with this Idempotency-Key is still being processed": 409,
+}
+
+
+def _check_key(key: str) -> None:
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+
+def _claimed(stored: StoredResponse | None, error: str | None) -> Response | None:
+    if error:
+        raise HTTPException(status_code=IDEMPOTENCY_ERROR_STATUS.get(error, 400), detail=error)
+    if stored is None:
+        return None
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _body(result) -> str:
+    return json.dumps(jsonable_encoder(result))
+
+
+def idempotent(db: Session, key: str | None, fp: str, handler: Callable[[], object]):
+    """Run ``handler()`` once per ``key``; replay its stored response after that."""
+    if key is None:
+        return handler()
+    _check_key(key)
+
+    replay = _claimed(*idempotency_store.claim(db, key, fp))
+    if replay is not None:
+        return replay
+
+    try:
+        result = handler()
+    except HTTPException as exc:
+        idempotency_store.complete(db, key, fp, exc.status_code, _body({"detail": exc.detail}))
+        raise
+    except Exception:
+        idempotency_store.release(db, key)
+        raise
+
+    idempotency_store.complete(db, key, fp, 200, _body(result))
+    return result
+
+
+async def idempotent_async(db: AsyncSession, key: str | None, fp: str, handler: Callable[[], Awaitable[object]]):
+    """``idempotent`` for AsyncSession routes (the store runs through run_sync)."""
+    if key is None:
+        return await handler()
+    _check_key(key)
+
+    replay = _claimed(*await db.run_sync(idempotency_store.claim, key, fp))
+    if replay is not None:
+        return replay
+
+    try:
+        result = await handler()
+    except HTTPException as exc:
+        await db.run_sync(idempotency_store.complete, key, fp, exc.status_code, _body({"detail": exc.detail}))
+        raise
+    except Exception:
+        await db.run_sync(idempotency_store.release, key)
+        raise
+
+    await db.run_sync(idempotency_store.complete, key, fp, 200, _body(result))
+    return result
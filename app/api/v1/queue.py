@@ -1,75 +1,217 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from datetime import datetime, timezone
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from pydantic_core import to_json
 from sqlalchemy.orm import Session
-from sqlalchemy import asc, func
 
 from app.core.database import get_db
-from app.models.entities import Doctor, TimeSlot, Appointment, Token, Patient
-from app.schemas.queue import QueueResponse, QueueTokenItem
+from app.models.entities import Doctor, TimeSlot, Appointment
+from app.schemas.appointment import AppointmentResponse
+from app.schemas.queue import QueueColumnarResponse, QueueColumns, QueueResponse, QueueTokenItem
+from app.services.queue_engine import QueueEntry, queue_engine
+from app.api.v1.idempotency import idempotent
+from app.services.appointment_status import leave_booked
+from app.services.idempotency import fingerprint
+from app.services.queue_events import queue_events
+from app.services.slot_counters import QUEUE_VERSION
+from app.services.slot_resolver import SlotInfo, slot_resolver
+from app.services.wait_estimator import wait_estimator
 
 router = APIRouter()
 
 
-@router.get("/doctors/{doctor_id}/queue", response_model=QueueResponse)
-def get_queue(doctor_id: int, db: Session = Depends(get_db)):
+def _current_slot(db: Session, doctor_id: int) -> SlotInfo:
     # 1) Check doctor exists
-    doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
+    doctor = db.query(Doctor.id).filter(Doctor.id == doctor_id).first()
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
 
-    # 2) Get earliest slot for doctor
-    slot = (
-        db.query(TimeSlot)
-        .filter(TimeSlot.doctor_id == doctor_id)
-        .order_by(TimeSlot.start_time.asc())
-        .first()
-    )
+    # 2) Current (earliest not-ended) slot, same one booking uses
+    slot = slot_resolver.current_slot(db, doctor_id)
     if not slot:
         raise HTTPException(status_code=404, detail="No slot found for this doctor")
+    return slot
+
 
-    # 3) Join tokens -> appointment -> patient
-    rows = (
-        db.query(Token, Appointment, Patient)
-        .join(Appointment, Appointment.id == Token.appointment_id)
-        .join(Patient, Patient.id == Appointment.patient_id)
-        .filter(Token.slot_id == slot.id)
-        .order_by(asc(Token.token_number))
-        .all()
+def _token_item(entry: QueueEntry) -> QueueTokenItem:
+    return QueueTokenItem(
+        appointment_id=entry.appointment_id,
+        patient_name=entry.patient_name,
+        patient_phone=entry.patient_phone,
+        token_number=entry.token_number,
+        source=entry.source,
+        priority_rank=entry.priority_rank,
+        created_at=entry.created_at,
     )
 
-    # 4) Build queue list (only BOOKED)
-    tokens = []
-    for token, appt, patient in rows:
-        if appt.status != "BOOKED":
-            continue
-
-        tokens.append(
-            QueueTokenItem(
-                appointment_id=appt.id,
-                patient_name=patient.name,
-                patient_phone=patient.phone,
-                token_number=token.token_number,
-                created_at=token.created_at,
-            )
-        )
 
-    # 5) booked means number of currently waiting patients (BOOKED)
-    booked = len(tokens)
+# QueueTokenItem field order; the columnar format names each column
+TOKEN_FIELDS = tuple(QueueTokenItem.model_fields)
+TOKEN_COLUMNS = tuple(QueueColumns.model_fields)
 
-    # ✅ Correct next token logic: max token_number + 1
-    last_token = (
-        db.query(func.max(Token.token_number))
-        .filter(Token.slot_id == slot.id)
-        .scalar()
-    )
-    next_token = (last_token or 0) + 1
-
-    return QueueResponse(
-        doctor_id=doctor_id,
-        slot_id=slot.id,
-        slot_start_time=slot.start_time,
-        slot_end_time=slot.end_time,
-        capacity=slot.capacity,
-        booked=booked,
-        next_token_number=next_token,
-        tokens=tokens,
+
+def _queue_payload(doctor_id: int, slot: SlotInfo, next_token: int, columnar: bool = False) -> dict:
+    """The queue as plain dicts / lists, ready for ``to_json``.
+
+    Same shape as ``QueueResponse`` (or ``QueueColumnarResponse``) without
+    building a model per waiting patient.
+    """
+    # 3) Waiting tokens straight from the in-memory queue, by token number, each
+    # with its place in call order (kept up to date by the engine, no sort here)
+    ranked = queue_engine.ranked(doctor_id, slot.id)
+
+    # 4) ETAs from the doctor's observed service time (slot length / capacity until known)
+    per_patient, etas = wait_estimator.etas(
+        doctor_id,
+        len(ranked),
+        now=datetime.now(timezone.utc),
+        slot_start=slot.start_time,
+        fallback=(slot.end_time - slot.start_time) / slot.capacity,
     )
+    rows = [
+        (
+            entry.appointment_id,
+            entry.patient_name,
+            entry.patient_phone,
+            entry.token_number,
+            entry.source,
+            entry.priority_rank,
+            entry.created_at,
+            position,
+            etas[position],
+        )
+        for entry, position in ranked
+    ]
+
+    if columnar:
+        tokens = dict(zip(TOKEN_COLUMNS, map(list, zip(*rows)))) if rows else {name: [] for name in TOKEN_COLUMNS}
+    else:
+        tokens = [dict(zip(TOKEN_FIELDS, row)) for row in rows]
+
+    return {
+        "doctor_id": doctor_id,
+        "slot_id": slot.id,
+        "slot_start_time": slot.start_time,
+        "slot_end_time": slot.end_time,
+        "capacity": slot.capacity,
+        # booked means number of currently waiting patients (BOOKED)
+        "booked": len(rows),
+        "next_token_number": next_token,
+        "avg_service_minutes": round(per_patient.total_seconds() / 60, 2),
+        "tokens": tokens,
+    }
+
+
+def _queue_json(payload: dict) -> Response:
+    # serialized in one go: no per-token model, no second validation pass
+    return Response(to_json(payload), media_type="application/json")
+
+
+def _sync_queue(db: Session, doctor_id: int, slot_id: int) -> int | None:
+    """Catch this worker's queue up with the DB; returns the slot's next token number."""
+    # next token straight from the per-slot counter, the queue version with it
+    row = db.query(TimeSlot.next_token, QUEUE_VERSION).filter(TimeSlot.id == slot_id).first()
+    if row is None:
+        return None
+    next_token, version = row
+    if not queue_engine.is_current(doctor_id, slot_id, version):
+        # another worker booked / served / cancelled since
+        queue_engine.reload_slot(db, doctor_id, slot_id, version)
+    return next_token
+
+
+def _queue_snapshot(db: Session, doctor_id: int, columnar: bool = False) -> dict:
+    slot = _current_slot(db, doctor_id)
+    next_token = _sync_queue(db, doctor_id, slot.id)
+    return _queue_payload(doctor_id, slot, next_token, columnar)
+
+
+@router.get("/doctors/{doctor_id}/queue", response_model=QueueResponse | QueueColumnarResponse)
+def get_queue(
+    doctor_id: int,
+    format: Literal["rows", "columnar"] = Query("rows", description="columnar: one list per token field"),
+    db: Session = Depends(get_db),
+):
+    return _queue_json(_queue_snapshot(db, doctor_id, columnar=format == "columnar"))
+
+
+@router.get("/doctors/{doctor_id}/queue/next", response_model=QueueTokenItem)
+def get_next_in_queue(doctor_id: int, db: Session = Depends(get_db)):
+    slot = _current_slot(db, doctor_id)
+    _sync_queue(db, doctor_id, slot.id)
+
+    entry = queue_engine.peek_next(doctor_id, slot.id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Queue is empty")
+    return _token_item(entry)
+
+
+@router.post("/doctors/{doctor_id}/queue/serve-next", response_model=AppointmentResponse)
+def serve_next_in_queue(
+    doctor_id: int,
+    db: Session = Depends(get_db),
+    idempotency_key: str | None = Header(None),
+):
+    # a retried "call next" must not call a second patient
+    return idempotent(db, idempotency_key, fingerprint(f"serve-next:{doctor_id}"), lambda: _serve_next(db, doctor_id))
+
+
+def _serve_next(db: Session, doctor_id: int) -> AppointmentResponse:
+    slot = _current_slot(db, doctor_id)
+    slot_id = slot.id
+    # the patient may have been booked through another worker
+    _sync_queue(db, doctor_id, slot_id)
+
+    while True:
+        entry = queue_engine.pop_next(doctor_id, slot_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Queue is empty")
+
+        try:
+            served = leave_booked(db, entry.appointment_id, doctor_id, slot_id, entry.source, "SERVED")
+        except Exception:
+            db.rollback()
+            queue_engine.add(doctor_id, slot_id, entry)
+            raise
+
+        # served / cancelled elsewhere in the meantime -> call the next one
+        if served:
+            return AppointmentResponse.model_validate(db.get(Appointment, entry.appointment_id))
+
+
+@router.websocket("/doctors/{doctor_id}/queue/ws")
+async def queue_stream(websocket: WebSocket, doctor_id: int, db: Session = Depends(get_db)):
+    """Push a queue snapshot on connect, then added/served/cancelled diffs."""
+    await websocket.accept()
+
+    # subscribe before the snapshot so no change falls in between
+    sub = queue_events.subscribe(doctor_id)
+    try:
+        try:
+            queue = await run_in_threadpool(_queue_snapshot, db, doctor_id)
+        except HTTPException as exc:
+            await websocket.close(code=4404, reason=exc.detail)
+            return
+        finally:
+            # nothing else touches the DB for the life of the socket
+            db.close()
+        await websocket.send_text(to_json({"type": "snapshot", "queue": queue}).decode())
+
+        async def forward():
+            while True:
+                await websocket.send_json(await sub.queue.get())
+
+        sender = asyncio.create_task(forward())
+        try:
+            # displays never talk back; this only notices the disconnect
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+    finally:
+        queue_events.unsubscribe(sub)
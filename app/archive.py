@@ -0,0 +1,29 @@
+"""Move finished slots older than the retention window to the archive tables.
+
+    python -m app.archive                      # settings.archive_retention_days
+    python -m app.archive --retention-days 90 --batch-size 200
+
+Safe to run while the app is serving (e.g. nightly from cron): each batch
+is its own short transaction and only slots nobody is waiting in are moved.
+"""
+import argparse
+import json
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.archival import archive_finished_slots
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--retention-days", type=float, default=settings.archive_retention_days)
+    parser.add_argument("--batch-size", type=int, default=settings.archive_batch_size)
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        totals = archive_finished_slots(db, args.retention_days, args.batch_size)
+    print(json.dumps(totals))
+
+
+if __name__ == "__main__":
+    main()
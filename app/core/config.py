@@ -5,6 +5,79 @@ class Settings(BaseSettings):
     app_name: str = "Medoc OPD Token Allocation Engine"
     database_url: str = "sqlite:///./medoc.db"
 
+    # connection pool (ignored for in-memory SQLite)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800  # seconds, -1 = never
+    db_pool_pre_ping: bool = True
+    db_statement_timeout_ms: int = 0  # Postgres only, 0 = no limit
+
+    # SQLite tuning, applied on every new connection
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+
+    # minutes of waiting that make up for one priority rank step (0 = strict priority)
+    queue_aging_minutes: float = 0
+
+    # service-time EWMA behind queue ETAs (gaps longer than max_gap are breaks)
+    service_ewma_alpha: float = 0.2
+    service_min_samples: int = 3
+    service_max_gap_minutes: float = 60
+
+    # how long a worker trusts its cached "current slot" per doctor
+    slot_cache_ttl_seconds: float = 60
+
+    # serialized doctor / slot listings (bumped on writes, TTL covers other workers)
+    read_cache_ttl_seconds: float = 30
+    read_cache_max_entries: int = 1024
+
+    # GET /capacity: windows up to cache_max_days are cached, longer ones streamed
+    capacity_cache_ttl_seconds: float = 10
+    capacity_cache_max_days: float = 2
+    capacity_max_days: int = 92
+
+    # token numbering: "db" (counter row per booking), "lock" (slot locked up front; for
+    # several worker processes) or "block" (in-process, N numbers per refill; one process)
+    token_allocator: str = "db"
+    token_block_size: int = 32
+    # a booking that loses a lock race is run again this many times, then it's a 409
+    booking_retries: int = 3
+
+    # Idempotency-Key on booking / serve / cancel: stored responses, purged every cleanup_interval
+    idempotency_ttl_hours: float = 24
+    idempotency_cache_size: int = 2048
+    idempotency_claim_timeout_seconds: float = 60
+    idempotency_cleanup_interval_seconds: float = 300
+
+    # event_logs audit trail: buffered in-process, written in batches by a background thread
+    event_log_batch_size: int = 500
+    event_log_flush_seconds: float = 1.0
+    event_log_max_pending: int = 100_000
+
+    # patient phones are stored as national numbers (other countries keep +<code>)
+    phone_country_code: str = "91"
+    phone_national_digits: int = 10
+    # phone -> patient id of recent patients (follow-ups skip the patients lookup)
+    patient_cache_size: int = 10_000
+
+    # finished slots older than this move to the archived_* tables (python -m app.archive)
+    archive_retention_days: float = 30
+    archive_batch_size: int = 500
+
+    # overbooking: sources listed here may book capacity / (1 - no-show rate) seats, at most
+    # capacity x (1 + max_ratio); a doctor needs min_samples served / no-show outcomes first
+    overbooking_sources: list[str] = ["WALK_IN", "PRIORITY"]
+    overbooking_max_ratio: float = 0.25
+    overbooking_min_samples: int = 30
+    overbooking_cache_ttl_seconds: float = 300
+
+    # schedule templates: rule times are clinic local time; one request covers at most max_days
+    clinic_timezone: str = "Asia/Kolkata"
+    schedule_max_days: int = 92
+
     class Config:
         env_file = ".env"
 
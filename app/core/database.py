@@ -1,12 +1,121 @@
-from sqlalchemy import create_engine
+from threading import Lock
+from time import perf_counter
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-DATABASE_URL = "sqlite:///./medoc.db"
+from app.core.config import Settings, settings
+from app.core.pool_metrics import TimedAsyncQueuePool, TimedQueuePool
+from app.core.request_metrics import current_stats
+
+DATABASE_URL = settings.database_url
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    """Map a sync DB URL onto its asyncio driver (aiosqlite / asyncpg)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def _engine_options(url: str, config: Settings, is_async: bool) -> dict:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    options: dict = {}
+
+    if backend == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}  # required for SQLite
+        if parsed.database in (None, "", ":memory:"):
+            # one shared in-memory DB: keep SQLAlchemy's default pool
+            return options
+    elif backend == "postgresql" and config.db_statement_timeout_ms:
+        timeout = str(config.db_statement_timeout_ms)
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_timeout=config.db_pool_timeout,
+        pool_recycle=config.db_pool_recycle,
+        pool_pre_ping=config.db_pool_pre_ping,
+    )
+    return options
+
+
+def _tune_sqlite(engine: Engine, config: Settings) -> None:
+    if engine.dialect.name != "sqlite":
+        return
+
+    pragmas = (
+        f"PRAGMA journal_mode={config.sqlite_journal_mode}",
+        f"PRAGMA synchronous={config.sqlite_synchronous}",
+        f"PRAGMA busy_timeout={int(config.sqlite_busy_timeout_ms)}",
+        f"PRAGMA mmap_size={int(config.sqlite_mmap_size)}",
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def _track_statements(engine: Engine) -> None:
+    # per-request statement / DB time / commit / row counts (see request_metrics)
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if current_stats() is not None:
+            conn.info["query_started"] = perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stats = current_stats()
+        started = conn.info.pop("query_started", None)
+        if stats is None or started is None:
+            return
+        stats.statements += 1
+        stats.db_seconds += perf_counter() - started
+        if cursor.rowcount > 0:
+            stats.rows += cursor.rowcount
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False},  # required for SQLite
-)
+    @event.listens_for(engine, "commit")
+    def _commit(conn):
+        stats = current_stats()
+        if stats is not None:
+            stats.commits += 1
+
+
+def make_engine(url: str = DATABASE_URL, config: Settings = settings) -> Engine:
+    engine = create_engine(url, **_engine_options(url, config, is_async=False))
+    _tune_sqlite(engine, config)
+    _track_statements(engine)
+    return engine
+
+
+def make_async_engine(url: str = DATABASE_URL, config: Settings = settings) -> AsyncEngine:
+    url = async_url(url)
+    engine = create_async_engine(url, **_engine_options(url, config, is_async=True))
+    _tune_sqlite(engine.sync_engine, config)
+    _track_statements(engine.sync_engine)
+    return engine
+
+
+engine = make_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -19,3 +128,37 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ---------------- ASYNC ----------------
+# created on first use: a deployment that never serves the /async routes
+# doesn't need the async driver (asyncpg for Postgres) installed
+
+_async_engine: AsyncEngine | None = None
+_async_sessions: async_sessionmaker | None = None
+_async_lock = Lock()
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine, _async_sessions
+    if _async_engine is None:
+        with _async_lock:
+            if _async_engine is None:
+                engine = make_async_engine()
+                # expire_on_commit=False: attributes can't be lazy-loaded under asyncio
+                _async_sessions = async_sessionmaker(
+                    engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+                )
+                _async_engine = engine
+    return _async_engine
+
+
+def current_async_engine() -> AsyncEngine | None:
+    """The async engine if anything has used it yet (health / metrics don't create it)."""
+    return _async_engine
+
+
+async def get_async_db():
+    get_async_engine()
+    async with _async_sessions() as db:
+        yield db
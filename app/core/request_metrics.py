@@ -0,0 +1,160 @@
+"""Per-request DB statistics, Server-Timing and the Prometheus /metrics text.
+
+The engine hooks in ``app.core.database`` add every statement / commit to the
+``RequestStats`` of the request being served (found through a ContextVar, so
+sync handlers in the threadpool and async handlers both land in the right
+place). ``RequestMetricsMiddleware`` opens those stats, writes them into a
+``Server-Timing`` header and folds them into per-route aggregates.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from threading import Lock
+from time import perf_counter
+
+# Prometheus' default latency buckets (seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclass(slots=True)
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+    commits: int = 0
+    rows: int = 0  # rows reported by the driver (INSERT/UPDATE/DELETE rowcount)
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> RequestStats | None:
+    return _current.get()
+
+
+class RouteStats:
+    __slots__ = ("buckets", "count", "seconds", "statements", "db_seconds", "commits", "rows")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last one is +Inf
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.commits = 0
+        self.rows = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = Lock()
+        self.routes: dict[tuple[str, str, str], RouteStats] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        key = (method, route, f"{status // 100}xx")
+        with self._lock:
+            entry = self.routes.get(key)
+            if entry is None:
+                entry = self.routes[key] = RouteStats()
+            entry.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            entry.count += 1
+            entry.seconds += seconds
+            entry.statements += stats.statements
+            entry.db_seconds += stats.db_seconds
+            entry.commits += stats.commits
+            entry.rows += stats.rows
+
+    def clear(self) -> None:
+        with self._lock:
+            self.routes.clear()
+
+    def render(self, pools: dict[str, dict] | None = None) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        lines = [
+            "# HELP opd_http_request_duration_seconds Request latency by route.",
+            "# TYPE opd_http_request_duration_seconds histogram",
+        ]
+        counters = {
+            "opd_http_db_statements_total": ("SQL statements issued by route.", "statements"),
+            "opd_http_db_seconds_total": ("Time spent executing SQL by route.", "db_seconds"),
+            "opd_http_db_commits_total": ("Commits by route.", "commits"),
+            "opd_http_db_rows_total": ("Rows written by route.", "rows"),
+        }
+
+        with self._lock:
+            routes = sorted(self.routes.items())
+            for (method, route, status), entry in routes:
+                labels = f'method="{method}",route="{route}",status="{status}"'
+                cumulative = 0
+                for le, n in zip((*LATENCY_BUCKETS, "+Inf"), entry.buckets):
+                    cumulative += n
+                    lines.append(f'opd_http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"opd_http_request_duration_seconds_sum{{{labels}}} {entry.seconds}")
+                lines.append(f"opd_http_request_duration_seconds_count{{{labels}}} {entry.count}")
+
+            for name, (help_text, attr) in counters.items():
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (method, route, status), entry in routes:
+                    labels = f'method="{method}",route="{route}",status="{status}"'
+                    lines.append(f"{name}{{{labels}}} {getattr(entry, attr)}")
+
+        if pools:
+            gauges = {
+                "opd_db_pool_checked_out": "checked_out",
+                "opd_db_pool_saturation": "saturation",
+                "opd_db_pool_checkouts_total": "checkouts",
+                "opd_db_pool_checkout_timeouts_total": "checkout_timeouts",
+                "opd_db_pool_checkout_wait_max_ms": "checkout_wait_max_ms",
+            }
+            for name, key in gauges.items():
+                kind = "counter" if name.endswith("_total") else "gauge"
+                lines.append(f"# TYPE {name} {kind}")
+                for label, status in pools.items():
+                    if key in status:
+                        lines.append(f'{name}{{pool="{label}"}} {status[key]}')
+
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry()
+
+
+def server_timing(stats: RequestStats, total_seconds: float) -> str:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.statements} queries, {stats.commits} commits", '
+        f"app;dur={total_seconds * 1000:.2f}"
+    )
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI middleware: no extra task or body buffering per request."""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                header = server_timing(stats, perf_counter() - started).encode()
+                message["headers"] = [*message.get("headers", ()), (b"server-timing", header)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            # route template, not the raw path, keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.registry.observe(scope["method"], route, status_code, perf_counter() - started, stats)
+
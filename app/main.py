@@ -1,8 +1,65 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from app.api.routes import router as api_router
+from app.core.config import settings
+from app.core.database import SessionLocal, current_async_engine, engine
+from app.core.pool_metrics import pool_status
+from app.core.request_metrics import RequestMetricsMiddleware, metrics_registry
+from app.services.event_log import event_log
+from app.services.idempotency import idempotency_store
+from app.services.overbooking import overbooking_policy
+from app.services.patients import patient_cache
+from app.services.queue_engine import queue_engine
+from app.services.token_engine import token_allocator
+
+logger = logging.getLogger(__name__)
+
+
+def _purge_idempotency_keys() -> int:
+    with SessionLocal() as db:
+        return idempotency_store.purge_expired(db)
+
+
+async def _purge_idempotency_keys_periodically(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(_purge_idempotency_keys)
+        except Exception:  # a failed sweep is retried on the next tick
+            logger.exception("idempotency key purge failed")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # warm the in-memory live queue from the DB
+    with SessionLocal() as db:
+        queue_engine.rebuild(db)
+    # audit events are written in batches by a background thread
+    event_log.start(SessionLocal)
+    # expired Idempotency-Key responses are deleted in the background
+    cleanup = asyncio.create_task(
+        _purge_idempotency_keys_periodically(settings.idempotency_cleanup_interval_seconds)
+    )
+    yield
+    cleanup.cancel()
+    event_log.stop()
+    # give back token numbers reserved in-process but never used
+    with SessionLocal() as db:
+        token_allocator.close(db)
+    async_engine = current_async_engine()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
-app = FastAPI(title="Medoc OPD Token Allocation Engine", version="0.1.0")
+app = FastAPI(title="Medoc OPD Token Allocation Engine", version="0.1.0", lifespan=lifespan)
+
+# SQL statements / DB time per request -> Server-Timing header + /metrics
+app.add_middleware(RequestMetricsMiddleware)
 
 
 @app.get("/")
@@ -15,6 +72,33 @@ def health_check():
     return {"status": "ok"}
 
 
+def _pools() -> dict[str, dict]:
+    pools = {"sync": pool_status(engine, "sync")}
+    async_engine = current_async_engine()
+    # the async engine only exists once an /async route has been used
+    pools["async"] = pool_status(async_engine.sync_engine, "async") if async_engine else {"pool": None}
+    return pools
+
+
+@app.get("/health/db")
+def db_pool_health():
+    # checkout latency + saturation of both connection pools
+    return {
+        **_pools(),
+        "token_allocator": {"name": token_allocator.name, **token_allocator.stats.snapshot()},
+        "event_log": event_log.snapshot(),
+        "patient_cache": patient_cache.snapshot(),
+        "overbooking": overbooking_policy.snapshot(),
+        # slots reloaded because another worker changed them
+        "queue_reloads": queue_engine.reloads,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    # Prometheus text format: per-route latency histograms, DB counters, pool stats
+    return PlainTextResponse(metrics_registry.render(_pools()), media_type="text/plain; version=0.0.4")
+
+
 # API routes
 app.include_router(api_router, prefix="/api/v1")
-
@@ -4,10 +4,13 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
+    Text,
     Boolean,
     DateTime,
     ForeignKey,
+    Index,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -22,6 +25,15 @@ class TokenSource(str, Enum):
     WALK_IN = "WALK_IN"
 
 
+class EventType(str, Enum):
+    BOOK = "BOOK"
+    CANCEL = "CANCEL"
+    SERVE = "SERVE"
+    NO_SHOW = "NO_SHOW"
+    EMERGENCY_INSERT = "EMERGENCY_INSERT"
+    DOCTOR_DELAY = "DOCTOR_DELAY"
+
+
 def source_to_rank(source: str) -> int:
     mapping = {
         "PRIORITY": 1,
@@ -59,6 +71,16 @@ class TimeSlot(Base):
     end_time = Column(DateTime(timezone=True), nullable=False)
 
     capacity = Column(Integer, nullable=False)
+
+    # next token number to hand out in this slot (bumped with UPDATE ... RETURNING)
+    next_token = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # appointment counts by status, kept in step with every book/serve/cancel
+    booked_count = Column(Integer, nullable=False, default=0, server_default="0")
+    served_count = Column(Integer, nullable=False, default=0, server_default="0")
+    cancelled_count = Column(Integer, nullable=False, default=0, server_default="0")
+    no_show_count = Column(Integer, nullable=False, default=0, server_default="0")
+
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     doctor = relationship("Doctor", back_populates="slots")
@@ -67,7 +89,13 @@ class TimeSlot(Base):
     tokens = relationship("Token", back_populates="slot", cascade="all, delete-orphan")
 
     __table_args__ = (
+        # (doctor_id, start_time) lookups are served by this constraint's index
         UniqueConstraint("doctor_id", "start_time", "end_time", name="uq_doctor_slot"),
+        Index("ix_time_slots_doctor_end", "doctor_id", "end_time"),
+        # capacity planner: every doctor's slots in a date window
+        Index("ix_time_slots_start", "start_time"),
+        # archival: finished slots, oldest first
+        Index("ix_time_slots_end", "end_time"),
     )
 
 
@@ -107,6 +135,25 @@ class Appointment(Base):
 
     token = relationship("Token", back_populates="appointment", uselist=False, cascade="all, delete-orphan")
 
+    # partial indexes: only waiting (BOOKED) rows are ever looked up on the hot path
+    __table_args__ = (
+        Index(
+            "ix_appointments_slot_booked",
+            "slot_id",
+            sqlite_where=text("status = 'BOOKED'"),
+            postgresql_where=text("status = 'BOOKED'"),
+        ),
+        Index(
+            "ix_appointments_patient_slot_booked",
+            "patient_id",
+            "slot_id",
+            sqlite_where=text("status = 'BOOKED'"),
+            postgresql_where=text("status = 'BOOKED'"),
+        ),
+        # archival moves every appointment of a slot, whatever its status
+        Index("ix_appointments_slot", "slot_id"),
+    )
+
 
 class Token(Base):
     __tablename__ = "tokens"
@@ -127,3 +174,119 @@ class Token(Base):
     __table_args__ = (
         UniqueConstraint("slot_id", "token_number", name="uq_slot_token_number"),
     )
+
+
+# ---- archive: finished slots moved out of the live tables (services/archival) ----
+# Same columns as the live tables plus the slot's start time, which is the
+# range-partition key on Postgres (one partition per month).
+
+
+class ArchivedTimeSlot(Base):
+    __tablename__ = "archived_time_slots"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    start_time = Column(DateTime(timezone=True), primary_key=True)
+
+    doctor_id = Column(Integer, nullable=False)
+    end_time = Column(DateTime(timezone=True), nullable=False)
+    capacity = Column(Integer, nullable=False)
+    next_token = Column(Integer, nullable=False)
+    booked_count = Column(Integer, nullable=False)
+    served_count = Column(Integer, nullable=False)
+    cancelled_count = Column(Integer, nullable=False)
+    no_show_count = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_archived_time_slots_doctor_start", "doctor_id", "start_time"),
+        {"postgresql_partition_by": "RANGE (start_time)"},
+    )
+
+
+class ArchivedAppointment(Base):
+    __tablename__ = "archived_appointments"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    slot_start = Column(DateTime(timezone=True), primary_key=True)
+
+    doctor_id = Column(Integer, nullable=False)
+    patient_id = Column(Integer, nullable=False)
+    slot_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False)
+    source = Column(String, nullable=False)
+    priority_rank = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # a patient's visit history
+        Index("ix_archived_appointments_patient", "patient_id"),
+        {"postgresql_partition_by": "RANGE (slot_start)"},
+    )
+
+
+class ArchivedToken(Base):
+    __tablename__ = "archived_tokens"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    slot_start = Column(DateTime(timezone=True), primary_key=True)
+
+    appointment_id = Column(Integer, nullable=False)
+    slot_id = Column(Integer, nullable=False)
+    token_number = Column(Integer, nullable=False)
+    source = Column(String, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = ({"postgresql_partition_by": "RANGE (slot_start)"},)
+
+
+class EventLog(Base):
+    """Append-only audit trail of queue transitions (written by services/event_log)."""
+
+    __tablename__ = "event_logs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_type = Column(String, nullable=False)
+
+    doctor_id = Column(Integer, nullable=True)
+    slot_id = Column(Integer, nullable=True)
+    appointment_id = Column(Integer, nullable=True)
+    # JSON details (BOOK: the queue entry, so the queue can be replayed from the log)
+    message = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class IdempotencyKey(Base):
+    """Response of a request sent with an Idempotency-Key, replayed on retries."""
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    # hash of scope + body: the same key with another request is rejected
+    fingerprint = Column(String, nullable=False)
+
+    # NULL while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class NoShowStat(Base):
+    """Running SERVED / NO_SHOW totals per doctor and source (services/overbooking)."""
+
+    __tablename__ = "no_show_stats"
+
+    doctor_id = Column(Integer, ForeignKey("doctors.id", ondelete="CASCADE"), primary_key=True)
+    source = Column(String, primary_key=True)
+
+    # appointments that reached SERVED or NO_SHOW, and how many of them were no-shows
+    outcomes = Column(Integer, nullable=False, default=0, server_default="0")
+    no_shows = Column(Integer, nullable=False, default=0, server_default="0")
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
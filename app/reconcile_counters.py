@@ -0,0 +1,24 @@
+import sys
+
+from app.core.database import SessionLocal
+from app.services.slot_counters import reconcile
+
+
+def main(fix: bool = False) -> int:
+    with SessionLocal() as db:
+        drift = reconcile(db, fix=fix)
+
+    for d in drift:
+        print(f"slot {d['slot_id']}: stored {d['stored']} != actual {d['actual']}")
+
+    if not drift:
+        print("✅ Slot counters match appointment rows")
+    elif fix:
+        print(f"🔧 Fixed counters on {len(drift)} slot(s)")
+    else:
+        print(f"⚠️ {len(drift)} slot(s) drifted (re-run with --fix to repair)")
+    return 1 if drift and not fix else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(fix="--fix" in sys.argv[1:]))
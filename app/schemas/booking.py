@@ -1,7 +1,9 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from enum import Enum
 
+from app.services.patients import normalize_phone
+
 
 class TokenSource(str, Enum):
     ONLINE = "ONLINE"
@@ -16,9 +18,24 @@ class BookingRequest(BaseModel):
     patient_phone: str
     source: TokenSource = TokenSource.ONLINE
 
+    @field_validator("patient_phone")
+    @classmethod
+    def normalize_phone(cls, value: str) -> str:
+        # once, on the way in: "+91 98765 43210" and "9876543210" are one patient
+        return normalize_phone(value)
+
 
 class BookingResponse(BaseModel):
     appointment_id: int
     token_number: int
     slot_id: int
     estimated_time: datetime
+
+
+class BulkBookingResult(BaseModel):
+    index: int
+    appointment_id: int | None = None
+    token_number: int | None = None
+    slot_id: int | None = None
+    estimated_time: datetime | None = None
+    error: str | None = None
@@ -7,7 +7,11 @@ class QueueTokenItem(BaseModel):
     patient_name: str
     patient_phone: str
     token_number: int
+    source: str
+    priority_rank: int
     created_at: datetime
+    position: int | None = None  # 0 = next to be called
+    estimated_time: datetime | None = None
 
 
 class QueueResponse(BaseModel):
@@ -18,4 +22,31 @@ class QueueResponse(BaseModel):
     capacity: int
     booked: int
     next_token_number: int
+    avg_service_minutes: float | None = None
     tokens: list[QueueTokenItem]
+
+
+class QueueColumns(BaseModel):
+    """The waiting tokens as one list per field (``?format=columnar``)."""
+
+    appointment_ids: list[int]
+    patient_names: list[str]
+    patient_phones: list[str]
+    token_numbers: list[int]
+    sources: list[str]
+    priority_ranks: list[int]
+    created_at: list[datetime]
+    positions: list[int]
+    estimated_times: list[datetime | None]
+
+
+class QueueColumnarResponse(BaseModel):
+    doctor_id: int
+    slot_id: int
+    slot_start_time: datetime
+    slot_end_time: datetime
+    capacity: int
+    booked: int
+    next_token_number: int
+    avg_service_minutes: float | None = None
+    tokens: QueueColumns
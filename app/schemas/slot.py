@@ -1,4 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime, time
+from enum import Enum
+
 from pydantic import BaseModel
 
 
@@ -18,3 +20,49 @@ class TimeSlotResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class Weekday(str, Enum):
+    MON = "MON"
+    TUE = "TUE"
+    WED = "WED"
+    THU = "THU"
+    FRI = "FRI"
+    SAT = "SAT"
+    SUN = "SUN"
+
+
+class ScheduleRule(BaseModel):
+    """e.g. MON-FRI 09:00-13:00, 15-minute slots, capacity 4 (clinic local time)."""
+
+    weekdays: list[Weekday]
+    start: time
+    end: time
+    slot_minutes: int
+    capacity: int
+
+
+class ScheduleCreate(BaseModel):
+    start_date: date
+    end_date: date  # inclusive
+    rules: list[ScheduleRule]
+    timezone: str | None = None  # IANA name, default: settings.clinic_timezone
+    # False: any conflict rejects the whole schedule; True: create the rest
+    skip_conflicts: bool = False
+
+
+class DoctorsScheduleCreate(ScheduleCreate):
+    doctor_ids: list[int]
+
+
+class SlotConflict(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    reason: str  # "exists" (same start/end), "overlap" (existing slot), "template" (two rules overlap)
+    existing_slot_id: int | None = None
+
+
+class ScheduleResult(BaseModel):
+    doctor_id: int
+    created: int
+    conflicts: list[SlotConflict]
@@ -0,0 +1,76 @@
+"""Appointments leaving the queue: serve, cancel, no-show.
+
+Every route that takes a patient out of BOOKED (the sync and async
+appointment routes, serve-next) goes through ``leave_booked``: one
+conditional UPDATE so that of two racing requests only one moves the
+appointment, the slot counters and the no-show history in the same
+transaction, then - once committed - the live queue, its subscribers, the
+audit log and the service-time estimate.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.models.entities import Appointment
+from app.services.event_log import log_left_queue
+from app.services.overbooking import OUTCOME_STATUSES, record_outcome
+from app.services.queue_engine import queue_engine
+from app.services.queue_events import token_removed
+from app.services.slot_counters import leave_queue
+from app.services.wait_estimator import wait_estimator
+
+APPOINTMENT_NOT_FOUND = "Appointment not found"
+
+# for "Cannot <verb> appointment in status ..."
+STATUS_VERBS = {"SERVED": "serve", "CANCELLED": "cancel", "NO_SHOW": "mark no-show for"}
+
+
+def leave_booked(db: Session, appointment_id: int, doctor_id: int, slot_id: int, source: str, status: str) -> bool:
+    """BOOKED -> ``status`` for one appointment, committed.
+
+    Returns False (rolled back, nothing changed) when it had already left
+    the queue.
+    """
+    # 1) conditional UPDATE: only one of two racing requests gets past it
+    changed = db.execute(
+        update(Appointment)
+        .where(Appointment.id == appointment_id, Appointment.status == "BOOKED")
+        .values(status=status)
+    ).rowcount
+    if not changed:
+        db.rollback()
+        return False
+
+    # 2) slot counters + no-show history (services/overbooking), same transaction
+    queue_version = db.execute(leave_queue(slot_id, status)).scalar_one()
+    if status in OUTCOME_STATUSES:
+        db.execute(record_outcome(db.get_bind().dialect.name, doctor_id, source, status))
+    db.commit()
+
+    # 3) live queue, subscribers, audit log and the service-time estimate follow the committed change
+    queue_engine.remove(doctor_id, slot_id, appointment_id)
+    queue_engine.applied(doctor_id, slot_id, queue_version)
+    token_removed(doctor_id, slot_id, appointment_id, status)
+    log_left_queue(doctor_id, slot_id, appointment_id, status)
+    if status == "SERVED":
+        still_waiting = queue_engine.waiting_count(doctor_id, slot_id)
+        wait_estimator.record_serve(doctor_id, datetime.now(timezone.utc), still_waiting)
+    return True
+
+
+def change_status(db: Session, appointment_id: int, status: str):
+    """Serve / cancel / no-show one appointment by id.
+
+    Returns ``(appointment, None)`` or ``(None, error)``.
+    """
+    appt = db.get(Appointment, appointment_id)
+    if appt is None:
+        return None, APPOINTMENT_NOT_FOUND
+
+    if appt.status == "BOOKED":
+        if leave_booked(db, appt.id, appt.doctor_id, appt.slot_id, appt.source, status):
+            return appt, None
+        # lost the race: report the status it has now
+        db.refresh(appt)
+    return None, f"Cannot {STATUS_VERBS[status]} appointment in status {appt.status}"
@@ -0,0 +1,132 @@
+"""Move finished slots out of the live tables.
+
+A slot is finished once it has ended and nobody in it is still BOOKED.
+Finished slots that ended before the retention cut-off are copied, with
+their appointments and tokens, into the ``archived_*`` tables and deleted
+from ``time_slots`` / ``appointments`` / ``tokens``, ``batch_size`` slots per
+transaction, so the tables (and indexes) behind booking and the queue only
+hold recent data and each write transaction stays short.
+
+On Postgres the archive tables are range-partitioned by slot start; the
+monthly partitions a batch needs are created before it is copied.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import DateTime, delete, exists, insert, literal, select, text
+from sqlalchemy.orm import Session
+
+from app.models.entities import (
+    Appointment,
+    ArchivedAppointment,
+    ArchivedTimeSlot,
+    ArchivedToken,
+    TimeSlot,
+    Token,
+)
+from app.services.capacity import capacity_cache
+from app.services.read_cache import read_cache
+
+ARCHIVE_TABLES = ("archived_time_slots", "archived_appointments", "archived_tokens")
+
+
+def finished_slots_query(before: datetime, batch_size: int):
+    still_booked = exists().where(Appointment.slot_id == TimeSlot.id, Appointment.status == "BOOKED")
+    return (
+        select(TimeSlot.id, TimeSlot.doctor_id, TimeSlot.start_time)
+        .where(TimeSlot.end_time < before, ~still_booked)
+        .order_by(TimeSlot.end_time, TimeSlot.id)
+        .limit(batch_size)
+    )
+
+
+def _month_bounds(value: datetime) -> tuple[datetime, datetime]:
+    start = datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+    end = datetime(value.year + value.month // 12, value.month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start, end
+
+
+def ensure_partitions(db: Session, starts: list[datetime]) -> None:
+    """Create the monthly archive partitions covering ``starts`` (Postgres only)."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for month_start, month_end in sorted({_month_bounds(start) for start in starts}):
+        for table in ARCHIVE_TABLES:
+            db.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {table}_{month_start:%Y_%m} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month_start.isoformat()}') TO ('{month_end.isoformat()}')"
+                )
+            )
+
+
+def _copy(db: Session, archive, live, where, **extra) -> None:
+    """INSERT INTO archive SELECT <every live column>, <extra> FROM live."""
+    columns = list(live.__table__.columns)
+    stmt = select(*columns, *extra.values()).where(where)
+    if "slot_start" in extra:
+        stmt = stmt.join(TimeSlot, TimeSlot.id == live.slot_id)
+    db.execute(insert(archive).from_select([c.name for c in columns] + list(extra), stmt))
+
+
+def _archive_batch(db: Session, slot_ids: list[int], now: datetime) -> tuple[int, int]:
+    # by slot, not through tokens: rows from before tokens existed have none
+    appointment_ids = db.scalars(select(Appointment.id).where(Appointment.slot_id.in_(slot_ids))).all()
+
+    # 1) copy
+    _copy(db, ArchivedTimeSlot, TimeSlot, TimeSlot.id.in_(slot_ids), archived_at=literal(now, DateTime(timezone=True)))
+    _copy(db, ArchivedAppointment, Appointment, Appointment.id.in_(appointment_ids), slot_start=TimeSlot.start_time)
+    _copy(db, ArchivedToken, Token, Token.slot_id.in_(slot_ids), slot_start=TimeSlot.start_time)
+
+    # 2) delete, children first
+    tokens = db.execute(
+        delete(Token).where(Token.slot_id.in_(slot_ids)).execution_options(synchronize_session=False)
+    ).rowcount
+    appointments = db.execute(
+        delete(Appointment).where(Appointment.id.in_(appointment_ids)).execution_options(synchronize_session=False)
+    ).rowcount
+    db.execute(delete(TimeSlot).where(TimeSlot.id.in_(slot_ids)).execution_options(synchronize_session=False))
+    return appointments, tokens
+
+
+def archive_finished_slots(
+    db: Session,
+    retention_days: float,
+    batch_size: int = 500,
+    now: datetime | None = None,
+) -> dict:
+    """Archive every finished slot that ended more than ``retention_days`` ago."""
+    now = now or datetime.now(timezone.utc)
+    before = now - timedelta(days=retention_days)
+    totals = {"slots": 0, "appointments": 0, "tokens": 0, "batches": 0}
+    doctors: set[int] = set()
+
+    while True:
+        # 1) next batch of finished slots
+        rows = db.execute(finished_slots_query(before, batch_size)).all()
+        if not rows:
+            break
+        slot_ids = [slot_id for slot_id, _, _ in rows]
+
+        # 2) copy + delete in one transaction per batch
+        try:
+            ensure_partitions(db, [start for _, _, start in rows])
+            appointments, tokens = _archive_batch(db, slot_ids, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        totals["slots"] += len(slot_ids)
+        totals["appointments"] += appointments
+        totals["tokens"] += tokens
+        totals["batches"] += 1
+        doctors.update(doctor_id for _, doctor_id, _ in rows)
+        if len(rows) < batch_size:
+            break
+
+    # 3) cached slot listings / capacity reports may still show them
+    for doctor_id in doctors:
+        read_cache.bump(("slots", doctor_id))
+    if doctors:
+        capacity_cache.bump("capacity")
+    return totals
@@ -0,0 +1,228 @@
+"""Bulk booking for camps / registration drives.
+
+One transaction for the whole batch, with a fixed number of statements no
+matter how many rows come in: one IN query each for doctors, slots, slot
+load and current bookings, one executemany upsert for patients, one
+counter UPDATE per touched slot (``TokenAllocator.reserve_many``: a
+contiguous token range + booked_count), one executemany each for
+appointments and tokens.
+
+Rows follow the single-booking rules: walk-ins & co. may overbook by the
+doctor's no-show rate (services/overbooking) and estimated times come
+from the wait estimator.
+"""
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.models.entities import Appointment, Doctor, TimeSlot, Token, source_to_rank
+from app.schemas.booking import BookingRequest
+from app.services.event_log import log_booked
+from app.services.overbooking import overbooking_policy
+from app.services.patients import patient_cache, upsert_patients
+from app.services.queue_engine import QueueEntry, as_utc, queue_engine
+from app.services.queue_events import token_added
+from app.services.token_engine import token_allocator
+from app.services.wait_estimator import wait_estimator
+
+
+def book_bulk(db: Session, items: list[tuple[int, BookingRequest]]) -> list[dict]:
+    """Book every (index, payload) pair; returns one result dict per pair.
+
+    A row that can't be booked gets ``{"index": i, "error": "..."}`` and
+    doesn't affect the others. When a doctor's current slot fills up, rows
+    spill over to the next slot that hasn't ended.
+    """
+    now = datetime.now(timezone.utc)
+    results: dict[int, dict] = {}
+
+    def fail(index: int, error: str) -> None:
+        results[index] = {"index": index, "error": error}
+
+    # 1) doctors
+    doctor_ids = {payload.doctor_id for _, payload in items}
+    active = dict(db.query(Doctor.id, Doctor.is_active).filter(Doctor.id.in_(doctor_ids)))
+
+    # 2) open slots of those doctors, earliest first
+    slots_by_doctor: dict[int, list[TimeSlot]] = defaultdict(list)
+    open_slots = (
+        db.query(TimeSlot)
+        .filter(
+            TimeSlot.doctor_id.in_([d for d, is_active in active.items() if is_active]),
+            TimeSlot.end_time > now,
+        )
+        .order_by(TimeSlot.doctor_id, TimeSlot.start_time.asc())
+        .all()
+    )
+    for slot in open_slots:
+        slots_by_doctor[slot.doctor_id].append(slot)
+
+    wanted = []
+    for index, payload in items:
+        if payload.doctor_id not in active:
+            fail(index, "Doctor not found")
+        elif not active[payload.doctor_id]:
+            fail(index, "Doctor is not active")
+        elif not slots_by_doctor[payload.doctor_id]:
+            fail(index, "All doctor slots already ended")
+        else:
+            wanted.append((index, payload))
+
+    if not wanted:
+        return _ordered(results)
+
+    # 3) lock the slots: a no-op write (row locks on Postgres, the write
+    # lock on SQLite) so the counts below can't race single bookings
+    slot_ids = [slot.id for slot in open_slots]
+    db.execute(
+        update(TimeSlot)
+        .where(TimeSlot.id.in_(slot_ids))
+        .values(next_token=TimeSlot.next_token)
+        .execution_options(synchronize_session=False)
+    )
+
+    # 4) patients by phone: one executemany upsert, found or created
+    names: dict[str, str] = {}
+    for _, payload in wanted:
+        names.setdefault(payload.patient_phone, payload.patient_name)
+    patients = upsert_patients(db, names)
+
+    # 5) current load of every slot (re-read under the lock) + who is already booked where
+    booked = dict(db.query(TimeSlot.id, TimeSlot.booked_count).filter(TimeSlot.id.in_(slot_ids)))
+    taken = set(
+        db.query(Appointment.patient_id, Appointment.slot_id).filter(
+            Appointment.slot_id.in_(slot_ids),
+            Appointment.patient_id.in_([patient_id for patient_id, _ in patients.values()]),
+            Appointment.status == "BOOKED",
+        )
+    )
+
+    # 6) place rows: first slot with room, spilling over to later ones
+    assigned: dict[int, list] = defaultdict(list)
+    overbook: dict[int, int] = defaultdict(int)  # slot_id -> most extra seats a placed row may use
+    allowances: dict[tuple[int, str, int], int] = {}
+    for index, payload in wanted:
+        patient_id, patient_name = patients[payload.patient_phone]
+        for slot in slots_by_doctor[payload.doctor_id]:
+            key = (payload.doctor_id, payload.source.value, slot.capacity)
+            if key not in allowances:
+                allowances[key] = overbooking_policy.allowance(db, *key)
+            if booked.get(slot.id, 0) + len(assigned[slot.id]) < slot.capacity + allowances[key]:
+                overbook[slot.id] = max(overbook[slot.id], allowances[key])
+                break
+        else:
+            fail(index, "Slot is full")
+            continue
+
+        if (patient_id, slot.id) in taken:
+            fail(index, "Patient already has a booking in this slot")
+            continue
+
+        taken.add((patient_id, slot.id))
+        assigned[slot.id].append((index, payload, patient_id, patient_name))
+
+    # 7) one contiguous token range per slot
+    # (plain values: the ORM objects expire on commit)
+    slots = {
+        slot.id: (slot.id, slot.doctor_id, as_utc(slot.start_time), as_utc(slot.end_time), slot.capacity)
+        for slot in open_slots
+    }
+    placed = []
+    versions = {}  # slot_id -> QUEUE_VERSION after the batch
+    for slot_id, batch in assigned.items():
+        if not batch:
+            continue
+        reservation = token_allocator.reserve_many(db, slot_id, len(batch), overbook[slot_id])
+        if reservation is None:
+            # counted under the lock above, so only if that count was off
+            for index, *_ in batch:
+                fail(index, "Slot is full")
+            continue
+        first, versions[slot_id] = reservation.token_number, reservation.queue_version
+        for offset, row in enumerate(batch):
+            placed.append((slots[slot_id], first + offset, row))
+
+    if not placed:
+        db.commit()
+        return _ordered(results)
+
+    # 8) appointments + tokens, executemany each.
+    # RETURNING rows are matched back on (patient_id, slot_id), which is
+    # unique within the batch; asking for parameter order instead makes
+    # SQLite fall back to one INSERT per row.
+    inserted = db.execute(
+        insert(Appointment).returning(Appointment.id, Appointment.patient_id, Appointment.slot_id),
+        [
+            {
+                "doctor_id": slot[1],
+                "patient_id": patient_id,
+                "slot_id": slot[0],
+                "status": "BOOKED",
+                "source": payload.source.value,
+                "priority_rank": source_to_rank(payload.source.value),
+            }
+            for slot, _, (_, payload, patient_id, _) in placed
+        ],
+    )
+    ids = {(patient_id, slot_id): appointment_id for appointment_id, patient_id, slot_id in inserted}
+    appointment_ids = [ids[(patient_id, slot[0])] for slot, _, (_, _, patient_id, _) in placed]
+
+    db.execute(
+        insert(Token),
+        [
+            {
+                "appointment_id": appointment_id,
+                "slot_id": slot[0],
+                "token_number": token_number,
+                "source": payload.source.value,
+                "created_at": now,
+            }
+            for appointment_id, (slot, token_number, (_, payload, _, _)) in zip(appointment_ids, placed)
+        ],
+    )
+    db.commit()
+    for phone, (patient_id, name) in patients.items():
+        patient_cache.put(phone, patient_id, name)
+
+    # 9) live queue + results
+    for appointment_id, (slot, token_number, (index, payload, _, patient_name)) in zip(appointment_ids, placed):
+        slot_id, doctor_id = slot[0], slot[1]
+        source = payload.source.value
+        entry = QueueEntry(
+            appointment_id=appointment_id,
+            token_number=token_number,
+            patient_name=patient_name,
+            patient_phone=payload.patient_phone,
+            created_at=now,
+            source=source,
+            priority_rank=source_to_rank(source),
+        )
+        queue_engine.add(doctor_id, slot_id, entry)
+        token_added(doctor_id, slot_id, entry)
+        log_booked(doctor_id, slot_id, entry)
+        results[index] = {
+            "index": index,
+            "appointment_id": appointment_id,
+            "token_number": token_number,
+            "slot_id": slot_id,
+        }
+
+    # 10) estimated times: position in call order x the doctor's observed service time
+    for slot_id, version in versions.items():
+        _, doctor_id, slot_start, slot_end, capacity = slots[slot_id]
+        queue_engine.applied(doctor_id, slot_id, version, changes=len(assigned[slot_id]))
+        for index, *_ in assigned[slot_id]:
+            position = queue_engine.position(doctor_id, slot_id, results[index]["appointment_id"])
+            if position is None:  # already served / cancelled by someone else
+                position = queue_engine.waiting_count(doctor_id, slot_id)
+            results[index]["estimated_time"] = wait_estimator.eta(
+                doctor_id, position, now=now, slot_start=slot_start, fallback=(slot_end - slot_start) / capacity
+            )
+
+    return _ordered(results)
+
+
+def _ordered(results: dict[int, dict]) -> list[dict]:
+    return [results[index] for index in sorted(results)]
@@ -0,0 +1,124 @@
+"""Capacity planner: all doctors x all slots in a date window.
+
+One query for the whole window. The per-status counts already live on
+``time_slots`` (booked/served/cancelled/no_show_count, see slot_counters), so it
+is ``time_slots JOIN doctors`` filtered on start_time: no per-doctor round
+trips, and no GROUP BY over the appointments table.
+
+Short windows are cached for ``capacity_cache_ttl_seconds``; long ones are
+streamed row by row with the same JSON shape.
+"""
+import json
+from datetime import datetime
+from typing import Iterator
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import Doctor, TimeSlot
+from app.services.queue_engine import as_utc
+from app.services.read_cache import ReadCache
+
+capacity_cache = ReadCache(ttl_seconds=settings.capacity_cache_ttl_seconds, max_entries=256)
+
+
+def capacity_query(start: datetime, end: datetime, department: str | None = None):
+    stmt = (
+        select(
+            TimeSlot.id,
+            TimeSlot.doctor_id,
+            Doctor.name,
+            Doctor.specialization,
+            TimeSlot.start_time,
+            TimeSlot.end_time,
+            TimeSlot.capacity,
+            TimeSlot.booked_count,
+            TimeSlot.served_count,
+            TimeSlot.cancelled_count,
+            TimeSlot.no_show_count,
+        )
+        .join(Doctor, Doctor.id == TimeSlot.doctor_id)
+        .where(TimeSlot.start_time >= start, TimeSlot.start_time < end)
+        .order_by(TimeSlot.start_time.asc(), TimeSlot.doctor_id.asc())
+    )
+    if department:
+        stmt = stmt.where(Doctor.specialization == department)
+    return stmt
+
+
+def _row(row) -> dict:
+    slot_id, doctor_id, name, department, start_time, end_time, capacity, booked, served, cancelled, no_show = row
+    return {
+        "slot_id": slot_id,
+        "doctor_id": doctor_id,
+        "doctor_name": name,
+        "department": department,
+        "start_time": as_utc(start_time).isoformat(),
+        "end_time": as_utc(end_time).isoformat(),
+        "capacity": capacity,
+        "booked": booked,
+        "served": served,
+        "cancelled": cancelled,
+        "no_show": no_show,
+        # seats taken (waiting + seen) over seats offered
+        "utilization": round((booked + served) / capacity, 3) if capacity else 0.0,
+    }
+
+
+class _Totals:
+    def __init__(self):
+        self.slots = self.capacity = self.booked = self.served = self.cancelled = self.no_show = 0
+
+    def add(self, item: dict) -> None:
+        self.slots += 1
+        self.capacity += item["capacity"]
+        self.booked += item["booked"]
+        self.served += item["served"]
+        self.cancelled += item["cancelled"]
+        self.no_show += item["no_show"]
+
+    def as_dict(self) -> dict:
+        used = self.booked + self.served
+        return {
+            "slots": self.slots,
+            "capacity": self.capacity,
+            "booked": self.booked,
+            "served": self.served,
+            "cancelled": self.cancelled,
+            "no_show": self.no_show,
+            "utilization": round(used / self.capacity, 3) if self.capacity else 0.0,
+        }
+
+
+def _chunks(rows, start: datetime, end: datetime, department: str | None) -> Iterator[str]:
+    header = {"from": start.isoformat(), "to": end.isoformat(), "department": department}
+    yield json.dumps(header)[:-1] + ', "slots": ['
+
+    totals = _Totals()
+    for i, row in enumerate(rows):
+        item = _row(row)
+        totals.add(item)
+        yield ("," if i else "") + json.dumps(item)
+
+    yield '], "totals": ' + json.dumps(totals.as_dict()) + "}"
+
+
+def capacity_report(db: Session, start: datetime, end: datetime, department: str | None = None) -> bytes:
+    """The whole window as one JSON document (cached for short windows)."""
+
+    def build() -> bytes:
+        rows = db.execute(capacity_query(start, end, department))
+        return "".join(_chunks(rows, start, end, department)).encode()
+
+    return capacity_cache.get_or_build("capacity", (start, end, department), build).body
+
+
+def stream_capacity(bind: Engine, start: datetime, end: datetime, department: str | None = None) -> Iterator[bytes]:
+    """Same document, produced while the rows are read (own session: the
+    request's one is closed before a streaming body is sent)."""
+    with Session(bind) as db:
+        rows = db.execute(capacity_query(start, end, department).execution_options(yield_per=500))
+        for chunk in _chunks(rows, start, end, department):
+            yield chunk.encode()
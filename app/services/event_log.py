@@ -0,0 +1,201 @@
+"""Audit trail of queue transitions, written off the request path.
+
+Handlers call ``log_booked`` / ``log_left_queue`` after they commit. That only
+appends a row to an in-process buffer; a background thread flushes the
+buffer every ``event_log_flush_seconds`` (sooner once
+``event_log_batch_size`` rows are waiting) with one executemany INSERT per
+batch, so a booking never waits on the audit insert.
+
+The buffer is bounded by ``event_log_max_pending``: if the DB falls that far
+behind, new events are counted as dropped instead of blocking bookings.
+Events recorded while the writer isn't running (scripts, tests without the
+app lifespan) are ignored.
+
+``replay`` rebuilds the live queue from the log alone.
+"""
+import json
+from dataclasses import asdict
+from datetime import datetime, timezone
+from threading import Event, Lock, Thread
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.models.entities import EventLog, EventType
+from app.services.queue_engine import QueueEngine, QueueEntry, as_utc
+
+# appointment status after leaving the queue -> event
+LEFT_QUEUE_EVENTS = {
+    "SERVED": EventType.SERVE,
+    "CANCELLED": EventType.CANCEL,
+    "NO_SHOW": EventType.NO_SHOW,
+}
+
+
+class EventLogWriter:
+    def __init__(self, batch_size: int = 500, flush_seconds: float = 1.0, max_pending: int = 100_000):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending: list[dict] = []
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._wake = Event()
+        self._stopping = False
+        self._thread: Thread | None = None
+        self._session_factory: sessionmaker | None = None
+        self._stats = {"recorded": 0, "written": 0, "dropped": 0, "batches": 0, "failed_flushes": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._session_factory is not None
+
+    def start(self, session_factory: sessionmaker) -> None:
+        if self.running:
+            return
+        self._session_factory = session_factory
+        self._stopping = False
+        self._thread = Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the worker and write whatever is still buffered."""
+        if not self.running:
+            return
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_seconds + 5)
+        self.flush()
+        self._session_factory = None
+        self._thread = None
+
+    def record(
+        self,
+        event_type: EventType,
+        doctor_id: int | None = None,
+        slot_id: int | None = None,
+        appointment_id: int | None = None,
+        message: str | None = None,
+        at: datetime | None = None,
+    ) -> None:
+        if not self.running:
+            return
+        row = {
+            "event_type": event_type.value,
+            "doctor_id": doctor_id,
+            "slot_id": slot_id,
+            "appointment_id": appointment_id,
+            "message": message,
+            "created_at": at or datetime.now(timezone.utc),
+        }
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._stats["dropped"] += 1
+                return
+            self._pending.append(row)
+            self._stats["recorded"] += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopping:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered so far; returns the number of rows written."""
+        factory = self._session_factory
+        if factory is None:
+            return 0
+
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+
+            written = 0
+            try:
+                with factory() as db:
+                    for start in range(0, len(rows), self.batch_size):
+                        db.execute(insert(EventLog), rows[start : start + self.batch_size])
+                        db.commit()
+                        written = min(start + self.batch_size, len(rows))
+                        with self._lock:
+                            self._stats["batches"] += 1
+            except Exception:
+                # put the unwritten rows back in front; the next tick retries
+                with self._lock:
+                    self._stats["failed_flushes"] += 1
+                    self._pending[:0] = rows[written:]
+            with self._lock:
+                self._stats["written"] += written
+            return written
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self._stats, "pending": len(self._pending)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+
+
+event_log = EventLogWriter(
+    batch_size=settings.event_log_batch_size,
+    flush_seconds=settings.event_log_flush_seconds,
+    max_pending=settings.event_log_max_pending,
+)
+
+
+def log_booked(doctor_id: int, slot_id: int, entry: QueueEntry) -> None:
+    if not event_log.running:
+        return
+    # the whole queue entry, so replay needs nothing but the log
+    details = asdict(entry)
+    del details["created_at"]
+    event_log.record(
+        EventType.BOOK, doctor_id, slot_id, entry.appointment_id, json.dumps(details), at=entry.created_at
+    )
+
+
+def log_left_queue(doctor_id: int, slot_id: int, appointment_id: int, status: str) -> None:
+    event_log.record(LEFT_QUEUE_EVENTS[status], doctor_id, slot_id, appointment_id)
+
+
+def replay(db: Session, queue: QueueEngine) -> int:
+    """Rebuild ``queue`` from the event log alone. Returns the number of events applied."""
+    queue.clear()
+    # another worker may have flushed a serve/cancel before the booking it
+    # belongs to; remember those so the late BOOK isn't re-queued
+    gone: set[int] = set()
+    applied = 0
+
+    rows = db.execute(
+        select(
+            EventLog.event_type,
+            EventLog.doctor_id,
+            EventLog.slot_id,
+            EventLog.appointment_id,
+            EventLog.message,
+            EventLog.created_at,
+        )
+        .order_by(EventLog.id)
+        .execution_options(yield_per=1000)
+    )
+    for event_type, doctor_id, slot_id, appointment_id, message, created_at in rows:
+        if event_type == EventType.BOOK:
+            if appointment_id in gone:
+                continue
+            queue.add(doctor_id, slot_id, QueueEntry(created_at=as_utc(created_at), **json.loads(message)))
+        elif event_type in (EventType.SERVE, EventType.CANCEL, EventType.NO_SHOW):
+            if queue.remove(doctor_id, slot_id, appointment_id) is None:
+                gone.add(appointment_id)
+        else:
+            continue
+        applied += 1
+    return applied
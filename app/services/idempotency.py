@@ -0,0 +1,170 @@
+"""Idempotency-Key storage: replay the first response instead of re-running.
+
+A request with a key first *claims* it (INSERT of a pending row, committed
+on its own), runs, then stores its status + JSON body on the row. A retry
+with the same key gets the stored response back; one that arrives while the
+first is still running gets a 409. Completed responses are also kept in an
+in-process LRU so most replays don't touch the DB. Rows expire after
+``idempotency_ttl_hours``; ``purge_expired`` deletes them (run periodically
+from the app lifespan).
+"""
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import IdempotencyKey
+from app.services.queue_engine import as_utc
+
+# responses worth replaying; 409 / 5xx mean "try again" and release the key
+REPLAYABLE = range(200, 500)
+NOT_REPLAYABLE = {409, 429}
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: str
+    expires_at: datetime
+
+
+def fingerprint(scope: str, body: str = "") -> str:
+    """Hash of what a key was first used for (``"book"`` + payload, ``"serve:12"``).
+
+    Sync and async routes share scopes, so a retry that lands on the other
+    one still replays.
+    """
+    return hashlib.sha256(f"{scope}\n{body}".encode()).hexdigest()
+
+
+def replayable(status_code: int) -> bool:
+    return status_code in REPLAYABLE and status_code not in NOT_REPLAYABLE
+
+
+class IdempotencyStore:
+    def __init__(self, ttl_hours: float = 24, cache_size: int = 2048, claim_timeout_seconds: float = 60):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.cache_size = cache_size
+        self.claim_timeout = timedelta(seconds=claim_timeout_seconds)
+        self._cache: OrderedDict[str, StoredResponse] = OrderedDict()
+        self._lock = Lock()
+
+    def _remember(self, key: str, stored: StoredResponse) -> None:
+        with self._lock:
+            self._cache[key] = stored
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _cached(self, key: str, now: datetime) -> StoredResponse | None:
+        with self._lock:
+            stored = self._cache.get(key)
+            if stored is None:
+                return None
+            if stored.expires_at <= now:
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return stored
+
+    def claim(self, db: Session, key: str, fp: str, now: datetime | None = None):
+        """Claim ``key`` for this request.
+
+        Returns ``(None, None)`` when the caller should run the request,
+        ``(stored, None)`` when a response is there to replay, or
+        ``(None, error)``.
+        """
+        now = now or datetime.now(timezone.utc)
+
+        # 1) LRU (completed responses only)
+        stored = self._cached(key, now)
+        if stored is None:
+            # 2) new key: pending row, committed on its own so retries see it
+            try:
+                db.add(IdempotencyKey(key=key, fingerprint=fp, created_at=now, expires_at=now + self.ttl))
+                db.commit()
+                return None, None
+            except IntegrityError:
+                db.rollback()
+
+            # 3) the key exists: finished, still running, or abandoned
+            row = db.get(IdempotencyKey, key)
+            if row is None:  # expired + purged in between
+                return self.claim(db, key, fp, now)
+            if as_utc(row.expires_at) <= now:
+                db.delete(row)
+                db.commit()
+                return self.claim(db, key, fp, now)
+            if row.fingerprint != fp:
+                return None, "Idempotency-Key was already used for a different request"
+            if row.status_code is None:
+                if as_utc(row.created_at) > now - self.claim_timeout:
+                    return None, "A request with this Idempotency-Key is still being processed"
+                # the first attempt died mid-way: take the key over
+                row.created_at = now
+                db.commit()
+                return None, None
+            stored = StoredResponse(row.fingerprint, row.status_code, row.response_body, as_utc(row.expires_at))
+            self._remember(key, stored)
+
+        if stored.fingerprint != fp:
+            return None, "Idempotency-Key was already used for a different request"
+        return stored, None
+
+    def complete(self, db: Session, key: str, fp: str, status_code: int, body: str) -> None:
+        if not replayable(status_code):
+            self.release(db, key)
+            return
+        db.rollback()  # whatever the handler left open is not ours to commit
+        # the claim's expiry, so the LRU copy goes when the row does
+        expires_at = db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(status_code=status_code, response_body=body)
+            .returning(IdempotencyKey.expires_at)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        db.commit()
+        if expires_at is not None:  # None: expired + purged while the request ran
+            self._remember(key, StoredResponse(fp, status_code, body, as_utc(expires_at)))
+
+    def release(self, db: Session, key: str) -> None:
+        """Forget a claim whose request failed in a retryable way."""
+        db.rollback()
+        db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.key == key, IdempotencyKey.status_code.is_(None))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+
+    def purge_expired(self, db: Session, now: datetime | None = None) -> int:
+        now = now or datetime.now(timezone.utc)
+        deleted = db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.expires_at <= now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        with self._lock:
+            for key in [k for k, v in self._cache.items() if v.expires_at <= now]:
+                del self._cache[key]
+        return deleted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+idempotency_store = IdempotencyStore(
+    ttl_hours=settings.idempotency_ttl_hours,
+    cache_size=settings.idempotency_cache_size,
+    claim_timeout_seconds=settings.idempotency_claim_timeout_seconds,
+)
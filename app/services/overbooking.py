@@ -0,0 +1,139 @@
+"""Controlled overbooking from each doctor's no-show history.
+
+Every appointment that ends SERVED or NO_SHOW adds one outcome to
+``no_show_stats`` (doctor, source) in the same transaction as its status
+change (``record_outcome``), so no-show rates stay current without ever
+counting appointments. ``overbooking_policy`` caches a doctor's totals for
+``overbooking_cache_ttl_seconds``.
+
+With a no-show rate p, ``capacity / (1 - p)`` waiting patients are expected
+to bring ``capacity`` patients to the doctor. Bookings from
+``overbooking_sources`` (by default walk-ins and priority patients, who are
+at the desk and do turn up) may use those extra seats, capped at
+``overbooking_max_ratio`` x capacity. Doctors with fewer than
+``overbooking_min_samples`` outcomes get no extra seats.
+"""
+from collections.abc import Iterable
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import NoShowStat
+
+OUTCOME_STATUSES = ("SERVED", "NO_SHOW")
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def record_outcome(dialect: str, doctor_id: int, source: str, status: str):
+    """+1 outcome for (doctor, source), +1 no-show if it was one; one upsert."""
+    stmt = _UPSERT_DIALECTS[dialect](NoShowStat).values(
+        doctor_id=doctor_id, source=source, outcomes=1, no_shows=int(status == "NO_SHOW")
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[NoShowStat.doctor_id, NoShowStat.source],
+        set_={
+            "outcomes": NoShowStat.outcomes + 1,
+            "no_shows": NoShowStat.no_shows + stmt.excluded.no_shows,
+            "updated_at": func.now(),
+        },
+    )
+
+
+def no_show_rate(totals: Iterable[tuple[int, int]], min_samples: int) -> float | None:
+    """no-shows / outcomes over (outcomes, no_shows) pairs; None below min_samples."""
+    outcomes = no_shows = 0
+    for source_outcomes, source_no_shows in totals:
+        outcomes += source_outcomes
+        no_shows += source_no_shows
+    if outcomes < max(min_samples, 1):
+        return None
+    return no_shows / outcomes
+
+
+def extra_seats(capacity: int, rate: float | None, max_ratio: float) -> int:
+    """Seats beyond capacity so the expected show-ups still fit it."""
+    if not rate or capacity <= 0:
+        return 0
+    cap = capacity * max_ratio
+    wanted = capacity * rate / (1 - rate) if rate < 1 else cap
+    return int(min(wanted, cap))
+
+
+class OverbookingPolicy:
+    def __init__(
+        self,
+        sources: Iterable[str] = ("WALK_IN", "PRIORITY"),
+        max_ratio: float = 0.25,
+        min_samples: int = 30,
+        ttl_seconds: float = 300,
+    ):
+        self.sources = frozenset(sources)
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.ttl_seconds = ttl_seconds
+        # doctor_id -> ({source: (outcomes, no_shows)}, loaded_at)
+        self._totals: dict[int, tuple[dict[str, tuple[int, int]], float]] = {}
+        self._lock = Lock()
+        self.loads = 0
+        self.granted = 0  # bookings offered seats beyond capacity
+
+    def totals(self, db: Session, doctor_id: int) -> dict[str, tuple[int, int]]:
+        with self._lock:
+            hit = self._totals.get(doctor_id)
+        if hit is not None and monotonic() - hit[1] <= self.ttl_seconds:
+            return hit[0]
+
+        rows = db.execute(
+            select(NoShowStat.source, NoShowStat.outcomes, NoShowStat.no_shows).where(
+                NoShowStat.doctor_id == doctor_id
+            )
+        )
+        totals = {source: (outcomes, no_shows) for source, outcomes, no_shows in rows}
+        with self._lock:
+            self._totals[doctor_id] = (totals, monotonic())
+            self.loads += 1
+        return totals
+
+    def rate(self, db: Session, doctor_id: int) -> float | None:
+        return no_show_rate(self.totals(db, doctor_id).values(), self.min_samples)
+
+    def allowance(self, db: Session, doctor_id: int, source: str, capacity: int) -> int:
+        """Seats beyond ``capacity`` a booking from ``source`` may take."""
+        if source not in self.sources:
+            return 0
+        extra = extra_seats(capacity, self.rate(db, doctor_id), self.max_ratio)
+        if extra:
+            with self._lock:
+                self.granted += 1
+        return extra
+
+    def invalidate(self, doctor_id: int) -> None:
+        with self._lock:
+            self._totals.pop(doctor_id, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "sources": sorted(self.sources),
+                "doctors_cached": len(self._totals),
+                "loads": self.loads,
+                "granted": self.granted,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._totals.clear()
+            self.loads = self.granted = 0
+
+
+overbooking_policy = OverbookingPolicy(
+    sources=settings.overbooking_sources,
+    max_ratio=settings.overbooking_max_ratio,
+    min_samples=settings.overbooking_min_samples,
+    ttl_seconds=settings.overbooking_cache_ttl_seconds,
+)
@@ -0,0 +1,123 @@
+"""Patient lookup by phone: normalization, an LRU of known patients, upsert.
+
+Phones are normalized once, when a booking request is parsed
+(``BookingRequest``), to the national number without separators or
+country code (``"+91 98765-43210"`` -> ``"9876543210"``); numbers from
+other countries keep a ``+`` and their country code. Everything after
+that compares plain strings.
+
+Follow-ups book with a phone we've seen before, so ``patient_cache`` keeps
+``phone -> (patient_id, name)`` for recent patients and the booking skips
+the patients table altogether. On a miss ``upsert_patient`` finds or
+creates the row in one race-safe statement (INSERT ... ON CONFLICT (phone)
+DO UPDATE ... RETURNING). Callers add to the cache only after their
+transaction commits, so a rolled-back insert is never cached.
+"""
+import re
+from collections import OrderedDict
+from threading import Lock
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import Patient
+
+_SEPARATORS = re.compile(r"[\s\-().]")
+
+
+def normalize_phone(raw: str, country_code: str | None = None, national_digits: int | None = None) -> str:
+    country_code = country_code or settings.phone_country_code
+    national_digits = national_digits or settings.phone_national_digits
+
+    phone = _SEPARATORS.sub("", raw)
+    international = phone.startswith(("+", "00"))
+    if international:
+        phone = phone[1:] if phone.startswith("+") else phone[2:]
+    if not phone.isdigit():
+        raise ValueError("phone may only contain digits, spaces, dashes, dots, brackets and a leading +")
+
+    if international:
+        if not phone.startswith(country_code):
+            if not 7 <= len(phone) <= 15:  # E.164
+                raise ValueError("international phone must have 7-15 digits")
+            return "+" + phone
+        phone = phone[len(country_code) :]
+    elif len(phone) == len(country_code) + national_digits and phone.startswith(country_code):
+        phone = phone[len(country_code) :]
+    elif len(phone) == national_digits + 1 and phone.startswith("0"):
+        # trunk prefix
+        phone = phone[1:]
+
+    if len(phone) != national_digits:
+        raise ValueError(f"phone must have {national_digits} digits")
+    return phone
+
+
+class PatientCache:
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[int, str]] = OrderedDict()
+        self._lock = Lock()
+        self.hits = self.misses = 0
+
+    def get(self, phone: str) -> tuple[int, str] | None:
+        with self._lock:
+            hit = self._entries.get(phone)
+            if hit is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(phone)
+            self.hits += 1
+            return hit
+
+    def put(self, phone: str, patient_id: int, name: str) -> None:
+        with self._lock:
+            self._entries[phone] = (patient_id, name)
+            self._entries.move_to_end(phone)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, phone: str) -> None:
+        with self._lock:
+            self._entries.pop(phone, None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+patient_cache = PatientCache(max_entries=settings.patient_cache_size)
+
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def _upsert(db: Session):
+    # the existing name wins; the no-op DO UPDATE is there so RETURNING also
+    # gives back a row that already existed
+    stmt = _UPSERT_DIALECTS[db.get_bind().dialect.name](Patient)
+    return stmt.on_conflict_do_update(index_elements=[Patient.phone], set_={"phone": stmt.excluded.phone})
+
+
+def upsert_patient(db: Session, name: str, phone: str) -> tuple[int, str]:
+    """(id, stored name) of the patient with ``phone``, created if new."""
+    patient_id, stored_name = db.execute(
+        _upsert(db).values(name=name, phone=phone).returning(Patient.id, Patient.name)
+    ).one()
+    return patient_id, stored_name
+
+
+def upsert_patients(db: Session, names: dict[str, str]) -> dict[str, tuple[int, str]]:
+    """``upsert_patient`` for many ``phone -> name`` at once (one executemany)."""
+    if not names:
+        return {}
+    rows = db.execute(
+        _upsert(db).returning(Patient.phone, Patient.id, Patient.name),
+        [{"name": name, "phone": phone} for phone, name in names.items()],
+    )
+    return {phone: (patient_id, name) for phone, patient_id, name in rows}
@@ -0,0 +1,286 @@
+"""Process-resident live queue, keyed by (doctor_id, slot_id).
+
+The DB stays the source of truth: booking / serve / cancel commit first and
+then update this engine, and the whole thing is rebuilt from the DB on
+startup. Each uvicorn worker holds its own copy.
+
+To see what other workers changed, every slot queue remembers the
+``QUEUE_VERSION`` (services/slot_counters) it is current at. Writers pass
+the version their counter UPDATE returned to ``applied``; readers fetch the
+slot's version with the row they read anyway and call ``reload_slot`` when
+it differs. A worker's own changes keep its copy current, so only a change
+made by another worker costs a reload of that one slot. (Live diffs over
+the WebSocket, services/queue_events, still only reach subscribers of the
+worker that made the change.)
+
+Besides the display order (token number) every slot keeps the "next
+patient to call" order as a sorted list of (call key, token_number): the
+key is priority_rank, or, with aging enabled, arrival time pushed back by
+``aging_minutes`` per rank step so a long-waiting walk-in eventually
+overtakes newer priority patients. A key never changes once a token is
+queued, so the list is kept sorted on insert and a patient's position in
+call order is a binary search, not a sort.
+"""
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import Appointment, Patient, TimeSlot, Token
+from app.services.slot_counters import QUEUE_VERSION
+
+
+@dataclass(slots=True)
+class QueueEntry:
+    appointment_id: int
+    token_number: int
+    patient_name: str
+    patient_phone: str
+    created_at: datetime
+    source: str = "ONLINE"
+    priority_rank: int = 3
+
+
+class SlotQueue:
+    """Waiting tokens of one slot: sorted token numbers + entry lookup + call order."""
+
+    __slots__ = ("token_numbers", "entries", "by_appointment", "order", "aging_seconds")
+
+    def __init__(self, aging_seconds: float = 0):
+        self.token_numbers: list[int] = []
+        self.entries: dict[int, QueueEntry] = {}
+        self.by_appointment: dict[int, int] = {}
+        # (call key, token_number), sorted
+        self.order: list[tuple[float, int]] = []
+        self.aging_seconds = aging_seconds
+
+    def call_key(self, entry: QueueEntry) -> float:
+        if self.aging_seconds:
+            return entry.created_at.timestamp() + (entry.priority_rank - 1) * self.aging_seconds
+        return entry.priority_rank
+
+    def add(self, entry: QueueEntry) -> None:
+        if entry.appointment_id in self.by_appointment:
+            return
+        # tokens arrive in increasing order, so this is almost always an append
+        insort(self.token_numbers, entry.token_number)
+        self.entries[entry.token_number] = entry
+        self.by_appointment[entry.appointment_id] = entry.token_number
+        insort(self.order, (self.call_key(entry), entry.token_number))
+
+    def remove(self, appointment_id: int) -> QueueEntry | None:
+        token_number = self.by_appointment.pop(appointment_id, None)
+        if token_number is None:
+            return None
+        i = bisect_left(self.token_numbers, token_number)
+        del self.token_numbers[i]
+        entry = self.entries.pop(token_number)
+        del self.order[bisect_left(self.order, (self.call_key(entry), token_number))]
+        return entry
+
+    def peek_next(self) -> QueueEntry | None:
+        return self.entries[self.order[0][1]] if self.order else None
+
+    def pop_next(self) -> QueueEntry | None:
+        entry = self.peek_next()
+        if entry is not None:
+            self.remove(entry.appointment_id)
+        return entry
+
+    def waiting(self) -> list[QueueEntry]:
+        return [self.entries[n] for n in self.token_numbers]
+
+    def call_order(self) -> list[QueueEntry]:
+        """Waiting entries in the order they will be called."""
+        return [self.entries[n] for _, n in self.order]
+
+    def position(self, appointment_id: int) -> int | None:
+        """0-based place in call order (O(log n)), None if not waiting."""
+        token_number = self.by_appointment.get(appointment_id)
+        if token_number is None:
+            return None
+        return bisect_left(self.order, (self.call_key(self.entries[token_number]), token_number))
+
+    def ranked(self) -> list[tuple[QueueEntry, int]]:
+        """Waiting entries by token number, each with its place in call order."""
+        place = {n: i for i, (_, n) in enumerate(self.order)}
+        return [(self.entries[n], place[n]) for n in self.token_numbers]
+
+    def __len__(self) -> int:
+        return len(self.token_numbers)
+
+
+class QueueEngine:
+    def __init__(self, aging_minutes: float = 0):
+        self._queues: dict[tuple[int, int], SlotQueue] = {}
+        # (doctor_id, slot_id) -> QUEUE_VERSION the queue is current at; missing = unknown
+        self._versions: dict[tuple[int, int], int] = {}
+        self._lock = Lock()
+        self.aging_seconds = aging_minutes * 60
+        self.reloads = 0
+
+    def add(self, doctor_id: int, slot_id: int, entry: QueueEntry) -> None:
+        with self._lock:
+            queue = self._queues.get((doctor_id, slot_id))
+            if queue is None:
+                queue = self._queues[(doctor_id, slot_id)] = SlotQueue(self.aging_seconds)
+            queue.add(entry)
+
+    def remove(self, doctor_id: int, slot_id: int, appointment_id: int) -> QueueEntry | None:
+        with self._lock:
+            queue = self._queues.get((doctor_id, slot_id))
+            if queue is None:
+                return None
+            entry = queue.remove(appointment_id)
+            if not queue:
+                del self._queues[(doctor_id, slot_id)]
+            return entry
+
+    def peek_next(self, doctor_id: int, slot_id: int) -> QueueEntry | None:
+        with self._lock:
+            queue = self._queues.get((doctor_id, slot_id))
+            return queue.peek_next() if queue else None
+
+    def pop_next(self, doctor_id: int, slot_id: int) -> QueueEntry | None:
+        """Take the next patient to call out of the queue."""
+        with self._lock:
+            queue = self._queues.get((doctor_id, slot_id))
+            if queue is None:
+                return None
+            entry = queue.pop_next()
+            if not queue:
+                del self._queues[(doctor_id, slot_id)]
+            return entry
+
+    def waiting(self, doctor_id: int, slot_id: int) -> list[QueueEntry]:
+        with self._lock:
+            queue = self._queues.get((doctor_id, slot_id))
+            return queue.waiting() if queue else []
+
+    def call_order(self, doctor_id: int, slot_id: int) -> list[QueueEntry]:
+        with self._lock:
+            queue = self._queues.get((doctor_id, slot_id))
+            return queue.call_order() if queue else []
+
+    def position(self, doctor_id: int, slot_id: int, appointment_id: int) -> int | None:
+        with self._lock:
+            queue = self._queues.get((doctor_id, slot_id))
+            return queue.position(appointment_id) if queue else None
+
+    def ranked(self, doctor_id: int, slot_id: int) -> list[tuple[QueueEntry, int]]:
+        with self._lock:
+            queue = self._queues.get((doctor_id, slot_id))
+            return queue.ranked() if queue else []
+
+    def waiting_count(self, doctor_id: int, slot_id: int) -> int:
+        with self._lock:
+            queue = self._queues.get((doctor_id, slot_id))
+            return len(queue) if queue else 0
+
+    def slots(self) -> list[tuple[int, int]]:
+        """(doctor_id, slot_id) of every queue held."""
+        with self._lock:
+            return list(self._queues)
+
+    def is_current(self, doctor_id: int, slot_id: int, version: int) -> bool:
+        with self._lock:
+            return self._versions.get((doctor_id, slot_id)) == version
+
+    def applied(self, doctor_id: int, slot_id: int, version: int, changes: int = 1) -> None:
+        """Call after applying ``changes`` committed changes that took the slot to ``version``.
+
+        The queue stays current only if it was current right before them (or
+        the slot was never booked before, version 0); otherwise the next read
+        reloads it.
+        """
+        key = (doctor_id, slot_id)
+        with self._lock:
+            known = self._versions.get(key)
+            if known == version - changes or (known is None and version == changes):
+                self._versions[key] = version
+            else:
+                self._versions.pop(key, None)
+
+    def reload_slot(self, db: Session, doctor_id: int, slot_id: int, version: int) -> int:
+        """Reload one slot's BOOKED tokens, read after ``version``. Returns the number loaded."""
+        key = (doctor_id, slot_id)
+        queue = self._load(db, Token.slot_id == slot_id).get(key)
+        with self._lock:
+            if queue:
+                self._queues[key] = queue
+            else:
+                self._queues.pop(key, None)
+            self._versions[key] = version
+            self.reloads += 1
+        return len(queue) if queue else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._queues.clear()
+            self._versions.clear()
+            self.reloads = 0
+
+    def rebuild(self, db: Session) -> int:
+        """Reload every BOOKED token from the DB. Returns the number loaded."""
+        versions = dict(
+            db.query(TimeSlot.id, QUEUE_VERSION)
+            .join(Token, Token.slot_id == TimeSlot.id)
+            .join(Appointment, Appointment.id == Token.appointment_id)
+            .filter(Appointment.status == "BOOKED")
+            .distinct()
+        )
+        queues = self._load(db)
+        with self._lock:
+            self._queues = queues
+            self._versions = {key: versions[key[1]] for key in queues if key[1] in versions}
+        return sum(len(queue) for queue in queues.values())
+
+    def _load(self, db: Session, *filters) -> dict[tuple[int, int], SlotQueue]:
+        rows = (
+            db.query(
+                Appointment.doctor_id,
+                Token.slot_id,
+                Appointment.id,
+                Token.token_number,
+                Patient.name,
+                Patient.phone,
+                Token.created_at,
+                Appointment.source,
+                Appointment.priority_rank,
+            )
+            .join(Appointment, Appointment.id == Token.appointment_id)
+            .join(Patient, Patient.id == Appointment.patient_id)
+            .filter(Appointment.status == "BOOKED", *filters)
+            .all()
+        )
+
+        queues: dict[tuple[int, int], SlotQueue] = {}
+        for doctor_id, slot_id, appointment_id, token_number, name, phone, created_at, source, rank in rows:
+            queue = queues.get((doctor_id, slot_id))
+            if queue is None:
+                queue = queues[(doctor_id, slot_id)] = SlotQueue(self.aging_seconds)
+            queue.add(
+                QueueEntry(
+                    appointment_id=appointment_id,
+                    token_number=token_number,
+                    patient_name=name,
+                    patient_phone=phone,
+                    created_at=as_utc(created_at),
+                    source=source,
+                    priority_rank=rank,
+                )
+            )
+        return queues
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite hands datetimes back naive; they are stored as UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+queue_engine = QueueEngine(aging_minutes=settings.queue_aging_minutes)
@@ -0,0 +1,93 @@
+"""In-process pub/sub fan-out of live queue changes.
+
+Handlers publish small diffs after they commit; every WebSocket subscribed to
+that doctor gets them pushed, so displays no longer poll the queue endpoint.
+``publish`` is safe to call from threadpool (sync) handlers.
+"""
+import asyncio
+from dataclasses import asdict
+from threading import Lock
+
+from app.services.queue_engine import QueueEntry
+
+MAX_PENDING = 1000
+
+
+class Subscriber:
+    __slots__ = ("doctor_id", "queue", "loop")
+
+    def __init__(self, doctor_id: int):
+        self.doctor_id = doctor_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=MAX_PENDING)
+        self.loop = asyncio.get_running_loop()
+
+    def deliver(self, event: dict) -> None:
+        # runs on the subscriber's loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # client is too slow: drop the backlog and ask it to reload
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync", "doctor_id": self.doctor_id})
+
+
+class QueueBroadcaster:
+    def __init__(self):
+        self._subscribers: dict[int, set[Subscriber]] = {}
+        self._lock = Lock()
+
+    def subscribe(self, doctor_id: int) -> Subscriber:
+        sub = Subscriber(doctor_id)
+        with self._lock:
+            self._subscribers.setdefault(doctor_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        with self._lock:
+            subs = self._subscribers.get(sub.doctor_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.doctor_id]
+
+    def subscriber_count(self, doctor_id: int | None = None) -> int:
+        with self._lock:
+            if doctor_id is not None:
+                return len(self._subscribers.get(doctor_id, ()))
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, doctor_id: int, event: dict) -> None:
+        with self._lock:
+            subs = tuple(self._subscribers.get(doctor_id, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, event)
+            except RuntimeError:
+                # loop already closed -> stale subscriber
+                self.unsubscribe(sub)
+
+
+def token_added(doctor_id: int, slot_id: int, entry: QueueEntry) -> None:
+    if not queue_events.subscriber_count(doctor_id):
+        return
+    token = asdict(entry)
+    token["created_at"] = entry.created_at.isoformat()
+    queue_events.publish(
+        doctor_id, {"type": "added", "doctor_id": doctor_id, "slot_id": slot_id, "token": token}
+    )
+
+
+def token_removed(doctor_id: int, slot_id: int, appointment_id: int, status: str) -> None:
+    queue_events.publish(
+        doctor_id,
+        {
+            "type": status.lower(),  # "served" / "cancelled"
+            "doctor_id": doctor_id,
+            "slot_id": slot_id,
+            "appointment_id": appointment_id,
+        },
+    )
+
+
+queue_events = QueueBroadcaster()
@@ -0,0 +1,84 @@
+"""Versioned cache of serialized listing responses (doctors, slots).
+
+Each cached body belongs to a *scope* (``"doctors"`` or ``("slots",
+doctor_id)``) whose version is bumped by the write that changes it
+(create_doctor / create_slot). A cached body is served only while its
+scope version is unchanged and it is younger than ``read_cache_ttl_seconds``
+(other workers may have written). The ETag is a hash of the body, so it is
+strong and identical across workers.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from hashlib import blake2b
+from threading import Lock
+from time import monotonic
+from typing import Callable, Hashable
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True, slots=True)
+class CachedBody:
+    body: bytes
+    etag: str
+    version: int
+    cached_at: float
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{blake2b(body, digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # strong comparison; a W/ prefix never matches a strong tag
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+class ReadCache:
+    def __init__(self, ttl_seconds: float = 30, max_entries: int = 1024):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._versions: dict[Hashable, int] = {}
+        self._entries: OrderedDict[Hashable, CachedBody] = OrderedDict()
+        self._lock = Lock()
+
+    def version(self, scope: Hashable) -> int:
+        with self._lock:
+            return self._versions.get(scope, 0)
+
+    def bump(self, scope: Hashable) -> None:
+        with self._lock:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def get_or_build(self, scope: Hashable, key: Hashable, build: Callable[[], bytes]) -> CachedBody:
+        """Cached body for ``key`` (in ``scope``), or ``build()`` and cache it."""
+        full_key = (scope, key)
+        with self._lock:
+            version = self._versions.get(scope, 0)
+            hit = self._entries.get(full_key)
+            if hit is not None and hit.version == version and monotonic() - hit.cached_at <= self.ttl_seconds:
+                self._entries.move_to_end(full_key)
+                return hit
+
+        body = build()
+        entry = CachedBody(body, make_etag(body), version, monotonic())
+        with self._lock:
+            # a bump while we were building makes this body stale already
+            if self._versions.get(scope, 0) == version:
+                self._entries[full_key] = entry
+                self._entries.move_to_end(full_key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+            self._entries.clear()
+
+
+read_cache = ReadCache(ttl_seconds=settings.read_cache_ttl_seconds, max_entries=settings.read_cache_max_entries)
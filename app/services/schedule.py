@@ -0,0 +1,178 @@
+"""Doctor-day schedules: recurring rules expanded into time slots in bulk.
+
+A template such as "MON-FRI 09:00-13:00, 15-minute slots, capacity 4" is
+expanded for a date range in the clinic's timezone and written with one
+executemany per doctor, in one transaction for all doctors.
+
+Conflicts are found in memory. The doctors' existing slots in the range are
+read once (one query) into a ``SlotIntervals`` per doctor, and every new slot
+is checked against it with a bisect: the same start/end would violate
+``uq_doctor_slot``, any other overlap would double-book the doctor. New slots
+that overlap each other (two rules covering the same hours) conflict too.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from itertools import accumulate
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import Doctor, TimeSlot
+from app.schemas.slot import ScheduleCreate, ScheduleRule, Weekday
+from app.services.capacity import capacity_cache
+from app.services.queue_engine import as_utc
+from app.services.read_cache import read_cache
+from app.services.slot_resolver import slot_resolver
+
+SCHEDULE_CONFLICT = "Schedule conflicts with existing slots"
+
+WEEKDAYS = list(Weekday)
+
+
+class SlotIntervals:
+    """One doctor's slots sorted by start; overlap lookups in O(log n + k)."""
+
+    def __init__(self, slots: list[tuple[datetime, datetime, int]]):
+        self._slots = sorted(slots)
+        self._starts = [start for start, _, _ in self._slots]
+        # running max of end times: a lookup stops scanning left once nothing earlier reaches it
+        self._reach = list(accumulate((end for _, end, _ in self._slots), max))
+        self._exact = {(start, end): slot_id for start, end, slot_id in self._slots}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def conflict(self, start: datetime, end: datetime) -> tuple[str, int] | None:
+        """("exists" | "overlap", slot id) of a slot sharing time with [start, end)."""
+        if (start, end) in self._exact:
+            return "exists", self._exact[(start, end)]
+        # candidates start before `end`; walk left while they can still reach past `start`
+        for i in range(bisect_left(self._starts, end) - 1, -1, -1):
+            if self._reach[i] <= start:
+                break
+            if self._slots[i][1] > start:
+                return "overlap", self._slots[i][2]
+        return None
+
+
+def _check(schedule: ScheduleCreate) -> str | None:
+    if schedule.end_date < schedule.start_date:
+        return "end_date must not be before start_date"
+    if (schedule.end_date - schedule.start_date).days >= settings.schedule_max_days:
+        return f"Schedule is limited to {settings.schedule_max_days} days"
+    for rule in schedule.rules:
+        if rule.slot_minutes <= 0 or rule.capacity <= 0:
+            return "slot_minutes and capacity must be positive"
+        if rule.end <= rule.start:
+            return "Rule end must be after its start"
+    return None
+
+
+def expand(
+    rules: list[ScheduleRule], start_date: date, end_date: date, tz: ZoneInfo
+) -> list[tuple[datetime, datetime, int]]:
+    """(start, end, capacity) in UTC of every slot the rules produce, sorted."""
+    slots = []
+    day = start_date
+    while day <= end_date:
+        for rule in rules:
+            if WEEKDAYS[day.weekday()] not in rule.weekdays:
+                continue
+            # stepped in UTC, so a slot is slot_minutes long even on a DST change day
+            start = datetime.combine(day, rule.start, tz).astimezone(timezone.utc)
+            stop = datetime.combine(day, rule.end, tz).astimezone(timezone.utc)
+            step = timedelta(minutes=rule.slot_minutes)
+            while start + step <= stop:
+                slots.append((start, start + step, rule.capacity))
+                start += step
+        day += timedelta(days=1)
+    slots.sort()
+    return slots
+
+
+def create_schedule(db: Session, doctor_ids: list[int], schedule: ScheduleCreate):
+    """Create the template's slots for every doctor; ``(results, error)``.
+
+    ``results`` has one ``{"doctor_id", "created", "conflicts"}`` per doctor.
+    With conflicts and no ``skip_conflicts`` nothing is written and the
+    error is ``SCHEDULE_CONFLICT`` (results list the conflicts).
+    """
+    # 1) template
+    error = _check(schedule)
+    if error:
+        return None, error
+    try:
+        tz = ZoneInfo(schedule.timezone or settings.clinic_timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None, f"Unknown timezone {schedule.timezone!r}"
+
+    # 2) doctors (one IN query)
+    doctor_ids = list(dict.fromkeys(doctor_ids))
+    found = set(db.scalars(select(Doctor.id).where(Doctor.id.in_(doctor_ids))))
+    if len(found) != len(doctor_ids):
+        return None, "Doctor not found"
+
+    new_slots = expand(schedule.rules, schedule.start_date, schedule.end_date, tz)
+    if not new_slots:
+        return [{"doctor_id": d, "created": 0, "conflicts": []} for d in doctor_ids], None
+
+    # 3) existing slots in the range, all doctors in one query -> interval index per doctor
+    existing = defaultdict(list)
+    rows = db.execute(
+        select(TimeSlot.doctor_id, TimeSlot.start_time, TimeSlot.end_time, TimeSlot.id).where(
+            TimeSlot.doctor_id.in_(doctor_ids),
+            TimeSlot.start_time < max(end for _, end, _ in new_slots),
+            TimeSlot.end_time > new_slots[0][0],
+        )
+    )
+    for doctor_id, start, end, slot_id in rows:
+        existing[doctor_id].append((as_utc(start), as_utc(end), slot_id))
+
+    # 4) check every new slot in memory
+    results, inserts = [], {}
+    for doctor_id in doctor_ids:
+        index = SlotIntervals(existing[doctor_id])
+        accepted, conflicts = [], []
+        reach = None  # latest end among accepted new slots (they come sorted by start)
+        for start, end, capacity in new_slots:
+            hit = index.conflict(start, end)
+            if hit is None and reach is not None and reach > start:
+                hit = ("template", None)
+            if hit:
+                reason, slot_id = hit
+                conflicts.append({"start_time": start, "end_time": end, "reason": reason, "existing_slot_id": slot_id})
+                continue
+            accepted.append(
+                {"doctor_id": doctor_id, "start_time": start, "end_time": end, "capacity": capacity}
+            )
+            reach = end if reach is None else max(reach, end)
+        inserts[doctor_id] = accepted
+        results.append({"doctor_id": doctor_id, "created": len(accepted), "conflicts": conflicts})
+
+    if any(r["conflicts"] for r in results) and not schedule.skip_conflicts:
+        for result in results:
+            result["created"] = 0
+        return results, SCHEDULE_CONFLICT
+
+    # 5) one executemany per doctor, one commit for all
+    try:
+        for doctor_id, accepted in inserts.items():
+            if accepted:
+                db.execute(insert(TimeSlot), accepted)
+        db.commit()
+    except IntegrityError:
+        # someone created one of these slots in the meantime
+        db.rollback()
+        return None, SCHEDULE_CONFLICT
+
+    # 6) new slots may be the doctors' current ones; listings and capacity changed
+    for doctor_id, accepted in inserts.items():
+        if accepted:
+            slot_resolver.invalidate(doctor_id)
+            read_cache.bump(("slots", doctor_id))
+    capacity_cache.bump("capacity")
+    return results, None
@@ -0,0 +1,119 @@
+"""Per-slot appointment counters (time_slots.booked/served/cancelled/no_show_count).
+
+They are updated in the same transaction as the status change they mirror,
+so a capacity check is a single guarded UPDATE instead of a COUNT over
+appointments. ``reconcile`` recomputes them from the appointment rows.
+
+``overbook`` lets a booking take that many seats beyond ``capacity``
+(see services/overbooking).
+
+Every write here also returns the slot's ``QUEUE_VERSION``: a booking adds
+one to booked_count, a patient leaving takes one off it and adds one to
+another counter, so booked + 2 x (everyone who left) goes up by exactly one
+per change to the queue. Workers compare it with the version their
+in-memory queue was built at (services/queue_engine).
+"""
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+
+from app.models.entities import Appointment, TimeSlot
+
+COUNTER_FOR_STATUS = {
+    "BOOKED": "booked_count",
+    "SERVED": "served_count",
+    "CANCELLED": "cancelled_count",
+    "NO_SHOW": "no_show_count",
+}
+
+QUEUE_VERSION = (
+    TimeSlot.booked_count + 2 * (TimeSlot.served_count + TimeSlot.cancelled_count + TimeSlot.no_show_count)
+).label("queue_version")
+
+
+def _has_room(overbook: int, seats: int = 1):
+    limit = TimeSlot.capacity + overbook if overbook else TimeSlot.capacity
+    return TimeSlot.booked_count < limit if seats == 1 else TimeSlot.booked_count + seats <= limit
+
+
+def reserve_seat(slot_id: int, block: int = 1, overbook: int = 0, seats: int = 1):
+    """Take ``seats`` seats + the next ``block`` token numbers, only if the slot has room for all of them.
+
+    Returns (first number of the block, queue version), or no row when the
+    slot is full.
+    """
+    return (
+        update(TimeSlot)
+        .where(TimeSlot.id == slot_id, _has_room(overbook, seats))
+        .values(next_token=TimeSlot.next_token + block, booked_count=TimeSlot.booked_count + seats)
+        .returning(TimeSlot.next_token - block, QUEUE_VERSION)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def take_seat(slot_id: int, overbook: int = 0):
+    """Take one seat without touching next_token (numbers come from elsewhere).
+
+    Returns the queue version, or no row when the slot is full.
+    """
+    return (
+        update(TimeSlot)
+        .where(TimeSlot.id == slot_id, _has_room(overbook))
+        .values(booked_count=TimeSlot.booked_count + 1)
+        .returning(QUEUE_VERSION)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def leave_queue(slot_id: int, status: str):
+    """BOOKED -> SERVED / CANCELLED / NO_SHOW for one appointment of the slot.
+
+    Returns the queue version.
+    """
+    column = COUNTER_FOR_STATUS[status]
+    return (
+        update(TimeSlot)
+        .where(TimeSlot.id == slot_id)
+        .values({"booked_count": TimeSlot.booked_count - 1, column: getattr(TimeSlot, column) + 1})
+        .returning(QUEUE_VERSION)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reconcile(db: Session, fix: bool = False) -> list[dict]:
+    """Compare the counters with the appointment rows.
+
+    Returns one dict per drifted slot (stored vs actual values). With
+    ``fix=True`` the stored counters are overwritten and committed.
+    """
+    actual = {
+        column: func.coalesce(func.sum(case((Appointment.status == status, 1), else_=0)), 0)
+        for status, column in COUNTER_FOR_STATUS.items()
+    }
+    rows = (
+        db.query(
+            TimeSlot.id,
+            TimeSlot.booked_count,
+            TimeSlot.served_count,
+            TimeSlot.cancelled_count,
+            TimeSlot.no_show_count,
+            *(expr.label(column) for column, expr in actual.items()),
+        )
+        .outerjoin(Appointment, Appointment.slot_id == TimeSlot.id)
+        .group_by(TimeSlot.id)
+        .all()
+    )
+
+    drift = []
+    for slot_id, *values in rows:
+        stored = dict(zip(COUNTER_FOR_STATUS.values(), values[: len(COUNTER_FOR_STATUS)]))
+        counted = dict(zip(COUNTER_FOR_STATUS.values(), values[len(COUNTER_FOR_STATUS) :]))
+        if stored != counted:
+            drift.append({"slot_id": slot_id, "stored": stored, "actual": counted})
+
+    if fix and drift:
+        db.execute(
+            update(TimeSlot),
+            [{"id": d["slot_id"], **d["actual"]} for d in drift],
+        )
+        db.commit()
+    return drift
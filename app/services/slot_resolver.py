@@ -0,0 +1,99 @@
+"""Which slot is "current" for a doctor: the earliest one that hasn't ended.
+
+Answered from an indexed ``end_time > now ... LIMIT 1`` query and kept in a
+per-doctor cache. An entry is dropped when its slot ends, when
+``create_slot`` adds a slot for the doctor, when booking finds the slot
+full, or after ``slot_cache_ttl_seconds`` (other workers may have added a
+slot). Booking, the queue endpoints and ``allocate_token`` all go through
+here so they agree on which slot is current.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.entities import TimeSlot
+from app.services.queue_engine import as_utc
+
+
+@dataclass(frozen=True, slots=True)
+class SlotInfo:
+    id: int
+    doctor_id: int
+    start_time: datetime
+    end_time: datetime
+    capacity: int
+
+
+def _open_slot_query(doctor_id: int, now: datetime):
+    return (
+        select(TimeSlot.id, TimeSlot.doctor_id, TimeSlot.start_time, TimeSlot.end_time, TimeSlot.capacity)
+        .where(TimeSlot.doctor_id == doctor_id, TimeSlot.end_time > now)
+        .order_by(TimeSlot.start_time.asc())
+        .limit(1)
+    )
+
+
+def _to_info(row) -> SlotInfo | None:
+    if row is None:
+        return None
+    slot_id, doctor_id, start_time, end_time, capacity = row
+    return SlotInfo(slot_id, doctor_id, as_utc(start_time), as_utc(end_time), capacity)
+
+
+class SlotResolver:
+    def __init__(self, ttl_seconds: float = 60):
+        self.ttl_seconds = ttl_seconds
+        # doctor_id -> (slot or None, cached_at)
+        self._cache: dict[int, tuple[SlotInfo | None, float]] = {}
+        self._lock = Lock()
+
+    def _cached(self, doctor_id: int, now: datetime) -> tuple[bool, SlotInfo | None]:
+        with self._lock:
+            hit = self._cache.get(doctor_id)
+        if hit is None:
+            return False, None
+        slot, cached_at = hit
+        if monotonic() - cached_at > self.ttl_seconds:
+            return False, None
+        if slot is not None and slot.end_time <= now:
+            return False, None
+        return True, slot
+
+    def _store(self, doctor_id: int, slot: SlotInfo | None) -> SlotInfo | None:
+        with self._lock:
+            self._cache[doctor_id] = (slot, monotonic())
+        return slot
+
+    def current_slot(self, db: Session, doctor_id: int, now: datetime | None = None) -> SlotInfo | None:
+        now = now or datetime.now(timezone.utc)
+        found, slot = self._cached(doctor_id, now)
+        if found:
+            return slot
+        return self._store(doctor_id, _to_info(db.execute(_open_slot_query(doctor_id, now)).first()))
+
+    async def current_slot_async(
+        self, db: AsyncSession, doctor_id: int, now: datetime | None = None
+    ) -> SlotInfo | None:
+        now = now or datetime.now(timezone.utc)
+        found, slot = self._cached(doctor_id, now)
+        if found:
+            return slot
+        row = (await db.execute(_open_slot_query(doctor_id, now))).first()
+        return self._store(doctor_id, _to_info(row))
+
+    def invalidate(self, doctor_id: int) -> None:
+        with self._lock:
+            self._cache.pop(doctor_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+slot_resolver = SlotResolver(ttl_seconds=settings.slot_cache_ttl_seconds)
@@ -1,79 +1,438 @@
-from datetime import timedelta
+"""Token allocation engine: the one place a booking turns into a token.
 
+``allocate_token`` runs the whole booking transaction (doctor + current
+slot, seat + token number, patient, duplicate check, appointment + token)
+and updates the live queue afterwards. Both booking routes call it.
+
+Token numbers come from a pluggable ``TokenAllocator``:
+
+* ``DbCounterAllocator`` - one guarded UPDATE ... RETURNING on
+  ``time_slots.next_token`` per booking; the slot row is the lock.
+* ``RowLockAllocator`` - the DB counter, with the slot locked before the
+  booking reads anything (``BEGIN IMMEDIATE`` on SQLite, ``SELECT ... FOR
+  UPDATE`` on Postgres). Bookings of one slot run one after the other
+  across every worker process.
+* ``BlockAllocator`` - an in-process lock per slot and blocks of N numbers
+  reserved from ``next_token`` in one go. The lock is held until the
+  booking commits or rolls back, so numbers stay unique and gap-free; the
+  unused tail of a block is handed back by ``close()`` on shutdown. With
+  several worker processes each holds its own block: numbers stay unique
+  but are no longer handed out in order.
+
+All count reservations, full slots and time spent waiting for the lock
+(the guarded UPDATE for the DB counter) so contention is visible.
+
+A booking that loses a lock race (SQLite "database is locked", Postgres
+deadlock / serialization failure / lock timeout) is rolled back and run
+again, up to ``booking_retries`` times, then reported as a conflict
+instead of a 500.
+"""
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from threading import Lock
+from time import perf_counter
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
-from app.models.entities import Doctor, TimeSlot, Patient, Appointment, Token, TokenSource
+from app.core.config import settings
+from app.models.entities import Doctor, Appointment, TimeSlot, Token, TokenSource, source_to_rank
+from app.services.event_log import log_booked
+from app.services.overbooking import overbooking_policy
+from app.services.patients import patient_cache, upsert_patient
+from app.services.queue_engine import QueueEntry, queue_engine
+from app.services.queue_events import token_added
+from app.services.slot_counters import reserve_seat, take_seat
+from app.services.slot_resolver import slot_resolver
+from app.services.wait_estimator import wait_estimator
+
+
+class AllocatorStats:
+    def __init__(self):
+        self._lock = Lock()
+        self.reservations = 0
+        self.full = 0
+        self.refills = 0
+        self.contended = 0  # waits that didn't get the lock right away
+        self.retries = 0  # bookings run again after losing a lock race
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def observe(self, waited: float, contended: bool, full: bool = False, refill: bool = False) -> None:
+        with self._lock:
+            if full:
+                self.full += 1
+            else:
+                self.reservations += 1
+            self.refills += refill
+            self.contended += contended
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+
+    def retried(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.reservations + self.full
+            return {
+                "reservations": self.reservations,
+                "full": self.full,
+                "refills": self.refills,
+                "contended": self.contended,
+                "retries": self.retries,
+                "wait_avg_ms": (self.wait_total / attempts * 1000) if attempts else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+
+@dataclass(slots=True)
+class Reservation:
+    token_number: int
+    queue_version: int  # the slot's QUEUE_VERSION after this seat was taken
+    committed: bool = False  # set by the caller once the booking transaction committed
+
+
+class TokenAllocator(ABC):
+    """Seat + token number for a slot, inside the caller's transaction.
+
+    ``reserve`` is a context manager yielding a ``Reservation`` (or None when
+    the slot is full, counting ``overbook`` seats beyond capacity). The
+    caller commits inside the block and then sets ``reservation.committed``;
+    anything else counts as rolled back.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.stats = AllocatorStats()
+
+    @abstractmethod
+    def reserve(self, db: Session, slot_id: int, overbook: int = 0):
+        """A ``@contextmanager`` in every subclass, see above."""
+
+    def reserve_many(self, db: Session, slot_id: int, seats: int, overbook: int = 0) -> Reservation | None:
+        """``seats`` seats and as many consecutive numbers in one UPDATE (bulk booking).
+
+        All or nothing. The numbers come straight from ``next_token``, past
+        any block held in memory, so every allocator can share this.
+        """
+        started = perf_counter()
+        row = db.execute(reserve_seat(slot_id, seats, overbook, seats=seats)).first()
+        self.stats.observe(perf_counter() - started, contended=False, full=row is None)
+        return Reservation(*row) if row is not None else None
+
+    def close(self, db: Session) -> None:
+        """Hand back anything reserved but not used (called on shutdown)."""
+
+    def clear(self) -> None:
+        """Forget in-process state (tests / a fresh DB)."""
+
+
+class DbCounterAllocator(TokenAllocator):
+    name = "db"
+
+    @contextmanager
+    def reserve(self, db: Session, slot_id: int, overbook: int = 0):
+        started = perf_counter()
+        row = db.execute(reserve_seat(slot_id, overbook=overbook)).first()
+        waited = perf_counter() - started
+        self.stats.observe(waited, contended=False, full=row is None)
+        # a rollback undoes the counter bump, nothing to release here
+        yield Reservation(*row) if row is not None else None
+
+
+# a row / database lock wait longer than this counts as contended
+LOCK_CONTENDED_SECONDS = 0.005
+
+
+def _lock_slot(db: Session, slot_id: int) -> None:
+    conn = db.connection()
+    if conn.dialect.name == "sqlite":
+        # the write lock up front (waits up to busy_timeout): no read
+        # snapshot that later fails to upgrade to a writer
+        if not getattr(conn.connection.driver_connection, "in_transaction", False):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    else:
+        conn.execute(select(TimeSlot.id).where(TimeSlot.id == slot_id).with_for_update())
+
+
+class RowLockAllocator(DbCounterAllocator):
+    name = "lock"
+
+    @contextmanager
+    def reserve(self, db: Session, slot_id: int, overbook: int = 0):
+        started = perf_counter()
+        _lock_slot(db, slot_id)
+        locked = perf_counter() - started
+        row = db.execute(reserve_seat(slot_id, overbook=overbook)).first()
+        self.stats.observe(
+            perf_counter() - started, contended=locked > LOCK_CONTENDED_SECONDS, full=row is None
+        )
+        yield Reservation(*row) if row is not None else None
+
+
+class _SlotBlock:
+    __slots__ = ("lock", "next", "end")
+
+    def __init__(self):
+        self.lock = Lock()
+        self.next = 0  # next number to hand out
+        self.end = 0  # exclusive end of the reserved block
+
 
+class BlockAllocator(TokenAllocator):
+    name = "block"
 
-def allocate_token(db: Session, doctor_id: int, patient_name: str, patient_phone: str, source: TokenSource):
-    # 1) doctor check
+    def __init__(self, block_size: int = 32):
+        super().__init__()
+        self.block_size = max(1, block_size)
+        self._blocks: dict[int, _SlotBlock] = {}
+        self._registry_lock = Lock()
+
+    def _block(self, slot_id: int) -> _SlotBlock:
+        block = self._blocks.get(slot_id)
+        if block is None:
+            with self._registry_lock:
+                block = self._blocks.setdefault(slot_id, _SlotBlock())
+        return block
+
+    @contextmanager
+    def reserve(self, db: Session, slot_id: int, overbook: int = 0):
+        block = self._block(slot_id)
+
+        # 1) per-slot lock, held until the booking commits / rolls back
+        started = perf_counter()
+        contended = not block.lock.acquire(blocking=False)
+        if contended:
+            block.lock.acquire()
+        try:
+            # 2) seat; refill the block in the same UPDATE when it ran out
+            refill = block.next >= block.end
+            if refill:
+                row = db.execute(reserve_seat(slot_id, self.block_size, overbook)).first()
+            else:
+                seat = db.execute(take_seat(slot_id, overbook)).first()
+                row = (block.next, seat.queue_version) if seat else None
+            self.stats.observe(perf_counter() - started, contended, full=row is None, refill=refill)
+
+            if row is None:
+                yield None
+                return
+
+            number = row[0]
+            reservation = Reservation(*row)
+            yield reservation
+
+            # 3) only a committed booking moves the cursor (a rolled back
+            # refill never happened as far as the DB is concerned)
+            if reservation.committed:
+                if refill:
+                    block.end = number + self.block_size
+                block.next = number + 1
+        finally:
+            block.lock.release()
+
+    def close(self, db: Session) -> None:
+        with self._registry_lock:
+            blocks = list(self._blocks.items())
+            self._blocks.clear()
+        for slot_id, block in blocks:
+            if block.next < block.end:
+                # only if nobody reserved past our block meanwhile
+                db.execute(
+                    update(TimeSlot)
+                    .where(TimeSlot.id == slot_id, TimeSlot.next_token == block.end)
+                    .values(next_token=block.next)
+                    .execution_options(synchronize_session=False)
+                )
+        db.commit()
+
+    def clear(self) -> None:
+        with self._registry_lock:
+            self._blocks.clear()
+
+
+ALLOCATORS = {"db": DbCounterAllocator, "lock": RowLockAllocator, "block": BlockAllocator}
+
+
+def make_allocator(name: str = settings.token_allocator, block_size: int = settings.token_block_size):
+    if name not in ALLOCATORS:
+        raise ValueError(f"Unknown token allocator {name!r} (expected one of {sorted(ALLOCATORS)})")
+    return BlockAllocator(block_size) if name == "block" else ALLOCATORS[name]()
+
+
+token_allocator = make_allocator()
+
+# asyncio handlers can't hold a thread lock across awaits -> never the block allocator
+async_token_allocator = DbCounterAllocator() if token_allocator.name == "block" else token_allocator
+
+# Postgres: serialization failure, deadlock, lock_timeout
+RETRYABLE_SQLSTATES = {"40001", "40P01", "55P03"}
+
+
+def is_retryable(exc: DBAPIError) -> bool:
+    """A lock race the same booking can simply run again after."""
+    orig = exc.orig
+    code = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    return code in RETRYABLE_SQLSTATES or "database is locked" in str(orig)
+
+
+def allocate_token(
+    db: Session,
+    doctor_id: int,
+    patient_name: str,
+    patient_phone: str,
+    source: TokenSource | str = TokenSource.ONLINE,
+    now: datetime | None = None,
+    allocator: TokenAllocator | None = None,
+):
+    """Book the next token for a patient with a doctor's current slot.
+
+    ``patient_phone`` is expected normalized (``BookingRequest`` does it).
+    Returns ``(result, None)`` or ``(None, error)``.
+    """
+    allocator = allocator or token_allocator
+    now = now or datetime.now(timezone.utc)
+    source = source.value if hasattr(source, "value") else str(source)
+
+    for attempt in range(settings.booking_retries + 1):
+        try:
+            return _allocate_once(db, doctor_id, patient_name, patient_phone, source, now, allocator)
+        except DBAPIError as exc:
+            db.rollback()
+            if not is_retryable(exc):
+                raise
+            # the DB already waited for the lock (busy_timeout / lock wait): go again
+            if attempt < settings.booking_retries:
+                allocator.stats.retried()
+    return None, "Booking conflict. Try again."
+
+
+def _allocate_once(
+    db: Session,
+    doctor_id: int,
+    patient_name: str,
+    patient_phone: str,
+    source: str,
+    now: datetime,
+    allocator: TokenAllocator,
+):
+    # 1) doctor exists + active
     doctor = db.query(Doctor).filter(Doctor.id == doctor_id).first()
     if not doctor:
         return None, "Doctor not found"
     if not doctor.is_active:
-        return None, "Doctor is inactive"
-
-    # 2) find first active slot (earliest upcoming)
-    slot = (
-        db.query(TimeSlot)
-        .filter(TimeSlot.doctor_id == doctor_id)
-        .order_by(TimeSlot.start_time.asc())
-        .first()
-    )
+        return None, "Doctor is not active"
 
+    # 2) current slot = earliest slot that is NOT ended (cached per doctor)
+    slot = slot_resolver.current_slot(db, doctor_id, now)
     if not slot:
-        return None, "No slots available for this doctor"
-
-    # 3) capacity check
-    booked_count = db.query(Appointment).filter(
-        Appointment.slot_id == slot.id,
-        Appointment.status == "BOOKED"
-    ).count()
-
-    if booked_count >= slot.capacity:
-        return None, "Slot is full"
-
-    # 4) patient upsert
-    patient = db.query(Patient).filter(Patient.phone == patient_phone).first()
-    if not patient:
-        patient = Patient(name=patient_name, phone=patient_phone)
-        db.add(patient)
-        db.commit()
-        db.refresh(patient)
-
-    # 5) create appointment
-    appointment = Appointment(
-        doctor_id=doctor_id,
-        patient_id=patient.id,
-        slot_id=slot.id,
-        status="BOOKED",
-    )
-    db.add(appointment)
-    db.commit()
-    db.refresh(appointment)
-
-    # 6) token_number = max + 1 (SAFE)
-    max_token = db.query(func.max(Token.token_number)).filter(Token.slot_id == slot.id).scalar()
-    next_token = (max_token or 0) + 1
-
-    token = Token(
-        appointment_id=appointment.id,
-        slot_id=slot.id,
-        token_number=next_token,
-        source=source.value if hasattr(source, "value") else str(source),
+        if not db.query(TimeSlot.id).filter(TimeSlot.doctor_id == doctor_id).first():
+            return None, "No slots available for this doctor"
+        return None, "All doctor slots already ended"
+
+    # Everything below runs in ONE transaction: a single commit at the end,
+    # a rollback on any failure. The seat is taken first so an allocator
+    # lock is never waited on while this transaction holds DB write locks.
+
+    # 3) capacity check + token number; walk-ins & co. may overbook by the doctor's no-show rate
+    overbook = overbooking_policy.allowance(db, doctor_id, source, slot.capacity)
+    with allocator.reserve(db, slot.id, overbook) as reservation:
+        if reservation is None:
+            db.rollback()
+            # re-read the slot next time (capacity may have been raised)
+            slot_resolver.invalidate(doctor_id)
+            return None, "Slot is full"
+        token_number = reservation.token_number
+
+        # 4) patient by phone: cached for repeat patients, else one upsert
+        cached = patient_cache.get(patient_phone)
+        if cached:
+            patient_id, patient_name = cached
+        else:
+            patient_id, patient_name = upsert_patient(db, patient_name, patient_phone)
+
+        # 5) prevent duplicate booking (same patient + same slot)
+        existing_appt = (
+            db.query(Appointment.id)
+            .filter(
+                Appointment.patient_id == patient_id,
+                Appointment.slot_id == slot.id,
+                Appointment.status == "BOOKED",
+            )
+            .first()
+        )
+        if existing_appt:
+            db.rollback()
+            return None, "Patient already has a booking in this slot"
+
+        # 6) appointment + token, commit once
+        priority_rank = source_to_rank(source)
+        appointment = Appointment(
+            doctor_id=doctor_id,
+            patient_id=patient_id,
+            slot_id=slot.id,
+            status="BOOKED",
+            source=source,
+            priority_rank=priority_rank,
+        )
+        token = Token(
+            appointment=appointment,
+            slot_id=slot.id,
+            token_number=token_number,
+            source=source,
+            created_at=now,
+        )
+        db.add_all([appointment, token])
+
+        try:
+            db.flush()
+            appointment_id = appointment.id
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            # the cached id may be what conflicted; look it up again next time
+            patient_cache.invalidate(patient_phone)
+            return None, "Booking conflict. Try again."
+        reservation.committed = True
+        patient_cache.put(patient_phone, patient_id, patient_name)
+
+    # 7) live queue + subscribers + audit log
+    entry = QueueEntry(
+        appointment_id=appointment_id,
+        token_number=token_number,
+        patient_name=patient_name,
+        patient_phone=patient_phone,
+        created_at=now,
+        source=source,
+        priority_rank=priority_rank,
     )
-    db.add(token)
-    db.commit()
-    db.refresh(token)
+    queue_engine.add(doctor_id, slot.id, entry)
+    queue_engine.applied(doctor_id, slot.id, reservation.queue_version)
+    token_added(doctor_id, slot.id, entry)
+    log_booked(doctor_id, slot.id, entry)
 
-    # 7) estimated_time
-    per_patient_minutes = 10
-    estimated_time = slot.start_time + timedelta(minutes=(next_token - 1) * per_patient_minutes)
+    # 8) estimated time: position in call order x the doctor's observed service time
+    position = queue_engine.position(doctor_id, slot.id, appointment_id)
+    if position is None:  # already served / cancelled by someone else
+        position = queue_engine.waiting_count(doctor_id, slot.id)
+    estimated_time = wait_estimator.eta(
+        doctor_id,
+        position,
+        now=now,
+        slot_start=slot.start_time,
+        fallback=(slot.end_time - slot.start_time) / slot.capacity,
+    )
 
     return {
-        "appointment_id": appointment.id,
-        "token_number": token.token_number,
+        "appointment_id": appointment_id,
+        "token_number": token_number,
         "slot_id": slot.id,
         "estimated_time": estimated_time,
     }, None
@@ -0,0 +1,106 @@
+"""Per-doctor service-time estimate and queue ETAs.
+
+Every serve feeds ``record_serve``. The gap since the doctor's previous
+serve is one service-time sample, but only if patients were still waiting
+after that previous serve (otherwise the gap includes idle time). Samples
+go into an exponentially weighted moving average, so each doctor costs a
+handful of floats no matter how long the day gets.
+
+``etas`` turns a queue in call order into expected call times:
+the patient at position i is called after the consultation in progress
+finishes plus i average service times. Until a doctor has ``min_samples``
+samples the caller's fallback (slot length / capacity) is used.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from threading import Lock
+
+from app.core.config import settings
+
+
+@dataclass(slots=True)
+class ServiceStats:
+    ewma_seconds: float = 0.0
+    samples: int = 0
+    busy_since: datetime | None = None  # last serve after which someone was still waiting
+
+
+class WaitEstimator:
+    def __init__(self, alpha: float = 0.2, min_samples: int = 3, max_gap_minutes: float = 60):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.max_gap_seconds = max_gap_minutes * 60
+        self._stats: dict[int, ServiceStats] = {}
+        self._lock = Lock()
+
+    def record_serve(self, doctor_id: int, served_at: datetime, still_waiting: int) -> None:
+        with self._lock:
+            stats = self._stats.get(doctor_id)
+            if stats is None:
+                stats = self._stats[doctor_id] = ServiceStats()
+
+            if stats.busy_since is not None:
+                gap = (served_at - stats.busy_since).total_seconds()
+                # breaks / end of session aren't service time
+                if 0 < gap <= self.max_gap_seconds:
+                    if stats.samples == 0:
+                        stats.ewma_seconds = gap
+                    else:
+                        stats.ewma_seconds += self.alpha * (gap - stats.ewma_seconds)
+                    stats.samples += 1
+
+            stats.busy_since = served_at if still_waiting else None
+
+    def service_time(self, doctor_id: int, fallback: timedelta) -> timedelta:
+        with self._lock:
+            stats = self._stats.get(doctor_id)
+            if stats is None or stats.samples < self.min_samples:
+                return fallback
+            return timedelta(seconds=stats.ewma_seconds)
+
+    def etas(
+        self,
+        doctor_id: int,
+        waiting: int,
+        now: datetime,
+        slot_start: datetime,
+        fallback: timedelta,
+    ) -> tuple[timedelta, list[datetime]]:
+        """Expected call time for positions 0..waiting-1 (call order)."""
+        per_patient, base = self._base(doctor_id, now, slot_start, fallback)
+        return per_patient, [base + i * per_patient for i in range(waiting)]
+
+    def eta(self, doctor_id: int, position: int, now: datetime, slot_start: datetime, fallback: timedelta) -> datetime:
+        """Expected call time for one position in call order."""
+        per_patient, base = self._base(doctor_id, now, slot_start, fallback)
+        return base + position * per_patient
+
+    def _base(
+        self, doctor_id: int, now: datetime, slot_start: datetime, fallback: timedelta
+    ) -> tuple[timedelta, datetime]:
+        per_patient = self.service_time(doctor_id, fallback)
+        with self._lock:
+            stats = self._stats.get(doctor_id)
+            busy_since = stats.busy_since if stats else None
+
+        base = max(now, slot_start)
+        if busy_since is not None:
+            # consultation in progress: its expected remainder comes first
+            base = max(base, busy_since + per_patient)
+        return per_patient, base
+
+    def snapshot(self, doctor_id: int) -> dict:
+        with self._lock:
+            stats = self._stats.get(doctor_id) or ServiceStats()
+            return {"ewma_seconds": stats.ewma_seconds, "samples": stats.samples}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+wait_estimator = WaitEstimator(
+    alpha=settings.service_ewma_alpha,
+    min_samples=settings.service_min_samples,
+    max_gap_minutes=settings.service_max_gap_minutes,
+)
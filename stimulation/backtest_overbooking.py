@@ -0,0 +1,233 @@
+"""Backtest the overbooking policy against simulated clinic days.
+
+Runs the same seeded patients twice through a virtual-time clinic, once
+with plain capacity and once with the app's overbooking rule
+(``no_show_rate`` + ``extra_seats`` from services/overbooking), and
+compares doctor utilization, patients turned away and waiting times.
+
+Each doctor holds one session per day with ``capacity`` seats. As in the
+API, a seat is taken from booking until the patient is served, cancels, or
+is called and marked a no-show. Patients are called in the app's QueueEngine
+order. Walk-ins are at the desk and always turn up; other sources no-show
+at ``--no-show-rate``. No-show rates carry over from one day to the next,
+so the first days show the policy learning.
+
+``utilization`` is the share of session minutes the doctor spent with
+patients; time spent after the session ends is reported as overtime.
+
+    python stimulation/backtest_overbooking.py --seed 7 --doctors 5 --days 20 --out overbooking.json
+"""
+import argparse
+import heapq
+import json
+import random
+import statistics
+import sys
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from run_simulation import DEFAULT_MIX, git_commit  # noqa: E402
+
+from app.models.entities import source_to_rank  # noqa: E402
+from app.services.overbooking import extra_seats, no_show_rate  # noqa: E402
+from app.services.queue_engine import QueueEngine, QueueEntry  # noqa: E402
+
+DAY_START = datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+
+@dataclass
+class ClinicConfig:
+    seed: int = 42
+    doctors: int = 5
+    days: int = 20
+    session_minutes: int = 240
+    capacity: int = 12
+    arrivals_per_minute: float = 0.3  # per doctor; a bit more than one doctor can see
+    mix: dict = field(default_factory=lambda: dict(DEFAULT_MIX))
+    cancel_rate: float = 0.05
+    no_show_rate: float = 0.2
+    service_minutes: float = 4.5
+    # policy (defaults as in settings)
+    sources: tuple = ("WALK_IN", "PRIORITY")
+    max_ratio: float = 0.25
+    min_samples: int = 30
+
+
+@dataclass
+class Patient:
+    id: int
+    source: str
+    arrived: float
+    service: float
+    no_show: bool
+    cancel_at: float | None
+
+
+def generate_day(config: ClinicConfig, doctor: int, day: int) -> list[Patient]:
+    """Same (seed, doctor, day) -> same patients, whatever the policy."""
+    rng = random.Random(f"{config.seed}:{doctor}:{day}")
+    sources, weights = zip(*config.mix.items())
+    patients, now = [], 0.0
+    while True:
+        now += rng.expovariate(config.arrivals_per_minute)
+        if now >= config.session_minutes:
+            return patients
+        source = rng.choices(sources, weights)[0]
+        fate = rng.random()
+        patients.append(
+            Patient(
+                id=len(patients),
+                source=source,
+                arrived=now,
+                service=rng.expovariate(1 / config.service_minutes),
+                no_show=source != "WALK_IN" and config.cancel_rate <= fate < config.cancel_rate + config.no_show_rate,
+                cancel_at=now + rng.uniform(1, 30) if fate < config.cancel_rate else None,
+            )
+        )
+
+
+class Clinic:
+    def __init__(self, config: ClinicConfig, overbooking: bool):
+        self.config = config
+        self.sources = set(config.sources) if overbooking else set()
+        # doctor -> source -> (outcomes, no_shows), carried across days
+        self.totals: dict[int, dict[str, tuple[int, int]]] = defaultdict(dict)
+        self.counts: dict[str, float] = defaultdict(float)
+        self.waits: list[float] = []
+
+    def _outcome(self, doctor: int, source: str, no_show: bool) -> None:
+        outcomes, no_shows = self.totals[doctor].get(source, (0, 0))
+        self.totals[doctor][source] = (outcomes + 1, no_shows + int(no_show))
+
+    def _limit(self, doctor: int, source: str) -> int:
+        if source not in self.sources:
+            return self.config.capacity
+        rate = no_show_rate(self.totals[doctor].values(), self.config.min_samples)
+        return self.config.capacity + extra_seats(self.config.capacity, rate, self.config.max_ratio)
+
+    def run_day(self, doctor: int, patients: list[Patient]) -> None:
+        session = self.config.session_minutes
+        queue = QueueEngine()
+        by_id = {p.id: p for p in patients}
+        events = []  # (at, order, kind, patient id)
+        for p in patients:
+            heapq.heappush(events, (p.arrived, 1, "arrive", p.id))
+            if p.cancel_at is not None:
+                heapq.heappush(events, (p.cancel_at, 0, "cancel", p.id))
+
+        free_at, busy_until = 0.0, None
+        while events:
+            now, _, kind, pid = heapq.heappop(events)
+            patient = by_id.get(pid)
+            if kind == "arrive":
+                self.counts["arrivals"] += 1
+                if queue.waiting_count(doctor, 0) >= self._limit(doctor, patient.source):
+                    self.counts["turned_away"] += 1
+                    self.counts[f"turned_away_{patient.source.lower()}"] += 1
+                    continue
+                self.counts["booked"] += 1
+                queue.add(
+                    doctor,
+                    0,
+                    QueueEntry(
+                        appointment_id=pid,
+                        token_number=pid + 1,
+                        patient_name="",
+                        patient_phone="",
+                        created_at=DAY_START + timedelta(minutes=patient.arrived),
+                        source=patient.source,
+                        priority_rank=source_to_rank(patient.source),
+                    ),
+                )
+            elif kind == "cancel":
+                if queue.remove(doctor, 0, pid) is not None:
+                    self.counts["cancelled"] += 1
+            else:  # "done": the doctor is free again
+                busy_until = None
+
+            # the doctor calls the next patient as soon as they are free
+            while busy_until is None:
+                entry = queue.pop_next(doctor, 0)
+                if entry is None:
+                    break
+                called = by_id[entry.appointment_id]
+                self._outcome(doctor, called.source, called.no_show)
+                if called.no_show:
+                    self.counts["no_shows"] += 1
+                    continue
+                start = max(now, free_at)
+                self.waits.append(start - called.arrived)
+                self.counts["served"] += 1
+                free_at = busy_until = start + called.service
+                # busy time inside the session vs. overtime after it
+                self.counts["busy_minutes"] += max(0.0, min(free_at, session) - min(start, session))
+                heapq.heappush(events, (free_at, 2, "done", -1))
+
+        self.counts["overtime_minutes"] += max(0.0, free_at - session)
+
+    def report(self) -> dict:
+        config = self.config
+        doctor_days = config.doctors * config.days
+        waits = sorted(self.waits)
+        rates = [no_show_rate(t.values(), 1) for t in self.totals.values()]
+        return {
+            **{k: int(v) for k, v in sorted(self.counts.items()) if not k.endswith("_minutes")},
+            "utilization": round(self.counts["busy_minutes"] / (doctor_days * config.session_minutes), 3),
+            "overtime_min_per_day": round(self.counts["overtime_minutes"] / doctor_days, 2),
+            "wait_mean_min": round(statistics.fmean(waits), 2) if waits else None,
+            "wait_p90_min": round(waits[int(0.9 * (len(waits) - 1))], 2) if waits else None,
+            "observed_no_show_rate": round(statistics.fmean(r for r in rates if r is not None), 3) if rates else None,
+        }
+
+
+def backtest(config: ClinicConfig) -> dict:
+    runs = {}
+    for name, overbooking in (("capacity", False), ("overbooking", True)):
+        clinic = Clinic(config, overbooking)
+        for day in range(config.days):
+            for doctor in range(config.doctors):
+                clinic.run_day(doctor, generate_day(config, doctor, day))
+        runs[name] = clinic.report()
+
+    before, after = runs["capacity"], runs["overbooking"]
+    runs["change"] = {
+        key: round(after[key] - before[key], 3)
+        for key in ("served", "turned_away", "utilization", "overtime_min_per_day", "wait_mean_min", "wait_p90_min")
+        if before.get(key) is not None and after.get(key) is not None
+    }
+    return runs
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = ClinicConfig()
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--doctors", type=int, default=defaults.doctors)
+    parser.add_argument("--days", type=int, default=defaults.days)
+    parser.add_argument("--session-minutes", type=int, default=defaults.session_minutes)
+    parser.add_argument("--capacity", type=int, default=defaults.capacity)
+    parser.add_argument("--arrivals-per-minute", type=float, default=defaults.arrivals_per_minute)
+    parser.add_argument("--cancel-rate", type=float, default=defaults.cancel_rate)
+    parser.add_argument("--no-show-rate", type=float, default=defaults.no_show_rate)
+    parser.add_argument("--service-minutes", type=float, default=defaults.service_minutes)
+    parser.add_argument("--max-ratio", type=float, default=defaults.max_ratio)
+    parser.add_argument("--min-samples", type=int, default=defaults.min_samples)
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    config = ClinicConfig(**{k: v for k, v in vars(args).items() if k != "out"})
+    report = {"commit": git_commit(), "config": asdict(config), **backtest(config)}
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Backtest queue ETAs against the simulator's event stream.
+
+Replays ``run_simulation.generate_events`` in virtual time through the
+app's own QueueEngine (call order) and WaitEstimator, with no DB or HTTP.
+At booking time it records two predictions of when the patient will be
+called:
+
+* ``ewma``  - position in call order x the doctor's observed service time
+* ``naive`` - slot start + (token - 1) x slot length / capacity
+
+It then compares both with the actual call time of every served patient.
+
+    python stimulation/backtest_wait_times.py --seed 7 --doctors 5 --arrivals 600 --out backtest.json
+"""
+import argparse
+import json
+import statistics
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from run_simulation import SimConfig, generate_events, git_commit  # noqa: E402
+
+from app.models.entities import source_to_rank  # noqa: E402
+from app.services.queue_engine import QueueEngine, QueueEntry  # noqa: E402
+from app.services.wait_estimator import WaitEstimator  # noqa: E402
+
+DAY_START = datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def error_summary(errors: list[float]) -> dict:
+    if not errors:
+        return {"count": 0}
+    absolute = sorted(abs(e) for e in errors)
+    return {
+        "count": len(errors),
+        "mae_min": round(statistics.fmean(absolute), 2),
+        "median_abs_min": round(statistics.median(absolute), 2),
+        "p90_abs_min": round(absolute[int(0.9 * (len(absolute) - 1))], 2),
+        "bias_min": round(statistics.fmean(errors), 2),  # > 0: called later than predicted
+    }
+
+
+def backtest(config: SimConfig, estimator: WaitEstimator | None = None) -> dict:
+    estimator = estimator or WaitEstimator()
+    queue = QueueEngine()
+    slot_length = timedelta(minutes=config.slot_minutes * config.slots_per_doctor)
+    per_patient = slot_length / (config.capacity * config.slots_per_doctor)
+
+    tokens_issued = defaultdict(int)
+    predicted: dict[int, tuple[datetime, datetime]] = {}
+    errors = {"ewma": [], "naive": []}
+
+    for event in generate_events(config):
+        at = DAY_START + timedelta(minutes=event.at)
+        doctor = event.doctor
+
+        if event.kind == "book":
+            tokens_issued[doctor] += 1
+            token_number = tokens_issued[doctor]
+            entry = QueueEntry(
+                appointment_id=event.patient,
+                token_number=token_number,
+                patient_name="",
+                patient_phone="",
+                created_at=at,
+                source=event.source,
+                priority_rank=source_to_rank(event.source),
+            )
+            queue.add(doctor, 0, entry)
+            called = queue.call_order(doctor, 0)
+            position = next(i for i, e in enumerate(called) if e.appointment_id == event.patient)
+            _, etas = estimator.etas(doctor, position + 1, now=at, slot_start=DAY_START, fallback=per_patient)
+            predicted[event.patient] = (etas[-1], DAY_START + (token_number - 1) * per_patient)
+            continue
+
+        queue.remove(doctor, 0, event.patient)
+        if event.kind != "serve":
+            continue
+
+        estimator.record_serve(doctor, at, queue.waiting_count(doctor, 0))
+        actual = DAY_START + timedelta(minutes=event.called_at)
+        ewma, naive = predicted.pop(event.patient)
+        errors["ewma"].append((actual - ewma).total_seconds() / 60)
+        errors["naive"].append((actual - naive).total_seconds() / 60)
+
+    return {name: error_summary(values) for name, values in errors.items()}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--doctors", type=int, default=5)
+    parser.add_argument("--arrivals", type=int, default=600)
+    parser.add_argument("--arrivals-per-minute", type=float, default=0.75)
+    parser.add_argument("--service-minutes", type=float, default=6.0)
+    parser.add_argument("--slot-minutes", type=int, default=240)
+    parser.add_argument("--capacity", type=int, default=40)
+    parser.add_argument("--cancel-rate", type=float, default=0.08)
+    parser.add_argument("--no-show-rate", type=float, default=0.15)
+    parser.add_argument("--alpha", type=float, default=0.2, help="EWMA smoothing factor")
+    parser.add_argument("--min-samples", type=int, default=3)
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    config = SimConfig(
+        seed=args.seed,
+        doctors=args.doctors,
+        slots_per_doctor=1,
+        slot_minutes=args.slot_minutes,
+        capacity=args.capacity,
+        arrivals=args.arrivals,
+        arrivals_per_minute=args.arrivals_per_minute,
+        cancel_rate=args.cancel_rate,
+        no_show_rate=args.no_show_rate,
+        service_minutes=args.service_minutes,
+    )
+    estimator = WaitEstimator(alpha=args.alpha, min_samples=args.min_samples)
+    report = {"commit": git_commit(), "config": vars(args) | {"out": None}, "errors": backtest(config, estimator)}
+
+    text = json.dumps(report, indent=2, default=str)
+    if args.out:
+        args.out.write_text(text)
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""Rebuild the live queue from ``event_logs`` and check it against the DB.
+
+Replays every event in id order into a fresh QueueEngine, then rebuilds a
+second one the usual way (BOOKED appointments) and compares the two per
+(doctor, slot) in call order. Exits non-zero on any difference, so it can
+be used to verify the audit trail after a run or an incident.
+
+    python stimulation/replay_event_log.py --database-url sqlite:///./medoc.db --out replay.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.core.database import make_engine  # noqa: E402
+from app.services.event_log import replay  # noqa: E402
+from app.services.queue_engine import QueueEngine  # noqa: E402
+
+
+def _call_orders(queue: QueueEngine) -> dict[tuple[int, int], list[int]]:
+    orders = {}
+    for doctor_id, slot_id in queue.slots():
+        order = [entry.appointment_id for entry in queue.call_order(doctor_id, slot_id)]
+        if order:
+            orders[(doctor_id, slot_id)] = order
+    return orders
+
+
+def compare(db: Session) -> dict:
+    replayed, expected = QueueEngine(settings.queue_aging_minutes), QueueEngine(settings.queue_aging_minutes)
+    events = replay(db, replayed)
+    expected.rebuild(db)
+
+    got, want = _call_orders(replayed), _call_orders(expected)
+    mismatches = []
+    for doctor_id, slot_id in sorted(got.keys() | want.keys()):
+        replayed_order, db_order = got.get((doctor_id, slot_id), []), want.get((doctor_id, slot_id), [])
+        if replayed_order != db_order:
+            mismatches.append({"doctor_id": doctor_id, "slot_id": slot_id, "replayed": replayed_order, "db": db_order})
+    return {
+        "events": events,
+        "queues": len(want),
+        "waiting": sum(len(order) for order in want.values()),
+        "mismatches": mismatches,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=settings.database_url)
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    engine = make_engine(args.database_url)
+    try:
+        with Session(engine) as db:
+            report = compare(db)
+    finally:
+        engine.dispose()
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text)
+    print(text)
+    return 1 if report["mismatches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
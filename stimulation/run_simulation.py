@@ -0,0 +1,356 @@
+"""Deterministic 9 AM rush simulator.
+
+Generates doctors, slots and a seeded arrival process (Poisson arrivals,
+configurable ONLINE / WALK_IN / PRIORITY / FOLLOW_UP mix, cancellations and
+no-shows), drives the FastAPI app in-process through TestClient against a
+fresh SQLite file, then checks token-sequence integrity and writes a JSON
+report so runs can be compared across commits.
+
+    python stimulation/run_simulation.py --seed 7 --doctors 20 --arrivals 2000 --out sim.json
+"""
+import argparse
+import heapq
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import func  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.database import Base, get_db, make_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.entities import TimeSlot, Token, source_to_rank  # noqa: E402
+from app.services.event_log import event_log, replay  # noqa: E402
+from app.services.overbooking import overbooking_policy  # noqa: E402
+from app.services.patients import patient_cache  # noqa: E402
+from app.services.queue_engine import QueueEngine, queue_engine  # noqa: E402
+from app.services.read_cache import read_cache  # noqa: E402
+from app.services.slot_counters import reconcile  # noqa: E402
+from app.services.slot_resolver import slot_resolver  # noqa: E402
+from app.services.token_engine import token_allocator  # noqa: E402
+from app.services.wait_estimator import wait_estimator  # noqa: E402
+
+DEFAULT_MIX = {"ONLINE": 0.5, "WALK_IN": 0.3, "FOLLOW_UP": 0.15, "PRIORITY": 0.05}
+
+
+@dataclass
+class SimConfig:
+    seed: int = 42
+    doctors: int = 10
+    slots_per_doctor: int = 4
+    slot_minutes: int = 60
+    capacity: int = 20
+    arrivals: int = 500
+    arrivals_per_minute: float = 10.0
+    mix: dict = field(default_factory=lambda: dict(DEFAULT_MIX))
+    cancel_rate: float = 0.08
+    no_show_rate: float = 0.15
+    service_minutes: float = 6.0
+    concurrency: int = 1
+
+
+@dataclass(order=True)
+class Event:
+    at: float  # virtual minutes since the rush started
+    seq: int
+    kind: str = field(compare=False)  # "book" | "cancel" | "serve" | "no_show"
+    patient: int = field(compare=False)
+    doctor: int = field(default=0, compare=False)
+    source: str = field(default="ONLINE", compare=False)
+    called_at: float | None = field(default=None, compare=False)  # serve: when the consultation began
+
+
+def _doctor_day(rng, config: SimConfig, doctor: int, arrivals: list, events: list) -> None:
+    """One doctor working through their arrivals: priority first, then arrival order."""
+    pending = deque(arrivals)
+    waiting: list = []
+    free_at = 0.0
+    while pending or waiting:
+        if not waiting:
+            free_at = max(free_at, pending[0][0])  # idle until the next arrival
+        while pending and pending[0][0] <= free_at:
+            at, patient, rank, cancel_at, no_show = pending.popleft()
+            heapq.heappush(waiting, (rank, at, patient, cancel_at, no_show))
+
+        rank, at, patient, cancel_at, no_show = heapq.heappop(waiting)
+        if cancel_at is not None and cancel_at <= free_at:
+            events.append(Event(cancel_at, len(events), "cancel", patient, doctor))
+        elif no_show:
+            # called but never turns up: the doctor moves straight on
+            events.append(Event(free_at, len(events), "no_show", patient, doctor))
+        else:
+            called_at = free_at
+            free_at += rng.expovariate(1 / config.service_minutes)
+            events.append(Event(free_at, len(events), "serve", patient, doctor, called_at=called_at))
+
+
+def generate_events(config: SimConfig) -> list[Event]:
+    """Same config (incl. seed) -> same event list, always."""
+    rng = random.Random(config.seed)
+    sources, weights = zip(*config.mix.items())
+    arrivals = defaultdict(list)
+
+    events: list[Event] = []
+    now = 0.0
+    for patient in range(config.arrivals):
+        now += rng.expovariate(config.arrivals_per_minute)
+        doctor = rng.randrange(config.doctors)
+        source = rng.choices(sources, weights)[0]
+        events.append(Event(now, len(events), "book", patient, doctor, source))
+
+        fate = rng.random()
+        cancel_at = now + rng.uniform(1, 30) if fate < config.cancel_rate else None
+        no_show = config.cancel_rate <= fate < config.cancel_rate + config.no_show_rate
+        arrivals[doctor].append((now, patient, source_to_rank(source), cancel_at, no_show))
+
+    for doctor in sorted(arrivals):
+        _doctor_day(rng, config, doctor, arrivals[doctor], events)
+    return sorted(events)
+
+
+class Simulation:
+    def __init__(self, config: SimConfig, db_path: Path):
+        self.config = config
+        self.engine = make_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(bind=self.engine)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.outcomes: dict[str, int] = defaultdict(int)
+        self.appointments: dict[int, int] = {}  # patient -> appointment_id
+        self.doctor_ids: list[int] = []
+        self._lock = threading.Lock()
+
+    def _override_get_db(self):
+        db = self.session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def setup(self, client: TestClient) -> None:
+        start = datetime.now(timezone.utc) - timedelta(minutes=5)
+        for d in range(self.config.doctors):
+            doctor = client.post(
+                "/api/v1/doctors",
+                json={"name": f"Dr. Sim {d}", "specialization": "General", "doctor_code": f"SIM{d:04d}"},
+            ).json()
+            self.doctor_ids.append(doctor["id"])
+            for s in range(self.config.slots_per_doctor):
+                slot_start = start + timedelta(minutes=s * self.config.slot_minutes)
+                client.post(
+                    f"/api/v1/doctors/{doctor['id']}/slots",
+                    json={
+                        "start_time": slot_start.isoformat(),
+                        "end_time": (slot_start + timedelta(minutes=self.config.slot_minutes)).isoformat(),
+                        "capacity": self.config.capacity,
+                    },
+                )
+
+    def _call(self, client: TestClient, op: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        resp = client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - started
+
+        if resp.status_code == 200:
+            outcome = f"{op}_ok"
+        elif resp.status_code in (409, 500, 503):
+            outcome = "lock_errors"
+        else:
+            outcome = f"{op}_rejected"
+        with self._lock:
+            self.latencies[op].append(elapsed)
+            self.outcomes[outcome] += 1
+        return resp
+
+    def handle(self, client: TestClient, event: Event) -> None:
+        if event.kind == "book":
+            resp = self._call(
+                client,
+                "book",
+                "POST",
+                "/api/v1/book",
+                json={
+                    "doctor_id": self.doctor_ids[event.doctor],
+                    "patient_name": f"Sim Patient {event.patient}",
+                    "patient_phone": f"8{self.config.seed % 100:02d}{event.patient:07d}",
+                    "source": event.source,
+                },
+            )
+            if resp.status_code == 200:
+                self.appointments[event.patient] = resp.json()["appointment_id"]
+            return
+
+        appointment_id = self.appointments.get(event.patient)
+        if appointment_id is None:
+            return  # booking was rejected
+        verb = {"cancel": "cancel", "serve": "serve", "no_show": "no-show"}[event.kind]
+        self._call(client, event.kind, "PATCH", f"/api/v1/appointments/{appointment_id}/{verb}")
+
+    def run(self, events: list[Event], client: TestClient) -> float:
+        started = time.perf_counter()
+        if self.config.concurrency <= 1:
+            for event in events:
+                self.handle(client, event)
+        else:
+            # bookings fan out; a cancel/serve waits for its own booking
+            pending = {}
+            with ThreadPoolExecutor(max_workers=self.config.concurrency) as pool:
+                for event in events:
+                    booked = pending.get(event.patient)
+                    if event.kind == "book":
+                        pending[event.patient] = pool.submit(self.handle, client, event)
+                    else:
+                        pool.submit(lambda e=event, b=booked: (b and b.result(), self.handle(client, e)))
+        return time.perf_counter() - started
+
+    def integrity(self) -> dict:
+        with self.session_factory() as db:
+            tokens = defaultdict(list)
+            for slot_id, number in db.query(Token.slot_id, Token.token_number):
+                tokens[slot_id].append(number)
+            counters = dict(db.query(TimeSlot.id, TimeSlot.next_token))
+            drift = reconcile(db)
+            total_tokens = db.query(func.count(Token.id)).scalar()
+            # the audit trail must replay to the same live queue
+            replayed = QueueEngine(queue_engine.aging_seconds / 60)
+            replay(db, replayed)
+
+        duplicates = sum(len(numbers) - len(set(numbers)) for numbers in tokens.values())
+        gaps = sum(
+            1
+            for slot_id, next_token in counters.items()
+            if sorted(tokens.get(slot_id, [])) != list(range(1, next_token))
+        )
+        replay_mismatches = sum(
+            1
+            for doctor_id, slot_id in set(queue_engine.slots()) | set(replayed.slots())
+            if queue_engine.call_order(doctor_id, slot_id) != replayed.call_order(doctor_id, slot_id)
+        )
+        return {
+            "tokens": total_tokens,
+            "duplicate_tokens": duplicates,
+            "slots_with_gaps": gaps,
+            "counter_drift": len(drift),
+            "event_log_mismatches": replay_mismatches,
+            "ok": duplicates == 0 and gaps == 0 and not drift and not replay_mismatches,
+        }
+
+
+def percentiles(samples: list[float]) -> dict:
+    if len(samples) < 2:
+        return {"count": len(samples)}
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "count": len(samples),
+        "p50_ms": round(q[49] * 1000, 3),
+        "p95_ms": round(q[94] * 1000, 3),
+        "p99_ms": round(q[98] * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_simulation(config: SimConfig, db_path: Path | None = None) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        sim = Simulation(config, db_path or Path(tmp) / "simulation.db")
+        events = generate_events(config)
+
+        app.dependency_overrides[get_db] = sim._override_get_db
+        # process-wide caches must not leak in from an earlier run
+        caches = (
+            slot_resolver,
+            queue_engine,
+            read_cache,
+            token_allocator,
+            wait_estimator,
+            event_log,
+            patient_cache,
+            overbooking_policy,
+        )
+        for cache in caches:
+            cache.clear()
+        event_log.start(sim.session_factory)
+        try:
+            client = TestClient(app, raise_server_exceptions=False)
+            sim.setup(client)
+            elapsed = sim.run(events, client)
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+            event_log.stop()
+
+        integrity = sim.integrity()
+        sim.engine.dispose()
+
+    return {
+        "commit": git_commit(),
+        "config": asdict(config),
+        "events": len(events),
+        "elapsed_s": round(elapsed, 3),
+        "bookings_per_sec": round(sim.outcomes["book_ok"] / elapsed, 1) if elapsed else None,
+        "outcomes": dict(sim.outcomes),
+        "latency": {op: percentiles(samples) for op, samples in sim.latencies.items()},
+        "integrity": integrity,
+    }
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        source, _, weight = part.partition("=")
+        mix[source.strip().upper()] = float(weight)
+    return mix
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = SimConfig()
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--doctors", type=int, default=defaults.doctors)
+    parser.add_argument("--slots-per-doctor", type=int, default=defaults.slots_per_doctor)
+    parser.add_argument("--slot-minutes", type=int, default=defaults.slot_minutes)
+    parser.add_argument("--capacity", type=int, default=defaults.capacity)
+    parser.add_argument("--arrivals", type=int, default=defaults.arrivals)
+    parser.add_argument("--arrivals-per-minute", type=float, default=defaults.arrivals_per_minute)
+    parser.add_argument("--mix", type=parse_mix, default=defaults.mix, help="e.g. ONLINE=0.5,WALK_IN=0.3,...")
+    parser.add_argument("--cancel-rate", type=float, default=defaults.cancel_rate)
+    parser.add_argument("--no-show-rate", type=float, default=defaults.no_show_rate)
+    parser.add_argument("--service-minutes", type=float, default=defaults.service_minutes)
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency)
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    config = SimConfig(**{k: v for k, v in vars(args).items() if k != "out"})
+    report = run_simulation(config)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text)
+    print(text)
+    return 0 if report["integrity"]["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""Multi-process booking stress test for the token allocators.
+
+Spawns N worker processes (like ``uvicorn --workers N``), each with its own
+engine on one shared database, released together by a barrier. Every
+worker books ``--bookings`` patients into the same open slot through
+``allocate_token`` and counts:
+
+* ok        - booked
+* conflicts - "Booking conflict. Try again." (a 409 once the retries ran out)
+* errors    - anything raised out of allocate_token (what would be a 500)
+* retries   - bookings run again after losing a lock race
+
+The parent then checks the slot for duplicate token numbers and gaps and
+reports everything, totals and per second, as JSON.
+
+    python stimulation/stress_allocation.py --workers 8 --bookings 200 --allocator lock --out stress.json
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT_DIR))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.core.database import Base, make_engine  # noqa: E402
+from app.models.entities import Doctor, TimeSlot, Token  # noqa: E402
+from app.services.token_engine import allocate_token, make_allocator  # noqa: E402
+
+
+def setup_db(url: str, capacity: int) -> tuple[int, int]:
+    engine = make_engine(url)
+    Base.metadata.create_all(bind=engine)
+    start = datetime.now(timezone.utc) - timedelta(minutes=5)
+    with engine.begin() as conn:
+        doctor_id = conn.execute(
+            insert(Doctor).returning(Doctor.id),
+            {"name": "Dr. Stress", "specialization": "General", "doctor_code": "STRESS", "is_active": True},
+        ).scalar_one()
+        slot_id = conn.execute(
+            insert(TimeSlot).returning(TimeSlot.id),
+            {"doctor_id": doctor_id, "start_time": start, "end_time": start + timedelta(hours=8), "capacity": capacity},
+        ).scalar_one()
+    engine.dispose()
+    return doctor_id, slot_id
+
+
+def worker(url: str, allocator_name: str, doctor_id: int, index: int, bookings: int, barrier, results) -> None:
+    engine = make_engine(url)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    allocator = make_allocator(allocator_name)
+    counts = {"ok": 0, "conflicts": 0, "errors": 0, "other": 0}
+
+    barrier.wait()
+    started = time.perf_counter()
+    for i in range(bookings):
+        phone = f"7{index:03d}{i:06d}"
+        try:
+            with session_factory() as db:
+                _, error = allocate_token(db, doctor_id, f"W{index}-{i}", phone, allocator=allocator)
+        except Exception:
+            counts["errors"] += 1
+            continue
+        if error is None:
+            counts["ok"] += 1
+        elif error == "Booking conflict. Try again.":
+            counts["conflicts"] += 1
+        else:
+            counts["other"] += 1
+    elapsed = time.perf_counter() - started
+
+    with session_factory() as db:
+        allocator.close(db)
+    engine.dispose()
+    results.put({**counts, "retries": allocator.stats.snapshot()["retries"], "elapsed": elapsed})
+
+
+def integrity(url: str, slot_id: int) -> dict:
+    engine = make_engine(url)
+    with engine.connect() as conn:
+        numbers = [n for (n,) in conn.execute(Token.__table__.select().with_only_columns(Token.token_number).where(Token.slot_id == slot_id))]
+        next_token = conn.execute(TimeSlot.__table__.select().with_only_columns(TimeSlot.next_token).where(TimeSlot.id == slot_id)).scalar_one()
+    engine.dispose()
+    return {
+        "tokens": len(numbers),
+        "duplicates": len(numbers) - len(set(numbers)),
+        "gaps": len(set(range(1, next_token)) - set(numbers)),
+    }
+
+
+def run_stress(url: str, workers: int = 4, bookings: int = 100, allocator: str = "db") -> dict:
+    doctor_id, slot_id = setup_db(url, capacity=workers * bookings)
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier, results = ctx.Barrier(workers), ctx.Queue()
+    processes = [
+        ctx.Process(target=worker, args=(url, allocator, doctor_id, index, bookings, barrier, results))
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    per_worker = [results.get(timeout=600) for _ in processes]
+    for process in processes:
+        process.join()
+
+    elapsed = max(w["elapsed"] for w in per_worker)
+    totals = {key: sum(w[key] for w in per_worker) for key in ("ok", "conflicts", "errors", "other", "retries")}
+    checks = integrity(url, slot_id)
+    return {
+        "allocator": allocator,
+        "workers": workers,
+        "bookings_per_worker": bookings,
+        "elapsed_s": round(elapsed, 3),
+        **totals,
+        **checks,
+        "per_sec": {
+            key: round(value / elapsed, 1) if elapsed else None
+            for key, value in {**totals, "duplicates": checks["duplicates"]}.items()
+        },
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--bookings", type=int, default=100, help="per worker")
+    parser.add_argument("--allocator", choices=["db", "lock", "block"], default="db")
+    parser.add_argument("--database-url", help="default: a fresh SQLite file")
+    parser.add_argument("--out", type=Path, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{Path(tmp) / 'stress.db'}"
+        report = run_stress(url, args.workers, args.bookings, args.allocator)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text)
+    print(text)
+    return 1 if report["errors"] or report["duplicates"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
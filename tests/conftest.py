@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import asyncio
+
+import pytest
+from alembic.config import Config
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base, get_async_db, get_db, make_async_engine, make_engine
+from app.main import app
+from app.models import entities  # noqa: F401  (register tables on Base)
+from app.services.capacity import capacity_cache
+from app.services.event_log import event_log
+from app.services.idempotency import idempotency_store
+from app.services.overbooking import overbooking_policy
+from app.services.patients import patient_cache
+from app.services.read_cache import read_cache
+from app.services.slot_resolver import slot_resolver
+from app.services.token_engine import token_allocator
+from app.services.wait_estimator import wait_estimator
+
+
+def pytest_addoption(parser):
+    parser.addoption("--run-slow", action="store_true", help="also run tests marked slow (large benchmark data sets)")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: long-running; skipped unless --run-slow is given")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-slow"):
+        return
+    skip = pytest.mark.skip(reason="slow: run with --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
+
+
+ALEMBIC_DIR = Path(__file__).resolve().parents[1] / "alembic"
+
+
+@pytest.fixture
+def alembic_config(monkeypatch):
+    """Alembic config for a database URL, to run the migrations against."""
+
+    def _config(url):
+        # env.py migrates settings.database_url; no ini file so logging is left alone
+        monkeypatch.setattr(settings, "database_url", url)
+        config = Config()
+        config.set_main_option("script_location", str(ALEMBIC_DIR))
+        return config
+
+    return _config
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    # startup hooks (queue rebuild, ...) open sessions through app.main.SessionLocal
+    monkeypatch.setattr("app.main.SessionLocal", session_factory)
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async_engine = make_async_engine(str(session_factory.kw["bind"].url))
+    async_session_factory = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with async_session_factory() as db:
+            yield db
+
+    # process-wide caches must not leak between test DBs
+    slot_resolver.clear()
+    read_cache.clear()
+    capacity_cache.clear()
+    token_allocator.clear()
+    wait_estimator.clear()
+    idempotency_store.clear()
+    event_log.clear()
+    patient_cache.clear()
+    overbooking_policy.clear()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(app) as c:
+        yield c
+    app.dependency_overrides.clear()
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture
+def make_doctor(client):
+    """Create a doctor with one slot that is open right now."""
+
+    def _make(code="DOC1", capacity=10, hours=4):
+        return _create_doctor_with_slot(client, code, capacity, hours)
+
+    return _make
+
+
+def _create_doctor_with_slot(client, code, capacity, hours):
+    doctor = client.post(
+        "/api/v1/doctors",
+        json={"name": "Dr. Test", "specialization": "General", "doctor_code": code},
+    ).json()
+
+    start = datetime.now(timezone.utc) - timedelta(minutes=5)
+    slot = client.post(
+        f"/api/v1/doctors/{doctor['id']}/slots",
+        json={
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=hours)).isoformat(),
+            "capacity": capacity,
+        },
+    ).json()
+    return doctor, slot
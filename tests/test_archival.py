@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select
+
+from app.models.entities import (
+    Appointment,
+    ArchivedAppointment,
+    ArchivedTimeSlot,
+    ArchivedToken,
+    Patient,
+    TimeSlot,
+    Token,
+)
+from app.services.archival import archive_finished_slots
+from app.services.slot_counters import reconcile
+
+
+def _slot_with(db, doctor_id, ended_days_ago, statuses):
+    end = datetime.now(timezone.utc) - timedelta(days=ended_days_ago)
+    slot_id = db.execute(
+        insert(TimeSlot).returning(TimeSlot.id),
+        {
+            "doctor_id": doctor_id,
+            "start_time": end - timedelta(hours=4),
+            "end_time": end,
+            "capacity": 10,
+            "next_token": len(statuses) + 1,
+            "booked_count": statuses.count("BOOKED"),
+            "served_count": statuses.count("SERVED"),
+            "cancelled_count": statuses.count("CANCELLED"),
+        },
+    ).scalar_one()
+    for number, status in enumerate(statuses, start=1):
+        patient = Patient(name=f"H{slot_id}-{number}", phone=f"95{slot_id:04d}{number:04d}")
+        appointment = Appointment(doctor_id=doctor_id, patient=patient, slot_id=slot_id, status=status)
+        db.add(Token(appointment=appointment, slot_id=slot_id, token_number=number))
+    db.commit()
+    return slot_id
+
+
+def count(db, model):
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_archives_only_finished_slots_past_retention(client, make_doctor, session_factory):
+    doctor, current = make_doctor()
+    doctor_id = doctor["id"]
+    with session_factory() as db:
+        old = [_slot_with(db, doctor_id, 40 + i, ["SERVED", "CANCELLED", "SERVED"]) for i in range(3)]
+        still_waiting = _slot_with(db, doctor_id, 45, ["SERVED", "BOOKED"])
+        recent = _slot_with(db, doctor_id, 2, ["SERVED"])
+    url, history = f"/api/v1/doctors/{doctor_id}/slots", {"start_from": "2000-01-01T00:00:00Z"}
+    listed = client.get(url, params=history).json()
+    assert len(listed) == 6
+
+    with session_factory() as db:
+        totals = archive_finished_slots(db, retention_days=30, batch_size=2)
+        assert totals == {"slots": 3, "appointments": 9, "tokens": 9, "batches": 2}
+
+        live = set(db.scalars(select(TimeSlot.id)))
+        assert live == {current["id"], still_waiting, recent}
+        assert set(db.scalars(select(ArchivedTimeSlot.id))) == set(old)
+        assert count(db, ArchivedAppointment) == count(db, ArchivedToken) == 9
+        assert count(db, Appointment) == count(db, Token) == 3
+        archived = db.scalars(select(ArchivedTimeSlot).where(ArchivedTimeSlot.id == old[0])).one()
+        assert (archived.served_count, archived.cancelled_count, archived.next_token) == (2, 1, 4)
+        assert reconcile(db) == []
+
+        # nothing left to do
+        assert archive_finished_slots(db, retention_days=30)["slots"] == 0
+
+    # listings drop the archived slots straight away; booking is unaffected
+    assert {s["id"] for s in client.get(url, params=history).json()} == live
+    booked = client.post(
+        "/api/v1/book", json={"doctor_id": doctor_id, "patient_name": "New", "patient_phone": "9500000000"}
+    )
+    assert booked.status_code == 200
+    assert booked.json()["token_number"] == 1
+
+
+def test_appointments_without_a_token_are_archived_too(client, make_doctor, session_factory):
+    doctor, _ = make_doctor()
+    with session_factory() as db:
+        slot_id = _slot_with(db, doctor["id"], 40, ["SERVED", "SERVED"])
+        # e.g. rows migrated from before tokens had a slot
+        legacy = Patient(name="Legacy", phone="9500009999")
+        db.add(Appointment(doctor_id=doctor["id"], patient=legacy, slot_id=slot_id, status="SERVED"))
+        db.commit()
+
+        totals = archive_finished_slots(db, retention_days=30)
+        assert (totals["slots"], totals["appointments"], totals["tokens"]) == (1, 3, 2)
+        assert db.scalar(select(func.count()).where(Appointment.slot_id == slot_id)) == 0
+        assert count(db, ArchivedAppointment) == 3
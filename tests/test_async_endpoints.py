@@ -0,0 +1,68 @@
+import asyncio
+
+import httpx
+
+from app.main import app
+
+REQUESTS = 200
+CONCURRENCY = 50
+
+
+def test_async_endpoints_match_sync_behaviour(client, make_doctor):
+    doctor, slot = make_doctor(capacity=2)
+    body = {"doctor_id": doctor["id"], "patient_name": "Async", "patient_phone": "9100000001"}
+
+    first = client.post("/api/v1/async/book", json=body)
+    assert first.status_code == 200
+    assert first.json()["token_number"] == 1
+    assert client.post("/api/v1/async/book", json=body).json()["detail"] == (
+        "Patient already has a booking in this slot"
+    )
+
+    second = client.post("/api/v1/book", json={**body, "patient_phone": "9100000002"}).json()
+    assert second["token_number"] == 2
+    assert client.post("/api/v1/async/book", json={**body, "patient_phone": "9100000003"}).json()["detail"] == (
+        "Slot is full"
+    )
+
+    queue = client.get(f"/api/v1/async/doctors/{doctor['id']}/queue").json()
+    assert [t["token_number"] for t in queue["tokens"]] == [1, 2]
+    sync_queue = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()
+    # ETAs are relative to the request time
+    for q in (queue, sync_queue):
+        for token in q["tokens"]:
+            token.pop("estimated_time")
+    assert queue == sync_queue
+
+    served = client.patch(f"/api/v1/async/appointments/{first.json()['appointment_id']}/serve")
+    assert served.json()["status"] == "SERVED"
+    assert client.patch(f"/api/v1/async/appointments/{first.json()['appointment_id']}/cancel").status_code == 400
+    assert client.patch(f"/api/v1/async/appointments/{second['appointment_id']}/cancel").json()["status"] == (
+        "CANCELLED"
+    )
+    assert client.get(f"/api/v1/async/doctors/{doctor['id']}/queue").json()["tokens"] == []
+
+
+async def _load(path: str, doctor_id: int) -> list[int]:
+    gate = asyncio.Semaphore(CONCURRENCY)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+
+        async def book(i):
+            async with gate:
+                resp = await http.post(
+                    path,
+                    json={"doctor_id": doctor_id, "patient_name": f"L{i}", "patient_phone": f"{doctor_id}{i:09d}"},
+                )
+                return resp.json()["token_number"]
+
+        return sorted(await asyncio.gather(*(book(i) for i in range(REQUESTS))))
+
+
+def test_load_sync_vs_async_booking(client, make_doctor):
+    # latency under the same load: test_benchmarks.test_bench_concurrent_booking
+    sync_doctor, _ = make_doctor(code="SYNC", capacity=REQUESTS)
+    async_doctor, _ = make_doctor(code="ASYNC", capacity=REQUESTS)
+
+    assert asyncio.run(_load("/api/v1/book", sync_doctor["id"])) == list(range(1, REQUESTS + 1))
+    assert asyncio.run(_load("/api/v1/async/book", async_doctor["id"])) == list(range(1, REQUESTS + 1))
@@ -0,0 +1,329 @@
+"""Benchmarks for the booking / queue / cancel / serve hot paths.
+
+Each operation runs against 10, 1k and 100k historical slots + appointments
+(seeded with executemany inserts), once with the history in the live tables
+and once after it was moved out by the archival job ("-archived"), which
+should read the same at every size. Wall time goes through pytest-benchmark;
+the number of SQL statements per call is counted with a cursor event and
+must stay within STATEMENT_BUDGET at every size, so a query that starts to
+scale with history fails the run even on a noisy machine.
+
+Save a timing baseline and gate later runs on it:
+
+    pytest tests/test_benchmarks.py --run-slow --benchmark-autosave
+    pytest tests/test_benchmarks.py --run-slow --benchmark-compare --benchmark-compare-fail=median:25%
+
+``BENCH_SIZES=10,1000`` limits the data sizes. Sizes from SLOW_SIZE up
+(the 100k seed) and the concurrent booking load are marked ``slow``: a
+plain ``pytest`` run skips them, ``--run-slow`` includes them.
+
+``test_bench_queue_serialization`` times the queue payload for a walk-in
+clinic (QUEUE_WAITING tokens) through the old per-token Pydantic models and
+through the plain rows / columnar path, with the bytes allocated per call.
+
+``test_bench_concurrent_booking`` fires BOOKING_LOAD bookings with
+BOOKING_CONCURRENCY in flight at the sync and the async booking route and
+records the per-request p50 / p99 latency next to the timing.
+"""
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert
+from pydantic_core import to_json
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, get_db, make_engine
+from app.main import app
+from app.api.v1.queue import _queue_payload
+from app.models.entities import Appointment, Doctor, Patient, TimeSlot, Token, TokenSource
+from app.schemas.queue import QueueResponse, QueueTokenItem
+from app.services.archival import archive_finished_slots
+from app.services.patients import patient_cache
+from app.services.queue_engine import QueueEntry, queue_engine
+from app.services.slot_resolver import SlotInfo, slot_resolver
+from app.services.token_engine import allocate_token
+
+SIZES = [int(s) for s in os.environ.get("BENCH_SIZES", "10,1000,100000").split(",")]
+SLOW_SIZE = 100_000
+ROUNDS = 20
+
+# SQL statements per call; must not grow with the amount of history
+STATEMENT_BUDGET = {
+    "book_token": 7,
+    "get_queue": 2,
+    "cancel_appointment": 4,
+    "serve_appointment": 5,
+    "allocate_token": 6,
+}
+
+QUEUE_WAITING = 200
+
+BOOKING_LOAD = 200
+BOOKING_CONCURRENCY = 50
+
+
+class Bench:
+    def __init__(self, engine, session_factory, doctor_id):
+        self.engine = engine
+        self.session_factory = session_factory
+        self.doctor_id = doctor_id
+        self.client = TestClient(app)
+        self.statements = 0
+        self._phones = itertools.count()
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.statements += 1
+
+    def next_phone(self) -> str:
+        return f"6{next(self._phones):09d}"
+
+    def book(self) -> int:
+        resp = self.client.post(
+            "/api/v1/book",
+            json={"doctor_id": self.doctor_id, "patient_name": "Bench", "patient_phone": self.next_phone()},
+        )
+        assert resp.status_code == 200, resp.text
+        return resp.json()["appointment_id"]
+
+
+def _seed(engine, size: int) -> int:
+    now = datetime.now(timezone.utc)
+    doctors = max(1, size // 100)
+
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Doctor),
+            [{"id": d + 1, "name": f"Dr. {d}", "doctor_code": f"HIST{d}", "is_active": True} for d in range(doctors)],
+        )
+        slots = []
+        for i in range(size):
+            start = now - timedelta(minutes=30 * (i + 2))
+            slots.append(
+                {
+                    "id": i + 1,
+                    "doctor_id": i % doctors + 1,
+                    "start_time": start,
+                    "end_time": start + timedelta(minutes=30),
+                    "capacity": 10,
+                    "next_token": 2,
+                    "served_count": 1,
+                }
+            )
+        conn.execute(insert(TimeSlot), slots)
+        conn.execute(insert(Patient), [{"id": i + 1, "name": f"P{i}", "phone": f"7{i:09d}"} for i in range(size)])
+        conn.execute(
+            insert(Appointment),
+            [
+                {
+                    "id": s["id"],
+                    "doctor_id": s["doctor_id"],
+                    "patient_id": s["id"],
+                    "slot_id": s["id"],
+                    "status": "SERVED",
+                    "source": "ONLINE",
+                    "priority_rank": 3,
+                }
+                for s in slots
+            ],
+        )
+        conn.execute(
+            insert(Token),
+            [{"appointment_id": s["id"], "slot_id": s["id"], "token_number": 1, "source": "ONLINE"} for s in slots],
+        )
+
+        # the doctor everyone books with: lots of history + one slot open now
+        start = now - timedelta(minutes=5)
+        conn.execute(
+            insert(TimeSlot),
+            {"doctor_id": 1, "start_time": start, "end_time": start + timedelta(hours=8), "capacity": 100_000},
+        )
+    return 1
+
+
+@pytest.fixture(
+    scope="module",
+    params=[
+        pytest.param((size, archived), marks=pytest.mark.slow if size >= SLOW_SIZE else ())
+        for size in SIZES
+        for archived in (False, True)
+    ],
+    ids=lambda param: f"{param[0]}rows" + ("-archived" if param[1] else ""),
+)
+def bench(request, tmp_path_factory):
+    size, archived = request.param
+    engine = make_engine(f"sqlite:///{tmp_path_factory.mktemp('bench') / 'bench.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    doctor_id = _seed(engine, size)
+    if archived:
+        with session_factory() as db:
+            assert archive_finished_slots(db, retention_days=0, batch_size=5000)["slots"] == size
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    slot_resolver.clear()
+    queue_engine.clear()
+    patient_cache.clear()
+    app.dependency_overrides[get_db] = override_get_db
+    yield Bench(engine, session_factory, doctor_id)
+    app.dependency_overrides.pop(get_db, None)
+    queue_engine.clear()
+    engine.dispose()
+
+
+def _run(bench, benchmark, name, fn, setup=None):
+    counts = []
+
+    def measured(*args):
+        before = bench.statements
+        fn(*args)
+        counts.append(bench.statements - before)
+
+    benchmark.pedantic(measured, setup=setup, rounds=ROUNDS, iterations=1, warmup_rounds=1)
+    benchmark.extra_info["sql_statements"] = max(counts)
+    assert max(counts) <= STATEMENT_BUDGET[name], f"{name}: {counts}"
+
+
+def test_bench_book_token(bench, benchmark):
+    _run(bench, benchmark, "book_token", bench.book)
+
+
+def test_bench_get_queue(bench, benchmark):
+    for _ in range(20):
+        bench.book()
+
+    def get_queue():
+        assert bench.client.get(f"/api/v1/doctors/{bench.doctor_id}/queue").status_code == 200
+
+    _run(bench, benchmark, "get_queue", get_queue)
+
+
+@pytest.mark.parametrize("verb", ["cancel", "serve"])
+def test_bench_transition(bench, benchmark, verb):
+    def transition(appointment_id):
+        assert bench.client.patch(f"/api/v1/appointments/{appointment_id}/{verb}").status_code == 200
+
+    _run(bench, benchmark, f"{verb}_appointment", transition, setup=lambda: ((bench.book(),), {}))
+
+
+def test_bench_allocate_token(bench, benchmark):
+    def allocate():
+        with bench.session_factory() as db:
+            result, error = allocate_token(db, bench.doctor_id, "Bench", bench.next_phone(), TokenSource.ONLINE)
+        assert error is None, error
+
+    _run(bench, benchmark, "allocate_token", allocate)
+
+
+def _queue_via_models(doctor_id, slot, next_token) -> bytes:
+    # what get_queue did before: a model per token, then FastAPI's response_model
+    # round trip (dump, validate again, dump to JSON-able, json.dumps)
+    payload = _queue_payload(doctor_id, slot, next_token)
+    response = QueueResponse(**{**payload, "tokens": [QueueTokenItem(**t) for t in payload["tokens"]]})
+    validated = QueueResponse.model_validate(response.model_dump())
+    return json.dumps(validated.model_dump(mode="json")).encode()
+
+
+QUEUE_SERIALIZERS = {
+    "models": _queue_via_models,
+    "rows": lambda *args: to_json(_queue_payload(*args)),
+    "columnar": lambda *args: to_json(_queue_payload(*args, columnar=True)),
+}
+
+
+@pytest.fixture(scope="module")
+def waiting_queue():
+    now = datetime.now(timezone.utc)
+    slot = SlotInfo(id=1, doctor_id=1, start_time=now, end_time=now + timedelta(hours=8), capacity=QUEUE_WAITING)
+    queue_engine.clear()
+    for n in range(1, QUEUE_WAITING + 1):
+        entry = QueueEntry(n, n, f"Walk-in {n}", f"9{n:09d}", now, source="WALK_IN", priority_rank=2)
+        queue_engine.add(1, 1, entry)
+    yield (1, slot, QUEUE_WAITING + 1)
+    queue_engine.clear()
+
+
+def _allocated(fn, *args) -> int:
+    tracemalloc.start()
+    try:
+        fn(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("path", QUEUE_SERIALIZERS)
+def test_bench_queue_serialization(waiting_queue, benchmark, path):
+    serialize = QUEUE_SERIALIZERS[path]
+    body = benchmark(serialize, *waiting_queue)
+    tokens = json.loads(body)["tokens"]
+    assert len(tokens["token_numbers"] if path == "columnar" else tokens) == QUEUE_WAITING
+
+    benchmark.extra_info["peak_bytes"] = allocated = _allocated(serialize, *waiting_queue)
+    if path != "models":
+        assert allocated < _allocated(QUEUE_SERIALIZERS["models"], *waiting_queue)
+
+
+async def _booking_load(path: str, doctor_id: int) -> tuple[list[int], list[float]]:
+    gate = asyncio.Semaphore(BOOKING_CONCURRENCY)
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+
+        async def book(i):
+            async with gate:
+                started = time.perf_counter()
+                resp = await http.post(
+                    path,
+                    json={"doctor_id": doctor_id, "patient_name": f"L{i}", "patient_phone": f"8{doctor_id:03d}{i:06d}"},
+                )
+                latencies.append(time.perf_counter() - started)
+                return resp.json()["token_number"]
+
+        tokens = await asyncio.gather(*(book(i) for i in range(BOOKING_LOAD)))
+    return sorted(tokens), latencies
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("path", ["/api/v1/book", "/api/v1/async/book"], ids=["sync", "async"])
+def test_bench_concurrent_booking(client, make_doctor, benchmark, path):
+    doctors = itertools.count()
+    latencies = []
+    # the async engine's pool belongs to the loop that first used it
+    loop = asyncio.new_event_loop()
+
+    def setup():
+        doctor, _ = make_doctor(code=f"LOAD{next(doctors)}", capacity=BOOKING_LOAD)
+        return (doctor["id"],), {}
+
+    def load(doctor_id):
+        tokens, call_latencies = loop.run_until_complete(_booking_load(path, doctor_id))
+        assert tokens == list(range(1, BOOKING_LOAD + 1))
+        latencies.extend(call_latencies)
+
+    try:
+        benchmark.pedantic(load, setup=setup, rounds=3, iterations=1)
+    finally:
+        loop.close()
+    quantiles = statistics.quantiles(latencies, n=100)
+    benchmark.extra_info.update(
+        requests=BOOKING_LOAD,
+        concurrency=BOOKING_CONCURRENCY,
+        p50_ms=round(quantiles[49] * 1000, 2),
+        p99_ms=round(quantiles[98] * 1000, 2),
+    )
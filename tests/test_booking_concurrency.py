@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from app.api.v1.booking import book_token
+from app.models.entities import Appointment, TimeSlot, Token
+from app.schemas.booking import BookingRequest
+
+CLIENTS = 60
+
+
+def test_book_assigns_sequential_tokens(client, make_doctor):
+    doctor, slot = make_doctor(capacity=3)
+
+    numbers = []
+    for i in range(3):
+        resp = client.post(
+            "/api/v1/book",
+            json={"doctor_id": doctor["id"], "patient_name": f"P{i}", "patient_phone": f"900000000{i}"},
+        )
+        assert resp.status_code == 200
+        numbers.append(resp.json()["token_number"])
+    assert numbers == [1, 2, 3]
+
+    full = client.post(
+        "/api/v1/book",
+        json={"doctor_id": doctor["id"], "patient_name": "Late", "patient_phone": "9000000099"},
+    )
+    assert full.status_code == 400
+    assert full.json()["detail"] == "Slot is full"
+
+    queue = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()
+    assert queue["next_token_number"] == 4
+
+
+def test_rejected_booking_does_not_consume_token(client, make_doctor, session_factory):
+    doctor, slot = make_doctor()
+    body = {"doctor_id": doctor["id"], "patient_name": "Dup", "patient_phone": "9111111111"}
+
+    assert client.post("/api/v1/book", json=body).status_code == 200
+    assert client.post("/api/v1/book", json=body).status_code == 400
+
+    with session_factory() as db:
+        assert db.get(TimeSlot, slot["id"]).next_token == 2
+
+
+def test_concurrent_bookings_are_unique_and_gap_free(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=CLIENTS + 10)
+
+    def book(i):
+        with session_factory() as db:
+            payload = BookingRequest(
+                doctor_id=doctor["id"], patient_name=f"Patient {i}", patient_phone=f"98{i:08d}"
+            )
+            try:
+                return book_token(payload, db, idempotency_key=None).token_number
+            except HTTPException as exc:
+                return exc
+
+    with ThreadPoolExecutor(max_workers=CLIENTS) as pool:
+        results = list(pool.map(book, range(CLIENTS)))
+
+    errors = [r for r in results if isinstance(r, HTTPException)]
+    assert not errors
+    assert sorted(results) == list(range(1, CLIENTS + 1))
+
+    with session_factory() as db:
+        tokens = [t for (t,) in db.query(Token.token_number).filter(Token.slot_id == slot["id"])]
+        assert sorted(tokens) == list(range(1, CLIENTS + 1))
+        assert db.query(Appointment).filter(Appointment.slot_id == slot["id"]).count() == CLIENTS
+        assert db.get(TimeSlot, slot["id"]).next_token == CLIENTS + 1
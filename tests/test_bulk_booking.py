@@ -0,0 +1,106 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from app.models.entities import NoShowStat, TimeSlot
+
+
+def add_slot(client, doctor_id, start, capacity):
+    return client.post(
+        f"/api/v1/doctors/{doctor_id}/slots",
+        json={
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=1)).isoformat(),
+            "capacity": capacity,
+        },
+    ).json()
+
+
+def test_bulk_spills_over_and_reports_per_row(client, make_doctor):
+    doctor, first_slot = make_doctor(capacity=2, hours=1)
+    second_slot = add_slot(client, doctor["id"], datetime.now(timezone.utc) + timedelta(hours=2), 2)
+
+    # existing patient is reused, not duplicated
+    client.post(
+        "/api/v1/book",
+        json={"doctor_id": doctor["id"], "patient_name": "Old", "patient_phone": "9300000000"},
+    )
+
+    rows = [
+        {"doctor_id": doctor["id"], "patient_name": "A", "patient_phone": "9300000001"},
+        {"doctor_id": doctor["id"], "patient_name": "B", "patient_phone": "9300000002"},
+        {"doctor_id": 999, "patient_name": "C", "patient_phone": "9300000003"},
+        {"doctor_id": doctor["id"], "patient_name": "D"},
+        {"doctor_id": doctor["id"], "patient_name": "E", "patient_phone": "9300000004"},
+        {"doctor_id": doctor["id"], "patient_name": "F", "patient_phone": "9300000005"},
+    ]
+    results = client.post("/api/v1/book/bulk", json=rows).json()
+
+    assert [r["index"] for r in results] == list(range(6))
+    assert (results[0]["slot_id"], results[0]["token_number"]) == (first_slot["id"], 2)
+    assert (results[1]["slot_id"], results[1]["token_number"]) == (second_slot["id"], 1)
+    assert results[2]["error"] == "Doctor not found"
+    assert results[3]["error"].startswith("Invalid row: patient_phone")
+    assert (results[4]["slot_id"], results[4]["token_number"]) == (second_slot["id"], 2)
+    assert results[5]["error"] == "Slot is full"
+
+    queue = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()
+    assert [t["patient_name"] for t in queue["tokens"]] == ["Old", "A"]
+    assert queue["next_token_number"] == 3
+
+
+def test_bulk_ndjson_uses_constant_statement_count(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=500)
+    engine = session_factory.kw["bind"]
+
+    def run(n, offset):
+        lines = "\n".join(
+            json.dumps({"doctor_id": doctor["id"], "patient_name": f"P{i}", "patient_phone": f"92{i:08d}"})
+            for i in range(offset, offset + n)
+        )
+        statements = []
+
+        def count(*args):
+            statements.append(1)
+
+        event.listen(engine, "before_cursor_execute", count)
+        results = client.post(
+            "/api/v1/book/bulk", content=lines, headers={"content-type": "application/x-ndjson"}
+        ).json()
+        event.remove(engine, "before_cursor_execute", count)
+        assert all("error" not in r or r["error"] is None for r in results)
+        return [r["token_number"] for r in results], len(statements)
+
+    small, small_count = run(5, 0)
+    large, large_count = run(200, 5)
+
+    assert small == list(range(1, 6))
+    assert large == list(range(6, 206))
+    assert small_count == large_count
+
+
+def test_bulk_overbooks_walk_ins_and_estimates_in_call_order(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=4, hours=1)
+    with session_factory() as db:
+        db.add(NoShowStat(doctor_id=doctor["id"], source="ONLINE", outcomes=50, no_shows=10))
+        db.commit()
+
+    def row(phone, source):
+        return {"doctor_id": doctor["id"], "patient_name": phone[-2:], "patient_phone": phone, "source": source}
+
+    rows = [row(f"93100000{i:02d}", "ONLINE") for i in range(5)]
+    rows += [row("9310000010", "PRIORITY"), row("9310000011", "WALK_IN")]
+    results = client.post("/api/v1/book/bulk", json=rows).json()
+
+    # 20% no-shows: one extra seat on capacity 4, for walk-ins and priority only
+    assert [r.get("error") for r in results] == [None] * 4 + ["Slot is full", None, "Slot is full"]
+    with session_factory() as db:
+        assert db.get(TimeSlot, slot["id"]).booked_count == 5
+
+    # priority is called first even though it was booked last
+    etas = {r["index"]: datetime.fromisoformat(r["estimated_time"]) for r in results if r.get("error") is None}
+    called = sorted(etas, key=etas.get)
+    assert called == [5, 0, 1, 2, 3]
+    per_patient = timedelta(hours=1) / 4
+    assert [etas[b] - etas[a] for a, b in zip(called, called[1:])] == [per_patient] * 4
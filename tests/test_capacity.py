@@ -0,0 +1,93 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+DAY = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+
+
+def _doctor(client, code, specialization):
+    return client.post(
+        "/api/v1/doctors", json={"name": f"Dr. {code}", "specialization": specialization, "doctor_code": code}
+    ).json()
+
+
+def _slot(client, doctor_id, start, capacity=4):
+    end = start + timedelta(hours=2)
+    return client.post(
+        f"/api/v1/doctors/{doctor_id}/slots",
+        json={"start_time": start.isoformat(), "end_time": end.isoformat(), "capacity": capacity},
+    ).json()
+
+
+def test_capacity_covers_every_doctor_and_slot(client, make_doctor, session_factory):
+    doctor, current = make_doctor(code="NOW", capacity=4)
+    for i in range(3):
+        client.post(
+            "/api/v1/book",
+            json={"doctor_id": doctor["id"], "patient_name": f"P{i}", "patient_phone": f"94{i:08d}"},
+        )
+    booked = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()["tokens"]
+    client.patch(f"/api/v1/appointments/{booked[0]['appointment_id']}/serve")
+    client.patch(f"/api/v1/appointments/{booked[1]['appointment_id']}/cancel")
+
+    start = datetime.fromisoformat(current["start_time"])
+    report = client.get(
+        "/api/v1/capacity",
+        params={"from": (start - timedelta(minutes=1)).isoformat(), "to": (start + timedelta(hours=1)).isoformat()},
+    ).json()
+    (row,) = report["slots"]
+    assert (row["booked"], row["served"], row["cancelled"]) == (1, 1, 1)
+    assert row["utilization"] == 0.5
+    assert report["totals"]["capacity"] == 4
+
+
+def test_capacity_filters_department_in_one_query(client, session_factory):
+    cardio, ortho = _doctor(client, "C1", "Cardiology"), _doctor(client, "O1", "Ortho")
+    for day in range(3):
+        _slot(client, cardio["id"], DAY + timedelta(days=day))
+        _slot(client, ortho["id"], DAY + timedelta(days=day))
+
+    statements = []
+    engine = session_factory.kw["bind"]
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        window = {"from": DAY.isoformat(), "to": (DAY + timedelta(days=2)).isoformat()}
+        report = client.get("/api/v1/capacity", params={**window, "department": "Cardiology"}).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert len(statements) == 1
+    assert [r["doctor_id"] for r in report["slots"]] == [cardio["id"]] * 2
+    assert report["totals"] == {
+        "slots": 2,
+        "capacity": 8,
+        "booked": 0,
+        "served": 0,
+        "cancelled": 0,
+        "no_show": 0,
+        "utilization": 0.0,
+    }
+
+
+def test_long_windows_stream_the_same_document(client):
+    doctor = _doctor(client, "S1", "General")
+    for day in range(10):
+        _slot(client, doctor["id"], DAY + timedelta(days=day))
+
+    params = {"from": DAY.isoformat(), "to": (DAY + timedelta(days=30)).isoformat()}
+    with client.stream("GET", "/api/v1/capacity", params=params) as resp:
+        assert resp.status_code == 200
+        assert "content-length" not in resp.headers
+        body = b"".join(resp.iter_bytes())
+
+    report = json.loads(body)
+    assert report["totals"]["slots"] == 10
+    assert report["slots"][0]["start_time"] == DAY.isoformat()
+
+
+def test_capacity_rejects_bad_windows(client):
+    assert client.get("/api/v1/capacity", params={"from": DAY.isoformat(), "to": DAY.isoformat()}).status_code == 400
+    far = (DAY + timedelta(days=400)).isoformat()
+    assert client.get("/api/v1/capacity", params={"from": DAY.isoformat(), "to": far}).status_code == 400
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from sqlalchemy import text
+
+from app.core.config import Settings
+from app.core.database import async_url, make_engine
+from app.core.pool_metrics import pool_status
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_sqlite_pragmas_and_pool_settings(tmp_path):
+    config = Settings(db_pool_size=3, db_max_overflow=2, sqlite_busy_timeout_ms=1234)
+    engine = make_engine(f"sqlite:///{tmp_path / 'tuned.db'}", config)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+
+        status = pool_status(engine)
+        assert status["size"] == 3
+        assert status["checked_out"] == 1
+        assert status["saturation"] == 0.2
+        assert status["checkouts"] >= 1
+
+    engine.dispose()
+
+
+def test_async_url_mapping():
+    assert async_url("sqlite:///./medoc.db") == "sqlite+aiosqlite:///./medoc.db"
+    assert async_url("postgresql+psycopg2://u:p@db/opd") == "postgresql+asyncpg://u:p@db/opd"
+
+
+def test_health_db_reports_pools(client):
+    body = client.get("/health/db").json()
+    assert {"sync", "async"} <= body.keys()
+    assert "checkout_wait_avg_ms" in body["sync"]
+
+
+def test_async_engine_is_created_on_first_use(tmp_path):
+    # importing the app must not need the async driver (asyncpg on Postgres)
+    script = (
+        "import asyncio\n"
+        "from app.core import database\n"
+        "import app.main\n"
+        "assert database.current_async_engine() is None\n"
+        "engine = database.get_async_engine()\n"
+        "assert database.get_async_engine() is engine is database.current_async_engine()\n"
+        "asyncio.run(engine.dispose())\n"
+    )
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'lazy.db'}"}
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
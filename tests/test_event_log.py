@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+
+from app.models.entities import EventLog, EventType
+from app.services.event_log import EventLogWriter, event_log, replay
+from app.services.queue_engine import QueueEngine, queue_engine
+
+
+def book(client, doctor_id, i, source="ONLINE"):
+    resp = client.post(
+        "/api/v1/book",
+        json={"doctor_id": doctor_id, "patient_name": f"P{i}", "patient_phone": f"96000000{i:02d}", "source": source},
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def events(session_factory):
+    event_log.flush()
+    with session_factory() as db:
+        return db.execute(
+            select(EventLog.event_type, EventLog.appointment_id, EventLog.message).order_by(EventLog.id)
+        ).all()
+
+
+def test_transitions_are_logged(client, make_doctor, session_factory):
+    doctor, slot = make_doctor()
+    booked = [book(client, doctor["id"], i) for i in range(3)]
+    client.patch(f"/api/v1/appointments/{booked[0]['appointment_id']}/cancel")
+    client.patch(f"/api/v1/appointments/{booked[1]['appointment_id']}/serve")
+    client.post(f"/api/v1/doctors/{doctor['id']}/queue/serve-next")
+    client.post("/api/v1/book/bulk", json=[{"doctor_id": doctor["id"], "patient_name": "B", "patient_phone": "9600000099"}])
+
+    logged = events(session_factory)
+    assert [(t, a) for t, a, _ in logged] == [
+        ("BOOK", booked[0]["appointment_id"]),
+        ("BOOK", booked[1]["appointment_id"]),
+        ("BOOK", booked[2]["appointment_id"]),
+        ("CANCEL", booked[0]["appointment_id"]),
+        ("SERVE", booked[1]["appointment_id"]),
+        ("SERVE", booked[2]["appointment_id"]),
+        ("BOOK", booked[2]["appointment_id"] + 1),
+    ]
+    assert json.loads(logged[0][2])["token_number"] == 1
+
+
+def test_replay_rebuilds_live_queue(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=20)
+    booked = [book(client, doctor["id"], i, source) for i, source in enumerate(["ONLINE", "WALK_IN", "PRIORITY"] * 3)]
+    for appointment in booked[::4]:
+        client.patch(f"/api/v1/appointments/{appointment['appointment_id']}/cancel")
+    client.post(f"/api/v1/doctors/{doctor['id']}/queue/serve-next")
+
+    replayed = QueueEngine()
+    event_log.flush()
+    with session_factory() as db:
+        assert replay(db, replayed) == len(events(session_factory))
+    assert replayed.call_order(doctor["id"], slot["id"]) == queue_engine.call_order(doctor["id"], slot["id"])
+
+
+def test_writer_buffers_and_batches(session_factory):
+    writer = EventLogWriter(batch_size=10, flush_seconds=3600, max_pending=3)
+    writer.record(EventType.BOOK, 1, 1, 1)  # not running yet: ignored
+
+    writer.start(session_factory)
+    try:
+        with session_factory() as db:
+            # a serve flushed before its (late) booking must not resurrect it
+            for appointment_id, event_type in [(2, EventType.SERVE), (1, EventType.CANCEL), (3, EventType.NO_SHOW)]:
+                writer.record(event_type, 1, 1, appointment_id)
+            writer.record(EventType.BOOK, 1, 1, 4)  # over max_pending
+            assert writer.snapshot()["dropped"] == 1
+
+            writer.flush()
+            assert db.scalar(select(func.count()).select_from(EventLog)) == 3
+
+            entry = {"token_number": 1, "patient_name": "Late", "patient_phone": "1", "source": "ONLINE", "priority_rank": 3}
+            writer.record(EventType.BOOK, 1, 1, 2, json.dumps({"appointment_id": 2, **entry}), at=datetime.now(timezone.utc))
+    finally:
+        writer.stop()
+
+    stats = writer.snapshot()
+    assert stats["written"] == 4 and stats["pending"] == 0 and stats["batches"] == 2
+    with session_factory() as db:
+        replayed = QueueEngine()
+        replay(db, replayed)
+    assert replayed.call_order(1, 1) == []
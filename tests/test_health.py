@@ -0,0 +1,16 @@
+def test_root(client):
+    resp = client.get("/")
+    assert resp.status_code == 200
+    assert "running" in resp.json()["message"]
+
+
+def test_health(client):
+    resp = client.get("/health")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok"}
+
+
+def test_health_db_reports_both_pools(client):
+    resp = client.get("/health/db")
+    assert resp.status_code == 200
+    assert {"sync", "async", "token_allocator"} <= resp.json().keys()
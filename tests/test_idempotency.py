@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app import main
+from app.models.entities import Appointment, IdempotencyKey, Patient, TimeSlot
+from app.services.idempotency import fingerprint, idempotency_store
+from app.services.queue_engine import as_utc
+
+
+def _book(client, doctor, key, phone="9300000001", path="/api/v1/book"):
+    body = {"doctor_id": doctor["id"], "patient_name": "Retry", "patient_phone": phone}
+    return client.post(path, json=body, headers={"Idempotency-Key": key})
+
+
+def test_retried_booking_is_replayed_not_rebooked(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=5)
+
+    first = _book(client, doctor, "book-1")
+    assert first.status_code == 200
+    assert "idempotent-replayed" not in first.headers
+
+    # from the LRU, then from the table (other worker / restart)
+    again = _book(client, doctor, "book-1")
+    idempotency_store.clear()
+    from_db = _book(client, doctor, "book-1", path="/api/v1/async/book")
+    for retry in (again, from_db):
+        assert retry.status_code == 200
+        assert retry.headers["idempotent-replayed"] == "true"
+        assert retry.json() == first.json()
+
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(Appointment)) == 1
+        assert db.scalar(select(func.count()).select_from(Patient)) == 1
+        assert db.get(TimeSlot, slot["id"]).next_token == 2
+
+
+def test_key_reused_for_another_request_is_rejected(client, make_doctor):
+    doctor, _ = make_doctor()
+    assert _book(client, doctor, "shared").status_code == 200
+
+    reused = _book(client, doctor, "shared", phone="9300000002")
+    assert reused.status_code == 422
+    assert client.patch("/api/v1/appointments/1/serve", headers={"Idempotency-Key": "shared"}).status_code == 422
+
+
+def test_retried_serve_replays_success(client, make_doctor):
+    doctor, _ = make_doctor()
+    appointment_id = _book(client, doctor, "b").json()["appointment_id"]
+
+    for path in (f"/api/v1/appointments/{appointment_id}/serve", f"/api/v1/async/appointments/{appointment_id}/serve"):
+        served = client.patch(path, headers={"Idempotency-Key": "serve-1"})
+        assert served.status_code == 200
+        assert served.json()["status"] == "SERVED"
+
+    # without a key the second serve is still an error
+    assert client.patch(f"/api/v1/appointments/{appointment_id}/serve").status_code == 400
+
+
+def test_retried_serve_next_calls_one_patient(client, make_doctor):
+    doctor, _ = make_doctor()
+    for i in range(2):
+        _book(client, doctor, f"b{i}", phone=f"930000001{i}")
+
+    path = f"/api/v1/doctors/{doctor['id']}/queue/serve-next"
+    first = client.post(path, headers={"Idempotency-Key": "next-1"}).json()
+    assert client.post(path, headers={"Idempotency-Key": "next-1"}).json() == first
+
+    queue = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()
+    assert [t["token_number"] for t in queue["tokens"]] == [2]
+
+
+def test_final_errors_are_replayed_retryable_ones_are_not(client, make_doctor, session_factory):
+    missing = client.patch("/api/v1/appointments/999/cancel", headers={"Idempotency-Key": "c"})
+    assert missing.status_code == 404
+    replayed = client.patch("/api/v1/appointments/999/cancel", headers={"Idempotency-Key": "c"})
+    assert replayed.status_code == 404
+    assert replayed.headers["idempotent-replayed"] == "true"
+
+    with session_factory() as db:
+        # a request that is still running holds the key...
+        idempotency_store.claim(db, "busy", fingerprint("serve:1"))
+    assert client.patch("/api/v1/appointments/1/serve", headers={"Idempotency-Key": "busy"}).status_code == 409
+
+    with session_factory() as db:
+        # ...and a released claim (409 / 5xx) can be retried
+        idempotency_store.release(db, "busy")
+        assert db.get(IdempotencyKey, "busy") is None
+
+    assert client.patch("/api/v1/appointments/1/serve", headers={"Idempotency-Key": "x" * 256}).status_code == 400
+
+
+def test_purge_expired_keys(client, make_doctor, session_factory):
+    doctor, _ = make_doctor()
+    _book(client, doctor, "old")
+    _book(client, doctor, "new", phone="9300000002")
+
+    later = datetime.now(timezone.utc) + idempotency_store.ttl + timedelta(seconds=1)
+    with session_factory() as db:
+        db.query(IdempotencyKey).filter(IdempotencyKey.key == "new").update({"expires_at": later + timedelta(hours=1)})
+        db.commit()
+        assert idempotency_store.purge_expired(db, now=later) == 1
+        assert [row.key for row in db.query(IdempotencyKey)] == ["new"]
+
+    # the expired key is free again: a new booking, not a replay
+    rebooked = _book(client, doctor, "old", phone="9300000003")
+    assert rebooked.status_code == 200
+    assert "idempotent-replayed" not in rebooked.headers
+
+
+def test_cached_response_expires_with_its_row(client, make_doctor, session_factory):
+    doctor, _ = make_doctor()
+    assert _book(client, doctor, "lru").status_code == 200
+    with session_factory() as db:
+        row = db.get(IdempotencyKey, "lru")
+        assert idempotency_store._cached("lru", datetime.now(timezone.utc)).expires_at == as_utc(row.expires_at)
+
+
+def test_failed_purge_is_logged_and_retried(monkeypatch, caplog):
+    sweeps = []
+
+    def failing_sweep():
+        sweeps.append(1)
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(main, "_purge_idempotency_keys", failing_sweep)
+
+    async def run():
+        task = asyncio.create_task(main._purge_idempotency_keys_periodically(0))
+        while len(sweeps) < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+    assert "idempotency key purge failed" in caplog.text
+    assert "database is locked" in caplog.text
@@ -0,0 +1,104 @@
+import pytest
+from alembic import command
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, make_engine
+
+
+def test_upgrade_head_builds_every_model_column(tmp_path, alembic_config):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    config = alembic_config(url)
+    command.upgrade(config, "head")
+
+    engine = make_engine(url)
+    schema = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        columns = {c["name"] for c in schema.get_columns(table.name)}
+        assert set(table.columns.keys()) <= columns, table.name
+    assert {"slot_id", "token_number"} in [set(u["column_names"]) for u in schema.get_unique_constraints("tokens")]
+    engine.dispose()
+
+    command.downgrade(config, "base")
+    engine = make_engine(url)
+    assert inspect(engine).get_table_names() == ["alembic_version"]
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(tmp_path, alembic_config):
+    # the app's own tests, but on a database built by the migrations
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    command.upgrade(alembic_config(url), "head")
+    engine = make_engine(url)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def test_booking_round_trip_on_a_migrated_database(client, make_doctor):
+    doctor, _ = make_doctor(capacity=5)
+
+    def book(phone, source="ONLINE"):
+        body = {"doctor_id": doctor["id"], "patient_name": "Mig", "patient_phone": phone, "source": source}
+        resp = client.post("/api/v1/book", json=body)
+        assert resp.status_code == 200, resp.text
+        return resp.json()
+
+    first = book("9800000001")
+    walk_in = book("9800000002", source="WALK_IN")
+    async_resp = client.post(
+        "/api/v1/async/book",
+        json={"doctor_id": doctor["id"], "patient_name": "Mig", "patient_phone": "9800000003"},
+    )
+    assert async_resp.status_code == 200, async_resp.text
+    assert [first["token_number"], walk_in["token_number"], async_resp.json()["token_number"]] == [1, 2, 3]
+
+    assert client.patch(f"/api/v1/appointments/{first['appointment_id']}/serve").status_code == 200
+    assert client.patch(f"/api/v1/appointments/{walk_in['appointment_id']}/no-show").status_code == 200
+    # same patient again: found through the upsert, not created twice
+    book("9800000001")
+    queue = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()
+    assert [t["token_number"] for t in queue["tokens"]] == [3, 4]
+
+
+def test_upgrade_normalizes_phones_and_merges_duplicates(tmp_path, alembic_config):
+    url = f"sqlite:///{tmp_path / 'dupes.db'}"
+    config = alembic_config(url)
+    command.upgrade(config, "c3f8a2d5e614")
+    engine = make_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO doctors (id, name) VALUES (1, 'Dr. Old')"))
+        conn.execute(
+            text(
+                "INSERT INTO time_slots (id, doctor_id, start_time, end_time, capacity) "
+                "VALUES (1, 1, '2026-01-01 09:00:00', '2026-01-01 11:00:00', 5)"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO patients (id, patient_uid, name, phone) VALUES "
+                "(1, 'a', 'First', '98765 43210'), (2, 'b', 'Second', '+91-9876543210'), "
+                "(3, 'c', 'Third', '09876543210'), (4, 'd', 'Abroad', '+44 20 7946 0958'), "
+                "(5, 'e', 'Unparsed', 'n/a')"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO appointments (id, patient_id, doctor_id, slot_id, status) "
+                "VALUES (1, 1, 1, 1, 'SERVED'), (2, 2, 1, 1, 'SERVED'), (3, 3, 1, 1, 'BOOKED')"
+            )
+        )
+    engine.dispose()
+
+    command.upgrade(config, "head")
+    engine = make_engine(url)
+    with engine.connect() as conn:
+        patients = conn.execute(text("SELECT id, name, phone FROM patients ORDER BY id")).all()
+        owners = conn.execute(text("SELECT DISTINCT patient_id FROM appointments")).scalars().all()
+    engine.dispose()
+    assert [tuple(p) for p in patients] == [
+        (1, "First", "9876543210"),
+        (4, "Abroad", "+442079460958"),
+        (5, "Unparsed", "n/a"),
+    ]
+    assert owners == [1]
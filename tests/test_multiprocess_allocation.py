@@ -0,0 +1,77 @@
+import json
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.services import token_engine
+from app.services.token_engine import DbCounterAllocator, allocate_token, is_retryable
+
+SCRIPT = Path(__file__).resolve().parents[1] / "stimulation" / "stress_allocation.py"
+WORKERS = 4
+BOOKINGS = 40
+
+
+@pytest.mark.parametrize("allocator", ["db", "lock", "block"])
+def test_worker_processes_never_duplicate_tokens(tmp_path, allocator):
+    out = tmp_path / "stress.json"
+    subprocess.run(
+        [
+            sys.executable,
+            str(SCRIPT),
+            "--workers", str(WORKERS),
+            "--bookings", str(BOOKINGS),
+            "--allocator", allocator,
+            "--database-url", f"sqlite:///{tmp_path / 'stress.db'}",
+            "--out", str(out),
+        ],
+        check=True,
+        capture_output=True,
+        timeout=300,
+    )
+    report = json.loads(out.read_text())
+
+    assert report["errors"] == report["other"] == report["duplicates"] == 0
+    assert report["ok"] + report["conflicts"] == WORKERS * BOOKINGS
+    assert report["tokens"] == report["ok"]
+    if allocator != "block":
+        # every process holds its own block; close() can only hand back the last one
+        assert report["gaps"] == 0
+
+
+def _locked():
+    return OperationalError("UPDATE time_slots ...", {}, sqlite3.OperationalError("database is locked"))
+
+
+def test_lock_races_are_retried_then_reported_as_conflict(client, make_doctor, session_factory, monkeypatch):
+    doctor, _ = make_doctor()
+    allocator = DbCounterAllocator()
+    real = token_engine._allocate_once
+    failures = iter([True])
+
+    def flaky(*args):
+        if next(failures, False):
+            raise _locked()
+        return real(*args)
+
+    monkeypatch.setattr(token_engine, "_allocate_once", flaky)
+    with session_factory() as db:
+        result, error = allocate_token(db, doctor["id"], "A", "9600000201", allocator=allocator)
+    assert error is None and result["token_number"] == 1
+    assert allocator.stats.snapshot()["retries"] == 1
+
+    def always_locked(*args):
+        raise _locked()
+
+    monkeypatch.setattr(token_engine, "_allocate_once", always_locked)
+    with session_factory() as db:
+        assert allocate_token(db, doctor["id"], "B", "9600000202", allocator=allocator) == (
+            None,
+            "Booking conflict. Try again.",
+        )
+    assert allocator.stats.snapshot()["retries"] == 1 + token_engine.settings.booking_retries
+
+    assert not is_retryable(OperationalError("SELECT 1", {}, sqlite3.OperationalError("no such table: x")))
@@ -0,0 +1,105 @@
+import importlib.util
+from pathlib import Path
+
+from sqlalchemy import select
+
+from app.models.entities import NoShowStat, TimeSlot
+from app.services.overbooking import extra_seats, no_show_rate, overbooking_policy
+from app.services.slot_counters import reconcile
+
+
+def book(client, doctor_id, phone, source="ONLINE", path="/api/v1/book"):
+    return client.post(
+        path,
+        json={"doctor_id": doctor_id, "patient_name": f"P{phone[-3:]}", "patient_phone": phone, "source": source},
+    )
+
+
+def stats(session_factory, doctor_id):
+    with session_factory() as db:
+        rows = db.execute(
+            select(NoShowStat.source, NoShowStat.outcomes, NoShowStat.no_shows).where(NoShowStat.doctor_id == doctor_id)
+        )
+        return {source: (outcomes, no_shows) for source, outcomes, no_shows in rows}
+
+
+def test_no_show_frees_the_seat_and_is_counted(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=3)
+    ids = [book(client, doctor["id"], f"97000000{i:02d}").json()["appointment_id"] for i in range(3)]
+
+    assert client.patch(f"/api/v1/appointments/{ids[0]}/no-show").json()["status"] == "NO_SHOW"
+    assert client.patch(f"/api/v1/async/appointments/{ids[1]}/no-show").json()["status"] == "NO_SHOW"
+    assert client.patch(f"/api/v1/appointments/{ids[2]}/serve").status_code == 200
+    assert client.patch(f"/api/v1/appointments/{ids[0]}/no-show").status_code == 400
+    assert client.patch("/api/v1/appointments/999/no-show").status_code == 404
+
+    with session_factory() as db:
+        row = db.get(TimeSlot, slot["id"])
+        assert (row.booked_count, row.served_count, row.no_show_count) == (0, 1, 2)
+        assert reconcile(db) == []
+    assert stats(session_factory, doctor["id"]) == {"ONLINE": (3, 2)}
+
+    queue = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()
+    assert queue["tokens"] == []
+
+
+def test_walk_ins_overbook_from_history(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=8)
+    with session_factory() as db:
+        db.add(NoShowStat(doctor_id=doctor["id"], source="ONLINE", outcomes=50, no_shows=10))
+        db.commit()
+
+    for i in range(8):
+        assert book(client, doctor["id"], f"97100000{i:02d}").status_code == 200
+    assert book(client, doctor["id"], "9710000099").json()["detail"] == "Slot is full"
+
+    # 20% no-shows: 8 * 0.2 / 0.8 = 2 extra seats for walk-ins
+    assert book(client, doctor["id"], "9710000100", source="WALK_IN").status_code == 200
+    assert book(client, doctor["id"], "9710000101", source="PRIORITY", path="/api/v1/async/book").status_code == 200
+    assert book(client, doctor["id"], "9710000102", source="WALK_IN").json()["detail"] == "Slot is full"
+
+    with session_factory() as db:
+        assert db.get(TimeSlot, slot["id"]).booked_count == 10
+    snapshot = overbooking_policy.snapshot()
+    assert snapshot["granted"] == 3
+    # totals are cached per doctor, not read on every booking
+    assert snapshot["loads"] == 1
+
+
+def test_no_extra_seats_without_enough_history(client, make_doctor, session_factory):
+    doctor, _ = make_doctor(capacity=2)
+    with session_factory() as db:
+        db.add(NoShowStat(doctor_id=doctor["id"], source="WALK_IN", outcomes=5, no_shows=4))
+        db.commit()
+
+    for i in range(2):
+        book(client, doctor["id"], f"97200000{i:02d}", source="WALK_IN")
+    assert book(client, doctor["id"], "9720000099", source="WALK_IN").json()["detail"] == "Slot is full"
+
+
+def test_policy_formula():
+    assert no_show_rate([(20, 4), (10, 2)], min_samples=30) == 0.2
+    assert no_show_rate([(20, 4)], min_samples=30) is None
+    assert no_show_rate([], min_samples=0) is None
+
+    assert extra_seats(8, 0.2, max_ratio=0.25) == 2
+    assert extra_seats(12, 0.5, max_ratio=0.25) == 3  # capped
+    assert extra_seats(12, 1.0, max_ratio=0.25) == 3
+    assert extra_seats(12, None, max_ratio=0.25) == 0
+    assert extra_seats(3, 0.1, max_ratio=0.25) == 0  # never rounds up past capacity
+
+
+def test_backtest_serves_more_with_little_extra_wait():
+    path = Path(__file__).resolve().parents[1] / "stimulation" / "backtest_overbooking.py"
+    spec = importlib.util.spec_from_file_location("backtest_overbooking", path)
+    backtest = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(backtest)
+
+    report = backtest.backtest(backtest.ClinicConfig(seed=3, doctors=3, days=10))
+    before, after, change = report["capacity"], report["overbooking"], report["change"]
+
+    assert before["arrivals"] == after["arrivals"]
+    assert change["served"] > 0
+    assert change["turned_away"] < 0
+    assert change["wait_mean_min"] < 2
+    assert 0.1 < after["observed_no_show_rate"] < 0.3
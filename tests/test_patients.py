@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.models.entities import Patient
+from app.services.patients import normalize_phone, patient_cache, upsert_patient
+
+
+@pytest.mark.parametrize(
+    "raw",
+    ["9876543210", "+91 98765 43210", "+91-98765-43210", "0091 9876543210", "919876543210", "09876543210", "(98765) 43.210"],
+)
+def test_normalize_phone_national(raw):
+    assert normalize_phone(raw) == "9876543210"
+
+
+def test_normalize_phone_foreign_and_invalid():
+    assert normalize_phone("+44 20 7946 0958") == "+442079460958"
+    for raw in ["", "98765", "98765x3210", "+1 23", "123456789012"]:
+        with pytest.raises(ValueError):
+            normalize_phone(raw)
+
+
+def test_phone_formats_book_one_patient(client, make_doctor, session_factory):
+    doctor, _ = make_doctor()
+    body = {"doctor_id": doctor["id"], "patient_name": "Asha"}
+
+    first = client.post("/api/v1/book", json={**body, "patient_phone": "+91 98765 43210"})
+    assert first.status_code == 200
+    # same patient, same slot -> duplicate, whatever the formatting
+    dup = client.post("/api/v1/book", json={**body, "patient_phone": "098765-43210"})
+    assert dup.json()["detail"] == "Patient already has a booking in this slot"
+
+    bad = client.post("/api/v1/book", json={**body, "patient_phone": "call me"})
+    assert bad.status_code == 422
+
+    with session_factory() as db:
+        assert db.scalars(select(Patient.phone)).all() == ["9876543210"]
+
+
+def test_repeat_patient_comes_from_cache(client, make_doctor, session_factory):
+    doctor, _ = make_doctor()
+    body = {"doctor_id": doctor["id"], "patient_name": "Ravi", "patient_phone": "9876500001"}
+
+    appointment_id = client.post("/api/v1/book", json=body).json()["appointment_id"]
+    assert patient_cache.get("9876500001") is not None
+    client.patch(f"/api/v1/appointments/{appointment_id}/cancel")
+
+    hits = patient_cache.snapshot()["hits"]
+    # follow-up under another name: the stored patient is reused
+    again = client.post("/api/v1/book", json={**body, "patient_name": "Ravi K"})
+    assert again.status_code == 200
+    assert patient_cache.snapshot()["hits"] == hits + 1
+    assert patient_cache.get("9876500001")[1] == "Ravi"
+
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(Patient)) == 1
+
+
+def test_upsert_returns_existing_row(session_factory):
+    with session_factory() as db:
+        created = upsert_patient(db, "First", "9876500004")
+        assert upsert_patient(db, "Second", "9876500004") == created == (created[0], "First")
+        db.commit()
+        assert db.scalar(select(func.count()).select_from(Patient)) == 1
@@ -0,0 +1,97 @@
+"""EXPLAIN QUERY PLAN regression suite for the hot lookup paths.
+
+Every query here mirrors one issued by booking / queue / token_engine /
+idempotency / archival. A plan step that starts with ``SCAN`` means SQLite
+walks a whole table (or a whole index), which is exactly what the indexes
+are meant to avoid. Each plan is checked on the schema the models create
+and on the one the Alembic migrations build, so an index missing from a
+migration shows up too.
+"""
+from datetime import datetime, timezone
+
+import pytest
+from alembic import command
+from sqlalchemy import asc, delete, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import make_engine
+from app.models.entities import Appointment, Doctor, IdempotencyKey, Patient, TimeSlot, Token
+from app.services.archival import finished_slots_query
+from app.services.capacity import capacity_query
+from app.services.patients import upsert_patient
+from app.services.slot_counters import leave_queue, reserve_seat
+
+NOW = datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+HOT_QUERIES = {
+    "doctor_by_id": select(Doctor).where(Doctor.id == 1),
+    "slots_for_doctor": (
+        select(TimeSlot).where(TimeSlot.doctor_id == 1).order_by(TimeSlot.start_time.asc())
+    ),
+    "open_slot_for_doctor": (
+        select(TimeSlot)
+        .where(TimeSlot.doctor_id == 1, TimeSlot.end_time > NOW)
+        .order_by(TimeSlot.start_time.asc())
+        .limit(1)
+    ),
+    "patient_by_phone": select(Patient).where(Patient.phone == "9999999999"),
+    "duplicate_check": select(Appointment.id).where(
+        Appointment.patient_id == 1,
+        Appointment.slot_id == 1,
+        Appointment.status == "BOOKED",
+    ),
+    "capacity_count": select(func.count(Appointment.id)).where(
+        Appointment.slot_id == 1, Appointment.status == "BOOKED"
+    ),
+    "max_token": select(func.max(Token.token_number)).where(Token.slot_id == 1),
+    "reserve_seat": reserve_seat(1),
+    "reserve_seats_bulk": reserve_seat(1, 5, overbook=2, seats=5),
+    "leave_queue": leave_queue(1, "SERVED"),
+    "idempotency_key": select(IdempotencyKey).where(IdempotencyKey.key == "k"),
+    "idempotency_purge": delete(IdempotencyKey).where(IdempotencyKey.expires_at <= NOW),
+    "archive_finished_slots": finished_slots_query(NOW, 500),
+    "archive_appointments_of_slots": select(Appointment.id).where(Appointment.slot_id.in_([1, 2])),
+    "capacity_window": capacity_query(NOW, NOW.replace(day=8)),
+    "queue_join": (
+        select(Token, Appointment, Patient)
+        .join(Appointment, Appointment.id == Token.appointment_id)
+        .join(Patient, Patient.id == Appointment.patient_id)
+        .where(Token.slot_id == 1)
+        .order_by(asc(Token.token_number))
+    ),
+}
+
+
+def query_plan(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return [row[-1] for row in rows]
+
+
+@pytest.fixture(params=["models", "migrations"])
+def plan_session_factory(request, tmp_path, alembic_config):
+    if request.param == "models":
+        yield request.getfixturevalue("session_factory")
+        return
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    command.upgrade(alembic_config(url), "head")
+    engine = make_engine(url)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_index(plan_session_factory, name):
+    with plan_session_factory() as db:
+        plan = query_plan(db.connection(), HOT_QUERIES[name])
+
+    scans = [step for step in plan if step.startswith("SCAN")]
+    assert not scans, f"{name} falls back to a full scan: {plan}"
+
+
+def test_patient_upsert_has_its_conflict_index(plan_session_factory):
+    # SQLite doesn't show the conflict lookup in the plan; without a unique
+    # index on phone the statement doesn't even prepare
+    with plan_session_factory() as db:
+        assert upsert_patient(db, "A", "9999999999") == upsert_patient(db, "B", "9999999999")
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta, timezone
+
+from app.schemas.queue import QueueColumnarResponse, QueueResponse, QueueTokenItem
+from app.services.queue_engine import QueueEngine, QueueEntry, queue_engine
+from app.services.token_engine import allocate_token
+
+
+def book(client, doctor_id, i):
+    resp = client.post(
+        "/api/v1/book",
+        json={"doctor_id": doctor_id, "patient_name": f"P{i}", "patient_phone": f"97000000{i:02d}"},
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def queue_numbers(client, doctor_id):
+    return [t["token_number"] for t in client.get(f"/api/v1/doctors/{doctor_id}/queue").json()["tokens"]]
+
+
+def test_queue_tracks_book_serve_cancel(client, make_doctor):
+    doctor, slot = make_doctor()
+    booked = [book(client, doctor["id"], i) for i in range(4)]
+    assert queue_numbers(client, doctor["id"]) == [1, 2, 3, 4]
+
+    client.patch(f"/api/v1/appointments/{booked[0]['appointment_id']}/serve")
+    client.patch(f"/api/v1/appointments/{booked[2]['appointment_id']}/cancel")
+
+    queue = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()
+    assert [t["token_number"] for t in queue["tokens"]] == [2, 4]
+    assert queue["booked"] == 2
+    assert queue["next_token_number"] == 5
+
+
+def test_rebuild_matches_incremental_state(client, make_doctor, session_factory):
+    doctor, slot = make_doctor()
+    booked = [book(client, doctor["id"], i) for i in range(3)]
+    client.patch(f"/api/v1/appointments/{booked[1]['appointment_id']}/cancel")
+    before = queue_engine.waiting(doctor["id"], slot["id"])
+
+    queue_engine.clear()
+    with session_factory() as db:
+        assert queue_engine.rebuild(db) == 2
+
+    assert queue_engine.waiting(doctor["id"], slot["id"]) == before
+
+
+def test_next_patient_follows_priority_then_token(client, make_doctor):
+    doctor, slot = make_doctor()
+    sources = ["WALK_IN", "ONLINE", "PRIORITY", "FOLLOW_UP", "PRIORITY"]
+    for i, source in enumerate(sources):
+        client.post(
+            "/api/v1/book",
+            json={
+                "doctor_id": doctor["id"],
+                "patient_name": f"P{i}",
+                "patient_phone": f"96000000{i:02d}",
+                "source": source,
+            },
+        )
+
+    nxt = client.get(f"/api/v1/doctors/{doctor['id']}/queue/next").json()
+    assert (nxt["token_number"], nxt["priority_rank"]) == (3, 1)
+
+    called = []
+    for _ in sources:
+        resp = client.post(f"/api/v1/doctors/{doctor['id']}/queue/serve-next")
+        assert resp.json()["status"] == "SERVED"
+        called.append(resp.json()["id"])
+
+    assert called == [3, 5, 4, 2, 1]
+    assert client.post(f"/api/v1/doctors/{doctor['id']}/queue/serve-next").status_code == 404
+
+
+def test_aging_lets_long_waiting_walk_in_go_first():
+    # one rank step == 10 minutes of waiting
+    engine = QueueEngine(aging_minutes=10)
+    t0 = datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc)
+    engine.add(1, 1, QueueEntry(1, 1, "walk-in", "1", t0, "WALK_IN", 4))
+    engine.add(1, 1, QueueEntry(2, 2, "priority", "2", t0 + timedelta(minutes=45), "PRIORITY", 1))
+    engine.add(1, 1, QueueEntry(3, 3, "online", "3", t0 + timedelta(minutes=15), "ONLINE", 3))
+
+    assert [engine.pop_next(1, 1).token_number for _ in range(3)] == [1, 3, 2]
+
+
+def test_positions_follow_call_order_as_the_queue_changes():
+    engine = QueueEngine(aging_minutes=10)
+    t0 = datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc)
+    ranks = [4, 1, 3, 1, 2, 4, 3]
+    for i, rank in enumerate(ranks, start=1):
+        engine.add(1, 1, QueueEntry(i, i, f"P{i}", str(i), t0 + timedelta(minutes=7 * i), priority_rank=rank))
+
+    def aged(entry):
+        return entry.created_at.timestamp() + (entry.priority_rank - 1) * 600, entry.token_number
+
+    def check():
+        called = engine.call_order(1, 1)
+        assert called == sorted(called, key=aged)
+        assert [engine.position(1, 1, e.appointment_id) for e in called] == list(range(len(called)))
+        assert engine.ranked(1, 1) == sorted(((e, i) for i, e in enumerate(called)), key=lambda r: r[0].token_number)
+
+    check()
+    engine.remove(1, 1, 4)
+    engine.pop_next(1, 1)
+    check()
+    assert engine.position(1, 1, 4) is None
+    assert engine.position(2, 2, 1) is None
+
+
+def test_queue_formats_match_the_response_models(client, make_doctor):
+    doctor, _ = make_doctor()
+    booked = [book(client, doctor["id"], i) for i in range(3)]
+    client.patch(f"/api/v1/appointments/{booked[1]['appointment_id']}/serve")
+    url = f"/api/v1/doctors/{doctor['id']}/queue"
+
+    rows = client.get(url).json()
+    # same JSON the per-token models used to produce
+    assert QueueResponse.model_validate(rows).model_dump(mode="json") == rows
+    assert [t["position"] for t in rows["tokens"]] == [0, 1]
+
+    columnar = client.get(url, params={"format": "columnar"}).json()
+    QueueColumnarResponse.model_validate(columnar)
+    assert {k: v for k, v in columnar.items() if k != "tokens"} == {k: v for k, v in rows.items() if k != "tokens"}
+    assert columnar["tokens"]["token_numbers"] == [1, 3]
+    assert [dict(zip(QueueTokenItem.model_fields, values)) for values in zip(*columnar["tokens"].values())] == rows["tokens"]
+
+    assert client.get(url, params={"format": "xml"}).status_code == 422
+
+
+def test_changes_made_by_another_worker_show_up(client, make_doctor, session_factory, monkeypatch):
+    doctor, _ = make_doctor()
+    booked = [book(client, doctor["id"], i) for i in range(2)]
+    assert queue_numbers(client, doctor["id"]) == [1, 2]
+    reloads = queue_engine.reloads
+
+    # another worker process: same DB, its own in-memory queue
+    other_worker = QueueEngine()
+    with monkeypatch.context() as patch:
+        patch.setattr("app.services.token_engine.queue_engine", other_worker)
+        patch.setattr("app.services.appointment_status.queue_engine", other_worker)
+        with session_factory() as db:
+            result, error = allocate_token(db, doctor["id"], "Urgent", "9700000099", "PRIORITY")
+        assert error is None
+        client.patch(f"/api/v1/appointments/{booked[1]['appointment_id']}/cancel")
+
+    async_queue = client.get(f"/api/v1/async/doctors/{doctor['id']}/queue").json()
+    assert [t["token_number"] for t in async_queue["tokens"]] == [1, 3]
+    assert queue_numbers(client, doctor["id"]) == [1, 3]
+    assert client.get(f"/api/v1/doctors/{doctor['id']}/queue/next").json()["token_number"] == 3
+    served = client.post(f"/api/v1/doctors/{doctor['id']}/queue/serve-next").json()
+    assert served["id"] == result["appointment_id"]
+    # one reload for the other worker's changes; this worker's own keep it current
+    assert queue_engine.reloads == reloads + 1
+
+    book(client, doctor["id"], 5)
+    assert queue_numbers(client, doctor["id"]) == [1, 4]
+    assert queue_engine.reloads == reloads + 1
@@ -0,0 +1,71 @@
+from contextlib import ExitStack
+
+from sqlalchemy import event
+
+from app.services.queue_events import queue_events
+
+
+def book(client, doctor_id, phone):
+    resp = client.post(
+        "/api/v1/book",
+        json={"doctor_id": doctor_id, "patient_name": "Streamed", "patient_phone": phone},
+    )
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def test_snapshot_then_diffs(client, make_doctor):
+    doctor, slot = make_doctor()
+    first = book(client, doctor["id"], "9500000001")
+
+    with client.websocket_connect(f"/api/v1/doctors/{doctor['id']}/queue/ws") as ws:
+        snapshot = ws.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert [t["token_number"] for t in snapshot["queue"]["tokens"]] == [1]
+
+        second = book(client, doctor["id"], "9500000002")
+        added = ws.receive_json()
+        assert added["type"] == "added"
+        assert added["token"]["appointment_id"] == second["appointment_id"]
+
+        client.patch(f"/api/v1/appointments/{first['appointment_id']}/serve")
+        assert ws.receive_json() == {
+            "type": "served",
+            "doctor_id": doctor["id"],
+            "slot_id": slot["id"],
+            "appointment_id": first["appointment_id"],
+        }
+
+        client.patch(f"/api/v1/appointments/{second['appointment_id']}/cancel")
+        assert ws.receive_json()["type"] == "cancelled"
+
+
+def test_db_work_is_flat_in_subscriber_count(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=100)
+    engine = session_factory.kw["bind"]
+
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", count)
+    results = {}
+    for subscribers in (1, 25):
+        with ExitStack() as stack:
+            sockets = [
+                stack.enter_context(client.websocket_connect(f"/api/v1/doctors/{doctor['id']}/queue/ws"))
+                for _ in range(subscribers)
+            ]
+            for ws in sockets:
+                ws.receive_json()
+            assert queue_events.subscriber_count(doctor["id"]) >= subscribers
+
+            statements.clear()
+            book(client, doctor["id"], f"94{subscribers:08d}")
+            for ws in sockets:
+                assert ws.receive_json()["type"] == "added"
+            results[subscribers] = len(statements)
+    event.remove(engine, "before_cursor_execute", count)
+
+    assert results[1] == results[25]
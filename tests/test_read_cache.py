@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.entities import Doctor, TimeSlot
+
+
+def test_doctor_list_revalidates_with_etag(client, make_doctor, session_factory):
+    make_doctor(code="DOC1")
+
+    first = client.get("/api/v1/doctors")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert [d["doctor_code"] for d in first.json()] == ["DOC1"]
+
+    not_modified = client.get("/api/v1/doctors", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    # served from memory: a change behind the API's back isn't seen...
+    with session_factory() as db:
+        db.query(Doctor).update({"name": "Dr. Renamed"})
+        db.commit()
+    assert client.get("/api/v1/doctors", headers={"If-None-Match": etag}).status_code == 304
+
+    # ...but create_doctor bumps the version
+    make_doctor(code="DOC2")
+    changed = client.get("/api/v1/doctors", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert [d["doctor_code"] for d in changed.json()] == ["DOC1", "DOC2"]
+
+
+def test_slot_listing_paginates_and_filters_by_date(client, make_doctor):
+    doctor, current = make_doctor()
+    base = datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc)
+    for day in range(5):
+        start = base + timedelta(days=day)
+        resp = client.post(
+            f"/api/v1/doctors/{doctor['id']}/slots",
+            json={
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(hours=2)).isoformat(),
+                "capacity": 5,
+            },
+        )
+        assert resp.status_code == 200
+
+    url = f"/api/v1/doctors/{doctor['id']}/slots"
+    # past slots only when asked for
+    assert [s["id"] for s in client.get(url).json()] == [current["id"]]
+    history = {"start_from": "2026-01-01T00:00:00Z"}
+    assert len(client.get(url, params=history).json()) == 6
+
+    page = client.get(url, params={**history, "limit": 2, "offset": 1}).json()
+    assert [s["start_time"][:10] for s in page] == ["2026-01-02", "2026-01-03"]
+
+    window = client.get(
+        url, params={"start_from": "2026-01-02T00:00:00Z", "start_before": "2026-01-04T00:00:00+00:00"}
+    ).json()
+    assert [s["start_time"][:10] for s in window] == ["2026-01-02", "2026-01-03"]
+
+    assert client.get(url, params={"limit": 0}).status_code == 422
+
+
+def test_slot_listing_starts_at_current_slots_past_the_limit(client, make_doctor, session_factory):
+    doctor, current = make_doctor()
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        db.add_all(
+            TimeSlot(
+                doctor_id=doctor["id"],
+                start_time=now - timedelta(days=200 - day),
+                end_time=now - timedelta(days=200 - day) + timedelta(hours=2),
+                capacity=5,
+            )
+            for day in range(150)
+        )
+        start = now + timedelta(days=1)
+        db.add(TimeSlot(doctor_id=doctor["id"], start_time=start, end_time=start + timedelta(hours=2), capacity=5))
+        db.commit()
+
+    url = f"/api/v1/doctors/{doctor['id']}/slots"
+    page = client.get(url, params={"limit": 100}).json()
+    assert len(page) == 2
+    assert page[0]["id"] == current["id"]
+
+    history = client.get(url, params={"start_from": (now - timedelta(days=365)).isoformat(), "limit": 100}).json()
+    assert len(history) == 100
+    assert current["id"] not in [s["id"] for s in history]
+
+
+def test_create_slot_invalidates_only_that_doctor(client, make_doctor):
+    doctor_a, _ = make_doctor(code="A")
+    doctor_b, _ = make_doctor(code="B")
+    etag_a = client.get(f"/api/v1/doctors/{doctor_a['id']}/slots").headers["etag"]
+    etag_b = client.get(f"/api/v1/doctors/{doctor_b['id']}/slots").headers["etag"]
+
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+    client.post(
+        f"/api/v1/doctors/{doctor_b['id']}/slots",
+        json={"start_time": start.isoformat(), "end_time": (start + timedelta(hours=1)).isoformat(), "capacity": 3},
+    )
+
+    assert client.get(f"/api/v1/doctors/{doctor_a['id']}/slots", headers={"If-None-Match": etag_a}).status_code == 304
+    assert client.get(f"/api/v1/doctors/{doctor_b['id']}/slots", headers={"If-None-Match": etag_b}).status_code == 200
+    assert client.get("/api/v1/doctors/999/slots").status_code == 404
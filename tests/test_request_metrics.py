@@ -0,0 +1,41 @@
+def _book(client, doctor_id, phone, path="/api/v1/book"):
+    return client.post(path, json={"doctor_id": doctor_id, "patient_name": "M", "patient_phone": phone})
+
+
+def test_server_timing_header_counts_statements(client, make_doctor):
+    doctor, _ = make_doctor()
+
+    resp = _book(client, doctor["id"], "9300000001")
+    assert resp.status_code == 200
+    timing = resp.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert "1 commits" in timing
+    assert "app;dur=" in timing
+
+    async_resp = _book(client, doctor["id"], "9300000002", path="/api/v1/async/book")
+    assert "1 commits" in async_resp.headers["server-timing"]
+    assert "0 queries" not in async_resp.headers["server-timing"]
+
+
+def test_metrics_exposes_route_histograms_and_pools(client, make_doctor):
+    doctor, _ = make_doctor()
+    client.get(f"/api/v1/doctors/{doctor['id']}/queue")
+    client.get(f"/api/v1/doctors/{doctor['id']}/queue")
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+
+    labels = 'method="GET",route="/api/v1/doctors/{doctor_id}/queue",status="2xx"'
+    assert f'opd_http_request_duration_seconds_bucket{{{labels},le="+Inf"}}' in body
+    count = f"opd_http_request_duration_seconds_count{{{labels}}}"
+    assert int(next(line for line in body.splitlines() if line.startswith(count)).split()[-1]) >= 2
+    assert f"opd_http_db_statements_total{{{labels}}}" in body
+    assert 'opd_db_pool_checkouts_total{pool="sync"}' in body
+
+
+def test_unmatched_paths_share_one_label(client):
+    client.get("/no/such/path/1")
+    client.get("/no/such/path/2")
+    assert 'route="unmatched"' in client.get("/metrics").text
@@ -0,0 +1,109 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event, func, select
+
+from app.models.entities import TimeSlot
+from app.services.schedule import SlotIntervals
+
+WEEKDAYS = {"weekdays": ["MON", "TUE", "WED", "THU", "FRI"], "start": "09:00", "end": "13:00", "slot_minutes": 15, "capacity": 4}
+
+
+def make_doctor(client, code):
+    body = {"name": f"Dr. {code}", "specialization": "General", "doctor_code": code}
+    return client.post("/api/v1/doctors", json=body).json()["id"]
+
+
+def schedule(**overrides):
+    # 2030-01-07 is a Monday
+    return {"start_date": "2030-01-07", "end_date": "2030-01-13", "rules": [WEEKDAYS], "timezone": "UTC", **overrides}
+
+
+def test_template_expands_into_slots(client):
+    doctor_id = make_doctor(client, "SCH1")
+    assert client.get(f"/api/v1/doctors/{doctor_id}/slots").json() == []
+
+    resp = client.post(f"/api/v1/doctors/{doctor_id}/slots/schedule", json=schedule(timezone="Asia/Kolkata"))
+    assert resp.status_code == 200, resp.text
+    assert resp.json() == {"doctor_id": doctor_id, "created": 5 * 16, "conflicts": []}
+
+    slots = client.get(f"/api/v1/doctors/{doctor_id}/slots").json()
+    assert len(slots) == 80
+    # 09:00 IST
+    assert datetime.fromisoformat(slots[0]["start_time"]).replace(tzinfo=timezone.utc) == datetime(
+        2030, 1, 7, 3, 30, tzinfo=timezone.utc
+    )
+    assert {s["capacity"] for s in slots} == {4}
+    assert {datetime.fromisoformat(s["start_time"]).weekday() for s in slots} == {0, 1, 2, 3, 4}
+
+
+def test_conflicts_reject_or_skip(client, session_factory):
+    doctor_id = make_doctor(client, "SCH2")
+    base = datetime(2030, 1, 7, 9, tzinfo=timezone.utc)
+    for start, minutes in [(base, 15), (base + timedelta(minutes=40), 30)]:
+        client.post(
+            f"/api/v1/doctors/{doctor_id}/slots",
+            json={"start_time": start.isoformat(), "end_time": (start + timedelta(minutes=minutes)).isoformat(), "capacity": 2},
+        )
+    # a second rule overlapping the first one's last hour on Monday
+    rules = [WEEKDAYS, {**WEEKDAYS, "weekdays": ["MON"], "start": "12:30", "end": "14:00", "slot_minutes": 30}]
+
+    rejected = client.post(f"/api/v1/doctors/{doctor_id}/slots/schedule", json=schedule(rules=rules))
+    assert rejected.status_code == 409
+    conflicts = rejected.json()["detail"]["doctors"][0]["conflicts"]
+    assert [c["reason"] for c in conflicts] == ["exists", "overlap", "overlap", "overlap", "template"]
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(TimeSlot)) == 2
+
+    skipped = client.post(f"/api/v1/doctors/{doctor_id}/slots/schedule", json=schedule(rules=rules, skip_conflicts=True))
+    assert skipped.status_code == 200
+    # 80 from the weekday rule + 3 from the Monday one, minus the 5 conflicts
+    assert skipped.json()["created"] == 78
+
+    # running it again only finds existing slots
+    again = client.post(f"/api/v1/doctors/{doctor_id}/slots/schedule", json=schedule(rules=rules, skip_conflicts=True))
+    assert again.json()["created"] == 0
+    assert {c["reason"] for c in again.json()["conflicts"]} == {"exists", "overlap"}
+
+
+def test_many_doctors_in_a_fixed_number_of_statements(client, session_factory):
+    doctor_ids = [make_doctor(client, f"SCH{i}") for i in range(10, 13)]
+    statements = []
+    event.listen(session_factory.kw["bind"], "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    month = schedule(doctor_ids=doctor_ids, end_date="2030-02-03")
+    resp = client.post("/api/v1/slots/schedule", json=month)
+    assert resp.status_code == 200, resp.text
+    assert [r["created"] for r in resp.json()] == [20 * 16] * 3
+    # doctors, existing slots, one executemany per doctor
+    assert len(statements) == 2 + len(doctor_ids)
+
+
+def test_bad_requests(client):
+    doctor_id = make_doctor(client, "SCH3")
+    url = f"/api/v1/doctors/{doctor_id}/slots/schedule"
+    assert client.post("/api/v1/doctors/999/slots/schedule", json=schedule()).status_code == 404
+    assert client.post(url, json=schedule(end_date="2030-01-01")).status_code == 400
+    assert client.post(url, json=schedule(end_date="2031-01-01")).status_code == 400
+    assert client.post(url, json=schedule(timezone="Mars/Olympus")).status_code == 400
+    assert client.post(url, json=schedule(rules=[{**WEEKDAYS, "end": "08:00"}])).status_code == 400
+    assert client.post(url, json=schedule(rules=[{**WEEKDAYS, "weekdays": ["FUNDAY"]}])).status_code == 422
+
+
+def test_interval_index_matches_brute_force():
+    rng = random.Random(7)
+    base = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    slots = []
+    for slot_id in range(300):
+        start = base + timedelta(minutes=rng.randrange(0, 5000))
+        slots.append((start, start + timedelta(minutes=rng.choice([10, 15, 30, 240])), slot_id))
+    index = SlotIntervals(slots)
+
+    for _ in range(500):
+        start = base + timedelta(minutes=rng.randrange(-100, 5100))
+        end = start + timedelta(minutes=rng.choice([5, 15, 60]))
+        overlapping = {slot_id for s, e, slot_id in slots if s < end and e > start}
+        hit = index.conflict(start, end)
+        assert (hit is None) == (not overlapping)
+        if hit:
+            assert hit[1] in overlapping
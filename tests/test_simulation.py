@@ -0,0 +1,38 @@
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[1] / "stimulation" / "run_simulation.py"
+
+
+@pytest.fixture(scope="module")
+def simulation():
+    spec = importlib.util.spec_from_file_location("run_simulation", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_same_seed_same_events(simulation):
+    config = simulation.SimConfig(seed=3, doctors=4, arrivals=200)
+    assert simulation.generate_events(config) == simulation.generate_events(config)
+
+    other = simulation.generate_events(simulation.SimConfig(seed=4, doctors=4, arrivals=200))
+    assert other != simulation.generate_events(config)
+
+
+def test_source_mix_is_respected(simulation):
+    config = simulation.SimConfig(arrivals=2000, mix={"ONLINE": 1.0, "WALK_IN": 0.0})
+    books = [e for e in simulation.generate_events(config) if e.kind == "book"]
+    assert len(books) == 2000
+    assert {e.source for e in books} == {"ONLINE"}
+
+
+def test_small_rush_keeps_tokens_consistent(simulation, tmp_path):
+    config = simulation.SimConfig(seed=1, doctors=3, capacity=10, arrivals=60, concurrency=4)
+    report = simulation.run_simulation(config, db_path=tmp_path / "sim.db")
+
+    assert report["integrity"]["ok"], report["integrity"]
+    assert report["outcomes"]["book_ok"] == report["integrity"]["tokens"]
+    assert report["latency"]["book"]["count"] == 60
@@ -0,0 +1,63 @@
+from sqlalchemy import update
+
+from app.models.entities import TimeSlot
+from app.services.slot_counters import reconcile
+
+
+def counters(session_factory, slot_id):
+    with session_factory() as db:
+        slot = db.get(TimeSlot, slot_id)
+        return slot.booked_count, slot.served_count, slot.cancelled_count
+
+
+def test_counters_follow_book_serve_cancel(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=2)
+    ids = [
+        client.post(
+            "/api/v1/book",
+            json={"doctor_id": doctor["id"], "patient_name": f"C{i}", "patient_phone": f"91500000{i:02d}"},
+        ).json()["appointment_id"]
+        for i in range(2)
+    ]
+    assert counters(session_factory, slot["id"]) == (2, 0, 0)
+
+    # full slot: the guarded UPDATE refuses, nothing moves
+    full = client.post(
+        "/api/v1/book",
+        json={"doctor_id": doctor["id"], "patient_name": "X", "patient_phone": "9150000099"},
+    )
+    assert full.json()["detail"] == "Slot is full"
+    assert counters(session_factory, slot["id"]) == (2, 0, 0)
+
+    client.patch(f"/api/v1/appointments/{ids[0]}/serve")
+    client.patch(f"/api/v1/appointments/{ids[1]}/cancel")
+    assert client.patch(f"/api/v1/appointments/{ids[1]}/cancel").status_code == 400
+    assert counters(session_factory, slot["id"]) == (0, 1, 1)
+
+    with session_factory() as db:
+        assert reconcile(db) == []
+
+
+def test_reconcile_reports_and_fixes_drift(client, make_doctor, session_factory):
+    doctor, slot = make_doctor()
+    client.post(
+        "/api/v1/book",
+        json={"doctor_id": doctor["id"], "patient_name": "D", "patient_phone": "9150000100"},
+    )
+
+    with session_factory() as db:
+        db.execute(update(TimeSlot).where(TimeSlot.id == slot["id"]).values(booked_count=7, served_count=2))
+        db.commit()
+
+        drift = reconcile(db)
+        assert drift == [
+            {
+                "slot_id": slot["id"],
+                "stored": {"booked_count": 7, "served_count": 2, "cancelled_count": 0, "no_show_count": 0},
+                "actual": {"booked_count": 1, "served_count": 0, "cancelled_count": 0, "no_show_count": 0},
+            }
+        ]
+        reconcile(db, fix=True)
+        assert reconcile(db) == []
+
+    assert counters(session_factory, slot["id"]) == (1, 0, 0)
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import event
+
+from app.services.slot_resolver import slot_resolver
+
+
+def test_current_slot_is_cached_and_invalidated(client, make_doctor, session_factory):
+    doctor, first = make_doctor(hours=1)
+    engine = session_factory.kw["bind"]
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        if "FROM time_slots" in statement and "end_time >" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+
+    with session_factory() as db:
+        assert slot_resolver.current_slot(db, doctor["id"]).id == first["id"]
+        assert slot_resolver.current_slot(db, doctor["id"]).id == first["id"]
+        assert len(statements) == 1
+
+        # once the cached slot has ended the next one is looked up
+        later = datetime.now(timezone.utc) + timedelta(hours=2)
+        assert slot_resolver.current_slot(db, doctor["id"], later) is None
+        assert len(statements) == 2
+
+    # create_slot drops the cache entry, so booking / queue see the new slot
+    start = datetime.now(timezone.utc) - timedelta(hours=1)
+    earlier = client.post(
+        f"/api/v1/doctors/{doctor['id']}/slots",
+        json={
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=3)).isoformat(),
+            "capacity": 5,
+        },
+    ).json()
+    booked = client.post(
+        "/api/v1/book",
+        json={"doctor_id": doctor["id"], "patient_name": "R", "patient_phone": "9200000001"},
+    ).json()
+    assert booked["slot_id"] == earlier["id"]
+    assert client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()["slot_id"] == earlier["id"]
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def test_queue_skips_ended_slots(client, make_doctor):
+    doctor, current = make_doctor()
+    old_start = datetime.now(timezone.utc) - timedelta(days=1)
+    client.post(
+        f"/api/v1/doctors/{doctor['id']}/slots",
+        json={
+            "start_time": old_start.isoformat(),
+            "end_time": (old_start + timedelta(hours=1)).isoformat(),
+            "capacity": 5,
+        },
+    )
+
+    assert client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()["slot_id"] == current["id"]
@@ -0,0 +1,99 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.models.entities import TimeSlot, Token
+from app.services.token_engine import (
+    BlockAllocator,
+    DbCounterAllocator,
+    TokenAllocator,
+    allocate_token,
+    make_allocator,
+)
+
+THREADS = 16
+BOOKINGS = 120
+
+
+def _stress(session_factory, doctor_id, allocator):
+    def book(i):
+        with session_factory() as db:
+            return allocate_token(db, doctor_id, f"Stress {i}", f"97{i:08d}", allocator=allocator)
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        return list(pool.map(book, range(BOOKINGS)))
+
+
+@pytest.mark.parametrize(
+    "allocator",
+    [DbCounterAllocator(), BlockAllocator(block_size=8)],
+    ids=lambda a: a.name,
+)
+def test_allocators_are_unique_and_gap_free_under_threads(client, make_doctor, session_factory, allocator):
+    doctor, slot = make_doctor(capacity=BOOKINGS)
+
+    results = _stress(session_factory, doctor["id"], allocator)
+    assert [error for _, error in results if error] == []
+    assert sorted(result["token_number"] for result, _ in results) == list(range(1, BOOKINGS + 1))
+
+    with session_factory() as db:
+        allocator.close(db)
+        tokens = sorted(n for (n,) in db.query(Token.token_number).filter(Token.slot_id == slot["id"]))
+        assert tokens == list(range(1, BOOKINGS + 1))
+        assert db.get(TimeSlot, slot["id"]).next_token == BOOKINGS + 1
+
+    stats = allocator.stats.snapshot()
+    assert stats["reservations"] == BOOKINGS
+    assert stats["full"] == 0
+    if allocator.name == "block":
+        assert stats["refills"] == BOOKINGS // 8
+
+
+def test_block_allocator_reuses_numbers_of_rolled_back_bookings(client, make_doctor, session_factory):
+    doctor, slot = make_doctor(capacity=5)
+    allocator = BlockAllocator(block_size=4)
+
+    with session_factory() as db:
+        first, _ = allocate_token(db, doctor["id"], "A", "9600000001", allocator=allocator)
+        _, error = allocate_token(db, doctor["id"], "A", "9600000001", allocator=allocator)
+        assert error == "Patient already has a booking in this slot"
+        second, _ = allocate_token(db, doctor["id"], "B", "9600000002", allocator=allocator)
+    assert (first["token_number"], second["token_number"]) == (1, 2)
+
+    with session_factory() as db:
+        # two numbers left in the block: close() hands them back to the slot
+        assert db.get(TimeSlot, slot["id"]).next_token == 5
+        allocator.close(db)
+        assert db.get(TimeSlot, slot["id"]).next_token == 3
+
+    # the DB counter carries on from there
+    with session_factory() as db:
+        third, _ = allocate_token(db, doctor["id"], "C", "9600000003", allocator=DbCounterAllocator())
+    assert third["token_number"] == 3
+
+
+def test_full_slot_is_reported_by_both_allocators(client, make_doctor, session_factory):
+    doctor, _ = make_doctor(capacity=1)
+
+    for i, allocator in enumerate([DbCounterAllocator(), BlockAllocator(), DbCounterAllocator()]):
+        with session_factory() as db:
+            result, error = allocate_token(db, doctor["id"], "P", f"960000010{i}", allocator=allocator)
+        if i == 0:
+            assert error is None
+        else:
+            assert error == "Slot is full"
+            assert allocator.stats.snapshot()["full"] == 1
+
+
+def test_make_allocator_rejects_unknown_names():
+    assert make_allocator("block", 16).block_size == 16
+    with pytest.raises(ValueError):
+        make_allocator("redis")
+
+
+def test_allocator_without_reserve_fails_on_creation():
+    class Incomplete(TokenAllocator):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
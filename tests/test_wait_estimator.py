@@ -0,0 +1,83 @@
+import importlib.util
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from app.services.wait_estimator import WaitEstimator, wait_estimator
+
+T0 = datetime(2026, 1, 1, 9, 0, tzinfo=timezone.utc)
+FALLBACK = timedelta(minutes=10)
+
+
+def test_ewma_tracks_busy_gaps_and_ignores_idle_time():
+    est = WaitEstimator(alpha=0.5, min_samples=2)
+    est.record_serve(1, T0, still_waiting=3)
+    est.record_serve(1, T0 + timedelta(minutes=4), still_waiting=2)
+    assert est.service_time(1, FALLBACK) == FALLBACK  # one sample: not trusted yet
+
+    est.record_serve(1, T0 + timedelta(minutes=12), still_waiting=0)
+    assert est.service_time(1, FALLBACK) == timedelta(minutes=6)  # 4 -> 4 + 0.5 * (8 - 4)
+
+    # queue ran empty: the next gap includes idle time and is skipped
+    est.record_serve(1, T0 + timedelta(minutes=50), still_waiting=1)
+    assert est.snapshot(1)["samples"] == 2
+
+    # other doctors are unaffected
+    assert est.service_time(2, FALLBACK) == FALLBACK
+
+
+def test_etas_start_after_the_consultation_in_progress():
+    est = WaitEstimator(min_samples=1)
+    est.record_serve(1, T0, still_waiting=2)
+    est.record_serve(1, T0 + timedelta(minutes=5), still_waiting=2)
+
+    now = T0 + timedelta(minutes=7)
+    per_patient, etas = est.etas(1, 3, now=now, slot_start=T0, fallback=FALLBACK)
+    assert per_patient == timedelta(minutes=5)
+    assert etas == [T0 + timedelta(minutes=m) for m in (10, 15, 20)]
+
+    # nobody with the doctor: first in line is called right away
+    _, idle = est.etas(2, 2, now=now, slot_start=T0, fallback=FALLBACK)
+    assert idle == [now, now + FALLBACK]
+
+
+def test_queue_response_has_etas_in_call_order(client, make_doctor):
+    doctor, slot = make_doctor(capacity=10, hours=1)
+    ids = {}
+    for name, source in [("walkin", "WALK_IN"), ("online", "ONLINE"), ("priority", "PRIORITY")]:
+        body = {"doctor_id": doctor["id"], "patient_name": name, "patient_phone": f"95{len(ids):08d}"}
+        resp = client.post("/api/v1/book", json={**body, "source": source})
+        ids[name] = resp.json()["appointment_id"]
+
+    queue = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()
+    assert queue["avg_service_minutes"] == 6.0  # 60 minutes / capacity 10 until serves are seen
+    by_name = {t["patient_name"]: t for t in queue["tokens"]}
+    assert [t["token_number"] for t in queue["tokens"]] == [1, 2, 3]
+    assert [by_name[n]["position"] for n in ("priority", "online", "walkin")] == [0, 1, 2]
+    etas = [datetime.fromisoformat(by_name[n]["estimated_time"]) for n in ("priority", "online", "walkin")]
+    assert etas[1] - etas[0] == etas[2] - etas[1] == timedelta(minutes=6)
+
+    client.patch(f"/api/v1/appointments/{ids['priority']}/serve")
+    assert wait_estimator.snapshot(doctor["id"])["samples"] == 0  # first serve only opens a gap
+    queue = client.get(f"/api/v1/doctors/{doctor['id']}/queue").json()
+    assert [t["position"] for t in queue["tokens"]] == [1, 0]
+
+
+def test_backtest_beats_the_capacity_split():
+    path = Path(__file__).resolve().parents[1] / "stimulation" / "backtest_wait_times.py"
+    spec = importlib.util.spec_from_file_location("backtest_wait_times", path)
+    backtest = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(backtest)
+
+    config = backtest.SimConfig(
+        seed=5,
+        doctors=3,
+        slots_per_doctor=1,
+        slot_minutes=240,
+        capacity=40,
+        arrivals=300,
+        arrivals_per_minute=0.45,
+        service_minutes=6.0,
+    )
+    errors = backtest.backtest(config)
+    assert errors["ewma"]["count"] == errors["naive"]["count"] > 100
+    assert errors["ewma"]["mae_min"] < errors["naive"]["mae_min"]